@@ -0,0 +1,123 @@
+""" DateTime.date_magician microbenchmarks, one per input type:
+        - scalars (int YYYYMMDD, compact/separated strings, date, datetime, Timestamp): the former conversion vs the memoized one,
+          called over and over on a few distinct dates (as the progress-bar labels, date-wrapped API calls and time-slices do)
+        - array-likes (lists of each type, a mixed list, datetime64 array, DatetimeIndex): the former element-by-element recursion
+          vs DateTime.to_dates (vectorized)
+
+    Every pair of methods must give the same dates.
+
+    Usage: py benchmarks/date_magician.py [--size 20000] [--distinct 365] [--repeat 3]
+    Exit code 1, if any pair of methods disagrees.
+"""
+import argparse
+import datetime
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from exso.Utils.DateTime import DateTime
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def legacy_magician(date):
+    # the element-by-element conversion, as date_magician did it before the memoization & to_dates (return_stamp = False)
+    if isinstance(date, pd.Timestamp):
+        return date.date()
+    elif isinstance(date, (datetime.datetime, datetime.date)):
+        return pd.Timestamp(date).date()
+    elif isinstance(date, int) or np.issubdtype(type(date), np.integer):
+        date = str(date)
+        return pd.Timestamp(int(date[:4]), int(date[4:6]), int(date[6:])).date()
+    elif isinstance(date, str):
+        sep = ""
+        for test_separator in ['/', '-', '.']:
+            if re.search(test_separator, date):
+                sep = test_separator
+        return pd.Timestamp("-".join(date.split(sep))).date()
+    elif isinstance(date, (list, np.ndarray)):
+        return pd.to_datetime(list(map(legacy_magician, date)))
+    elif isinstance(date, pd.DatetimeIndex):
+        return pd.to_datetime(date.date)
+    return date
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def inputs(size, distinct):
+    days = pd.date_range('2020-1-1', periods=distinct, freq='D')
+    days = days[np.arange(size) % distinct] # repeated dates, as in real lakes (many versions, many reports)
+
+    scalars = {'int': [int(d.strftime('%Y%m%d')) for d in days[:distinct]],
+               'str YYYYMMDD': list(days[:distinct].strftime('%Y%m%d')),
+               'str YYYY-MM-DD': list(days[:distinct].strftime('%Y-%m-%d')),
+               'str YYYY/MM/DD': list(days[:distinct].strftime('%Y/%m/%d')),
+               'date': list(days[:distinct].date),
+               'datetime': list(days[:distinct].to_pydatetime()),
+               'Timestamp': list(days[:distinct])}
+
+    arrays = {'list[int]': [int(s) for s in days.strftime('%Y%m%d')],
+              'list[str YYYYMMDD]': list(days.strftime('%Y%m%d')),
+              'list[str YYYY-MM-DD]': list(days.strftime('%Y-%m-%d')),
+              'list[str DD.MM.YYYY]': list(days.strftime('%d.%m.%Y')),
+              'list[date]': list(days.date),
+              'list[Timestamp]': list(days),
+              'list[mixed]': [[int(d.strftime('%Y%m%d')), d.strftime('%Y-%m-%d'), d.date(), d][i % 4] for i, d in enumerate(days)],
+              'ndarray[datetime64]': days.values,
+              'DatetimeIndex': days}
+    return scalars, arrays
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def timeit(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def report(name, n, t_old, t_new, agree):
+    print('{:<24} {:9.4f} sec  {:9.4f} sec  x{:7.1f}   {:>12,.0f}/sec   {}'.format(name, t_old, t_new, t_old / max(t_new, 1e-9), n / max(t_new, 1e-9),
+                                                                              'ok' if agree else 'MISMATCH'))
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def main():
+    p = argparse.ArgumentParser(prog="py benchmarks/date_magician.py")
+    p.add_argument('--size', type=int, default=20000)
+    p.add_argument('--distinct', type=int, default=365)
+    p.add_argument('--repeat', type=int, default=3)
+    args = p.parse_args()
+
+    scalars, arrays = inputs(args.size, args.distinct)
+    calls = args.size // args.distinct + 1
+    all_agree = True
+
+    print('scalars: {:,} calls on {} distinct dates, best of {}\n'.format(calls * args.distinct, args.distinct, args.repeat))
+    print('{:<24} {:>13}  {:>13}'.format('input', 'former', 'memoized'))
+    for name, values in scalars.items():
+        values = values * calls
+        t_old, old = timeit(lambda: [legacy_magician(v) for v in values], args.repeat)
+        t_new, new = timeit(lambda: [DateTime.date_magician(v) for v in values], args.repeat)
+        agree = old == new
+        all_agree &= agree
+        report(name, len(values), t_old, t_new, agree)
+
+    print('\narrays: {:,} dates ({} distinct), best of {}\n'.format(args.size, args.distinct, args.repeat))
+    print('{:<24} {:>13}  {:>13}'.format('input', 'former', 'to_dates'))
+    for name, values in arrays.items():
+        t_old, old = timeit(lambda: legacy_magician(values), args.repeat)
+        t_new, new = timeit(lambda: DateTime.to_dates(values), args.repeat)
+        agree = pd.DatetimeIndex(old).equals(new)
+        all_agree &= agree
+        report(name, len(values), t_old, t_new, agree)
+
+    print('\nFAILED' if not all_agree else '\nOK')
+    sys.exit(0 if all_agree else 1)
+
+
+if __name__ == '__main__':
+    main()
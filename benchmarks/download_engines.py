@@ -0,0 +1,113 @@
+""" Download-engine benchmark: Assistant.download(engine = 'threads') vs (engine = 'async'), against a local HTTP stand-in.
+
+    A local threaded HTTP server plays the publisher: every request is answered after an artificial latency, with a payload of
+    a given size (a few links can be made slow, to show the effect of a straggler on the progress of each engine).
+    Each engine downloads the same links into a fresh temp directory. Timings, and the validation-list contract (one bool per link,
+    in link order, True only if the file was saved with the right content) are reported.
+
+    Usage: py benchmarks/download_engines.py [--links 300] [--latency 0.2] [--size 64] [--stragglers 3] [--threads 6]
+    The async engine requires aiohttp (pip install exso[async]). Exit code 1, if any engine breaks the validation contract.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from exso.DataLake.APIs.Assistant import Assistant
+
+
+# *******  *******   *******   *******   *******   *******   *******
+class StandIn(BaseHTTPRequestHandler):
+    latency = 0.2
+    payload = b''
+    slow = set()
+
+    def do_GET(self):
+        name = self.path.rsplit('/', 1)[-1]
+        if name.startswith('missing'):
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        time.sleep(self.latency * (10 if name in self.slow else 1))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(self.payload)))
+        self.end_headers()
+        self.wfile.write(self.payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def run_engine(engine, links, n_threads):
+    save_dir = tempfile.mkdtemp(prefix='exso_bench_')
+    try:
+        assistant = Assistant(save_dir)
+        assistant.dry_run = False
+        filepaths = [os.path.join(save_dir, link.rsplit('/', 1)[-1]) for link in links]
+
+        t0 = time.perf_counter()
+        validation = assistant.download(links, filepaths, n_threads=n_threads, engine=engine)
+        elapsed = time.perf_counter() - t0
+
+        expected = [not link.rsplit('/', 1)[-1].startswith('missing') for link in links]
+        saved_ok = [os.path.exists(fp) and os.path.getsize(fp) == len(StandIn.payload) for fp in filepaths]
+        contract = len(validation) == len(links) and list(validation) == expected and [s for s, e in zip(saved_ok, expected) if e] == [True] * sum(expected)
+        return elapsed, contract
+    finally:
+        shutil.rmtree(save_dir, ignore_errors=True)
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def main():
+    p = argparse.ArgumentParser(prog="py benchmarks/download_engines.py")
+    p.add_argument('--links', type=int, default=300)
+    p.add_argument('--latency', type=float, default=0.2, help='seconds per request')
+    p.add_argument('--size', type=int, default=64, help='payload size, in KB')
+    p.add_argument('--stragglers', type=int, default=3, help='number of links that are 10x slower')
+    p.add_argument('--missing', type=int, default=2, help='number of links that return 404')
+    p.add_argument('--threads', type=int, default=6, help="n_threads of the 'threads' engine")
+    p.add_argument('--engines', nargs='+', default=['threads', 'async'], choices=['threads', 'async'])
+    args = p.parse_args()
+
+    StandIn.latency = args.latency
+    StandIn.payload = os.urandom(args.size * 1024)
+    StandIn.slow = {'{}.bin'.format(i) for i in range(args.stragglers)}
+
+    server = Server(('127.0.0.1', 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = 'http://127.0.0.1:{}/files/'.format(server.server_address[1])
+    links = [base_url + '{}.bin'.format(i) for i in range(args.links)] + [base_url + 'missing{}.bin'.format(i) for i in range(args.missing)]
+
+    print('{} links, {:.0f} ms latency, {} KB each, {} stragglers, {} missing\n'.format(len(links), args.latency * 1000, args.size, args.stragglers, args.missing))
+    failed = False
+    for engine in args.engines:
+        if engine == 'async':
+            try:
+                import aiohttp
+            except ImportError:
+                print('{:<8} skipped (aiohttp is not installed)'.format(engine))
+                continue
+
+        elapsed, contract = run_engine(engine, links, args.threads)
+        print('{:<8} {:8.2f} sec  {:8.1f} links/sec  validation contract: {}'.format(engine, elapsed, len(links) / elapsed, 'OK' if contract else 'BROKEN'))
+        failed |= not contract
+
+    server.shutdown()
+    print('\nFAILED' if failed else '\nOK')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
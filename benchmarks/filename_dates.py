@@ -0,0 +1,76 @@
+""" File-name -> date extraction benchmark: the per-file loop (re.findall + DateTime.date_magician) (per-element) vs DateTime.dates_from_filenames (vectorized).
+
+    Both are run on the same synthetic lake listing (well-formed names YYYYMMDD_Report_vv.xlsx, plus a few ill-formed ones),
+    as done by DataLake.Status.get_file_df (filepaths) and Assistant.extract_filepaths_filenames_dates (links).
+    The dates of the well-formed names must be identical.
+
+    Usage: py benchmarks/filename_dates.py [--files 50000] [--ill_formed 20] [--repeat 3]
+    Exit code 1, if the two methods disagree.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+from exso.Utils.DateTime import DateTime
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def make_filepaths(n_files, n_ill_formed):
+    str_dates = pd.date_range('2011-1-1', periods=n_files // 2 + 1, freq='D').strftime('%Y%m%d')
+    paths = [os.path.join('lake', 'ISP1ISPResults', '{}_ISP1ISPResults_{:02d}.xlsx'.format(str_dates[i // 2], 1 + i % 2)) for i in range(n_files)]
+    paths += [os.path.join('lake', 'ISP1ISPResults', '20200722_ISP1_ISPResults_ISP1_2020-07-22_20200721140009.xlsx')] * n_ill_formed
+    return paths
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def per_file(filepaths):
+    # as Status.get_file_df used to do it
+    filenames = list(map(lambda x: os.path.split(x)[-1], filepaths))
+    str_dates = list(map(lambda x: re.findall(r'\d{8}', x)[0], filenames))
+    dates = [DateTime.date_magician(s, False) for s in str_dates] # element by element (date_magician(list) is vectorized now)
+    return pd.DatetimeIndex(pd.to_datetime(dates))
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def vectorized(filepaths):
+    return pd.DatetimeIndex(DateTime.dates_from_filenames(filepaths)['dates'])
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def timeit(func, filepaths, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func(filepaths)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def main():
+    p = argparse.ArgumentParser(prog="py benchmarks/filename_dates.py")
+    p.add_argument('--files', type=int, default=50000)
+    p.add_argument('--ill_formed', type=int, default=20)
+    p.add_argument('--repeat', type=int, default=3)
+    args = p.parse_args()
+
+    filepaths = make_filepaths(args.files, args.ill_formed)
+    print('{:,} filenames ({} ill-formed), best of {}\n'.format(len(filepaths), args.ill_formed, args.repeat))
+
+    t_loop, loop_dates = timeit(per_file, filepaths, args.repeat)
+    t_vec, vec_dates = timeit(vectorized, filepaths, args.repeat)
+
+    print('{:<12} {:8.3f} sec  {:10,.0f} names/sec'.format('per-file', t_loop, len(filepaths) / t_loop))
+    print('{:<12} {:8.3f} sec  {:10,.0f} names/sec   x{:.1f}'.format('vectorized', t_vec, len(filepaths) / t_vec, t_loop / t_vec))
+
+    agree = loop_dates.equals(vec_dates)
+    print('\nsame dates: {}'.format(agree))
+    print('\nFAILED' if not agree else '\nOK')
+    sys.exit(0 if agree else 1)
+
+
+if __name__ == '__main__':
+    main()
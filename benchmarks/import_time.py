@@ -0,0 +1,56 @@
+""" Import-time benchmark: "import exso" must stay cheap.
+
+    Runs "import exso" in fresh interpreters, reports the best/median wall time, and checks that none of the heavy
+    modules (plotting libraries, excel readers, the update machinery) got imported as a side effect.
+
+    Usage: py benchmarks/import_time.py [--runs 5] [--budget 1.5]
+    Exit code 1, if the budget is exceeded or a heavy module is imported eagerly.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+heavy_modules = ['plotly', 'matplotlib', 'openpyxl', 'bs4', 'seaborn',
+                 'exso.HighLevel.Updater', 'exso.ReportsInfo.Report', 'exso.IO.Tree', 'exso.Utils.Plot']
+
+probe = ("import time, sys, json; t0 = time.perf_counter(); import exso; elapsed = time.perf_counter() - t0; "
+         "print(json.dumps({'elapsed': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))" % heavy_modules)
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def measure(runs):
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def main():
+    p = argparse.ArgumentParser(prog="py benchmarks/import_time.py")
+    p.add_argument('--runs', type=int, default=5)
+    p.add_argument('--budget', type=float, default=1.5, help='maximum allowed (best-of-runs) import time, in seconds')
+    args = p.parse_args()
+
+    results = measure(args.runs)
+    timings = [r['elapsed'] for r in results]
+    loaded = sorted(set(m for r in results for m in r['loaded']))
+
+    print('import exso: best {:.3f} sec, median {:.3f} sec ({} runs, budget: {:.3f} sec)'.format(min(timings), statistics.median(timings), args.runs, args.budget))
+    failed = False
+    if loaded:
+        print('\tHeavy modules imported eagerly: {}'.format(loaded))
+        failed = True
+    if min(timings) > args.budget:
+        print('\tImport time budget exceeded.')
+        failed = True
+
+    print('FAILED' if failed else 'OK')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+""" Memory benchmark of the datalake refreshes: the heap of a process that refreshes the lake Status of many reports (as a multi-report update does).
+
+    Each synthetic report-lake has --dates dates, with 1 to --versions file-versions per date (the file listing is synthetic: nothing is read from disk).
+    Every report is refreshed twice (before and after its "update", which adds a file-version), and then dropped, as the Updater does.
+    The traced heap (tracemalloc) after each report should stay flat: only the compact Status.journal survives a report.
+
+    Usage: py benchmarks/lake_refresh_memory.py [--reports 100] [--dates 1500] [--versions 3] [--legacy]
+    --legacy: also keep a deep copy of every refreshed Status (what the former Status.history did), for comparison.
+    Exit code 1, if the heap grows by more than --max_growth KB per report (without --legacy).
+"""
+import argparse
+import copy
+import gc
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+from exso.DataLake.Status import Status
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def synthetic_listing(lake_dir, n_dates, n_versions, extra = None):
+    str_dates = pd.date_range('2019-1-1', periods=n_dates, freq='D').strftime('%Y%m%d')
+    listing = [str(lake_dir / '{}_Report_{:02d}.xlsx'.format(d, v)) for i, d in enumerate(str_dates) for v in range(1, 2 + i % n_versions)]
+    if extra:
+        listing.append(str(lake_dir / '{}_Report_{:02d}.xlsx'.format(str_dates[-1], 99)))
+    return sorted(listing)
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def refresh_report(root, i, args):
+    lake_dir = root / 'Report{}'.format(i)
+    status = Status(dir = lake_dir,
+                    min_potential_date = pd.Timestamp('2019-1-1').date(),
+                    max_potential_date = (pd.Timestamp('2019-1-1') + pd.Timedelta(args.dates - 1, 'D')).date(),
+                    eligibility = {'start_filter': '[0-9]', 'extension_filter': 'xlsx'},
+                    time_lag_days = 0,
+                    sheet_tags = [],
+                    period_covered = 'D')
+
+    for extra in [False, True]:
+        listing = synthetic_listing(lake_dir, args.dates, args.versions, extra)
+        status.get_lake_files = lambda: listing # synthetic lake content
+        status.initialize()
+        status.refresh()
+    return status
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def main():
+    p = argparse.ArgumentParser(prog="py benchmarks/lake_refresh_memory.py")
+    p.add_argument('--reports', type=int, default=100)
+    p.add_argument('--dates', type=int, default=1500)
+    p.add_argument('--versions', type=int, default=3)
+    p.add_argument('--legacy', action='store_true')
+    p.add_argument('--max_growth', type=float, default=64, help='KB per report')
+    args = p.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix='exso_bench_'))
+    kept = []
+    heap = []
+    try:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        for i in range(args.reports):
+            status = refresh_report(root, i, args)
+            if args.legacy:
+                kept.append(copy.deepcopy(status))
+            del status
+            gc.collect()
+            heap.append(tracemalloc.get_traced_memory()[0] / 1024)
+            if (i + 1) % 10 == 0 or i == 0:
+                print('report {:4d}: heap {:10,.0f} KB'.format(i + 1, heap[-1]))
+        elapsed = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    warm = min(10, len(heap) - 1)
+    growth = (heap[-1] - heap[warm]) / max(len(heap) - 1 - warm, 1)
+    print('\n{} reports x {} dates, {:.1f} sec'.format(args.reports, args.dates, elapsed))
+    print('heap growth per report (after the first {}): {:,.1f} KB   peak: {:,.0f} KB   journal: {} lakes, {} changes'.format(
+        warm, growth, peak, len(Status.journal.lakes()), len(Status.journal.changes())))
+
+    failed = not args.legacy and growth > args.max_growth
+    print('\nFAILED' if failed else '\nOK')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+""" Acquisition-layer benchmark, offline: record the publishers' responses once, then replay them from a local server.
+
+    record: queries a report through StreamHandler (live), and saves every response (link-lists, portlet pages, xlsx/zip payloads)
+            into a cassette directory.
+    replay: serves the cassette from a local HTTP server, with an artificial latency and bandwidth, and measures:
+            - the end-to-end StreamHandler query (link discovery + downloads, rate limiter & retries included)
+            - the download engines ('threads' vs 'async'), on the recorded payload links (served by their local urls)
+
+    Usage: py benchmarks/replay_acquisition.py record --report ISP1ISPResults --publisher admie --start 2023-1-1 --end 2023-3-1 --cassette ./cassette
+           py benchmarks/replay_acquisition.py replay --report ISP1ISPResults --publisher admie --start 2023-1-1 --end 2023-3-1 --cassette ./cassette
+                                                      [--latency 0.2] [--bandwidth 2000] [--threads 6] [--repeat 3]
+    Exit code 1, if the replayed query missed any recorded response.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from exso.DataLake.APIs.Assistant import Assistant
+from exso.DataLake.APIs.RateLimiter import RateLimiter
+from exso.DataLake.APIs.Replay import Recorder, ReplayServer
+from exso.DataLake.APIs.StreamHandler import StreamHandler
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def query(args):
+    save_dir = tempfile.mkdtemp(prefix='exso_replay_')
+    try:
+        t0 = time.perf_counter()
+        handler = StreamHandler(save_dir)
+        handler.query(args.report, start_date=args.start, end_date=args.end, publisher=args.publisher)
+        elapsed = time.perf_counter() - t0
+        n_files = sum(len(files) for _, _, files in os.walk(save_dir))
+        return elapsed, n_files
+    finally:
+        shutil.rmtree(save_dir, ignore_errors=True)
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def run_engine(engine, links, n_threads):
+    save_dir = tempfile.mkdtemp(prefix='exso_replay_')
+    try:
+        assistant = Assistant(save_dir)
+        assistant.dry_run = False
+        filepaths = [os.path.join(save_dir, '{}.bin'.format(i)) for i in range(len(links))]
+
+        t0 = time.perf_counter()
+        validation = assistant.download(links, filepaths, n_threads=n_threads, engine=engine)
+        return time.perf_counter() - t0, sum(validation)
+    finally:
+        shutil.rmtree(save_dir, ignore_errors=True)
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def record(args):
+    Assistant.download_engine = 'threads' # the async engine does not go through the pooled sessions
+    with Recorder(args.cassette) as recorder:
+        elapsed, n_files = query(args)
+    print('Recorded {} responses ({} files, {:.2f} sec) into: {}'.format(recorder.n_recorded, n_files, elapsed, args.cassette))
+    return 0
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def replay(args):
+    bandwidth = args.bandwidth * 1024 if args.bandwidth else None
+    print('Replaying: {}, {:.0f} ms latency, {} per response\n'.format(args.cassette, args.latency * 1000,
+                                                                      '{} KB/sec'.format(args.bandwidth) if bandwidth else 'unthrottled'))
+    failed = False
+    with ReplayServer(args.cassette, latency=args.latency, bandwidth=bandwidth) as server:
+        Assistant.download_engine = 'threads' # end-to-end, through the pooled sessions (the async engine would bypass the replay server)
+        for i in range(args.repeat):
+            RateLimiter.reset()
+            misses = server.stats['misses']
+            elapsed, n_files = query(args)
+            misses = server.stats['misses'] - misses
+            print('query    run {}: {:8.2f} sec  {:5d} files  {} misses'.format(i + 1, elapsed, n_files, misses))
+            failed |= misses > 0
+
+        links = [server.local_url(link) for link in server.cassette.links(args.links_pattern)]
+        print('\n{} recorded payload links'.format(len(links)))
+        for engine in args.engines:
+            if engine == 'async':
+                try:
+                    import aiohttp
+                except ImportError:
+                    print('{:<8} skipped (aiohttp is not installed)'.format(engine))
+                    continue
+            for i in range(args.repeat):
+                RateLimiter.reset()
+                elapsed, n_ok = run_engine(engine, links, args.threads)
+                print('download {:<8} run {}: {:8.2f} sec  {:8.1f} links/sec  {}/{} saved'.format(engine, i + 1, elapsed, len(links) / elapsed, n_ok, len(links)))
+
+        print('\nserver: {}'.format(server.stats))
+
+    print('\nFAILED' if failed else '\nOK')
+    return 1 if failed else 0
+
+
+# *******  *******   *******   *******   *******   *******   *******
+def main():
+    p = argparse.ArgumentParser(prog="py benchmarks/replay_acquisition.py")
+    p.add_argument('mode', choices=['record', 'replay'])
+    p.add_argument('--cassette', required=True, help='cassette directory')
+    p.add_argument('--report', required=True)
+    p.add_argument('--publisher', required=True, choices=['admie', 'henex'])
+    p.add_argument('--start', required=True)
+    p.add_argument('--end', required=True)
+    p.add_argument('--latency', type=float, default=0.2, help='(replay) seconds per request')
+    p.add_argument('--bandwidth', type=float, default=None, help='(replay) KB/sec per response')
+    p.add_argument('--threads', type=int, default=6, help="(replay) n_threads of the download engines")
+    p.add_argument('--repeat', type=int, default=1, help='(replay) runs per measurement')
+    p.add_argument('--engines', nargs='+', default=['threads', 'async'], choices=['threads', 'async'])
+    p.add_argument('--links_pattern', default=r'\.(xlsx?|zip)$', help='(replay) regex of the payload links, among the recorded ones')
+    args = p.parse_args()
+
+    sys.exit(record(args) if args.mode == 'record' else replay(args))
+
+
+if __name__ == '__main__':
+    main()
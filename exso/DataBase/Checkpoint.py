@@ -0,0 +1,59 @@
+import datetime
+import json
+import logging
+import os
+from pathlib import Path
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class Checkpoint:
+    ''' Progress of a windowed database build (Updater.update_database with window_days).
+
+        After every date-window is written to the database, the last committed date is saved here (a dot-file inside the database directory).
+        If the build is interrupted, the next update resumes after the last committed window, instead of starting from zero.
+        The file is deleted when the build completes.
+    '''
+    filename = '.checkpoint.json'
+
+    def __init__(self, dir:str|Path):
+        self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.dir = Path(dir)
+        self.path = self.dir / self.filename
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def load(self) -> dict | None:
+        if not self.path.exists():
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as ex:
+            self.logger.warning("Unreadable checkpoint ({}): {}. Ignoring it.".format(self.path, repr(ex)))
+            return None
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def save(self, start, end, committed_until, window_days, mode):
+        ''' Atomic write: an interruption while saving leaves the previous checkpoint intact '''
+        state = {'start': str(start.date()),
+                 'end': str(end.date()),
+                 'committed_until': None if committed_until is None else str(committed_until.date()),
+                 'window_days': window_days,
+                 'mode': mode,
+                 'saved_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+        self.dir.mkdir(exist_ok=True, parents=True)
+        temp_file = self.path.with_name(self.filename + '.tmp')
+        with open(temp_file, 'w') as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.path)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def clear(self):
+        if self.path.exists():
+            os.remove(self.path)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    # *******  *******   *******   *******   *******   *******   *******
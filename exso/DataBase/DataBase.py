@@ -3,6 +3,8 @@ import logging
 from pathlib import Path
 
 import pandas as pd
+from exso.DataBase.Checkpoint import Checkpoint
+from exso.DataBase.Manifest import Manifest
 from exso.DataBase.Status import Status
 from exso.DataBase.Update import Update
 from exso.IO.IO import IO
@@ -81,6 +83,8 @@ class DataBase(Query, Update):
 
         self.status = Status(**args_needed)
         self.status.refresh(self.dir)
+        self.manifest = Manifest(self.dir)
+        self.checkpoint = Checkpoint(self.dir)
 
 
         if self.status.exists:
@@ -102,6 +106,16 @@ class DataBase(Query, Update):
         # sugg = self.search("PROTERGIA", n_best=10,)
         # df = self.query(locator = sugg.dna[0])
 
+    # *******  *******   *******   *******   *******   *******   *******
+    def refresh(self):
+        ''' Re-assess the stored date-range against the report's (possibly updated) potential datetimes.
+            Used when the DataBase object is kept alive between updates (watch mode): the guide-file is not searched for again.
+        '''
+        self.status.min_potential_datetime = self.r.database_min_potential_datetime
+        self.status.max_potential_datetime = self.r.database_max_potential_datetime
+        self.status.initialize()
+        self.status.refresh(self.dir, sample_filepath = getattr(self.status, 'sample_filepath', None))
+
     # *******  *******   *******   *******   *******   *******   *******
     def resemble_dict(self, cue_dict):
         new_dict = {}
@@ -0,0 +1,133 @@
+import contextlib
+import datetime
+import logging
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+from exso.DataLake.APIs.ZipHandler import ZipHandler
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class Manifest:
+    ''' Persistent record of which datalake files have been assimilated into the database (one sqlite file per report-database).
+
+        For every str_date (YYYYMMDD), it keeps the lake file (name, true-version, size, mtime, sha256) that produced the database rows of that date.
+        Comparing it with the current datalake, reveals:
+            - dates that were never parsed (e.g. gaps in the middle of the database, that were later filled in the lake)
+            - dates whose lake file was republished (new version) or modified (different content-hash)
+        A republished version with the same content-hash as the assimilated one is not dirty: it is only re-labelled, never re-parsed.
+
+        The manifest lives inside the database directory, as a dot-file, so it is ignored by the Tree and by the database Status.
+        Moving the database to .bak (refresh-requirements) moves the manifest too, so a rebuilt database starts with an empty manifest.
+    '''
+    filename = '.manifest.sqlite'
+    columns = ['str_date', 'filename', 'true_version', 'size', 'mtime', 'sha256', 'assimilated_at']
+
+    def __init__(self, dir:str|Path):
+        self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.dir = Path(dir)
+        self.path = self.dir / self.filename
+
+        self.dir.mkdir(exist_ok=True, parents=True)
+        self.execute('''CREATE TABLE IF NOT EXISTS assimilated (str_date TEXT PRIMARY KEY,
+                                                                 filename TEXT,
+                                                                 true_version INTEGER,
+                                                                 size INTEGER,
+                                                                 mtime REAL,
+                                                                 sha256 TEXT,
+                                                                 assimilated_at TEXT)''')
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def execute(self, statement, rows = None):
+        with contextlib.closing(sqlite3.connect(self.path)) as con:
+            with con:
+                if rows is None:
+                    con.execute(statement)
+                else:
+                    con.executemany(statement, rows)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def read(self) -> pd.DataFrame:
+        with contextlib.closing(sqlite3.connect(self.path)) as con:
+            df = pd.read_sql_query('SELECT * FROM assimilated', con, index_col='str_date')
+        return df
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @property
+    def is_empty(self):
+        with contextlib.closing(sqlite3.connect(self.path)) as con:
+            n = con.execute('SELECT COUNT(*) FROM assimilated').fetchone()[0]
+        return n == 0
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _describe(self, file_df, with_hash = True):
+        ''' file_df: datalake file dataframe (index: str_dates, columns: at least 'filepaths', 'filenames', 'true_version').
+            If file_df has a 'sha256' column (lake index), those hashes are used instead of re-hashing the files.
+            Zip members (keep-zipped lakes, "archive.zip::member.xlsx") get the size & mtime of their archive, and are hashed in memory.
+        '''
+        df = pd.DataFrame(index = file_df.index.astype(str))
+        df['filepaths'] = file_df['filepaths'].values
+        df['filename'] = file_df['filenames'].values
+        df['true_version'] = file_df['true_version'].values if 'true_version' in file_df.columns else 1
+        stats = [ZipHandler.stat(fp) for fp in df['filepaths']]
+        df['size'] = [st.st_size for st in stats]
+        df['mtime'] = [st.st_mtime for st in stats]
+        df['sha256'] = file_df['sha256'].values if 'sha256' in file_df.columns else None
+        if with_hash:
+            df['sha256'] = [sha if isinstance(sha, str) else ZipHandler.sha256(fp)[1] for fp, sha in zip(df['filepaths'], df['sha256'])]
+        return df
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def record(self, file_df):
+        ''' Mark the given lake files as assimilated into the database (insert or replace, per str_date) '''
+        if file_df.empty:
+            return
+        df = self._describe(file_df)
+        df['assimilated_at'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rows = list(df.reset_index(names = 'str_date')[self.columns].itertuples(index=False, name=None))
+        self.execute('INSERT OR REPLACE INTO assimilated VALUES ({})'.format(','.join('?' * len(self.columns))), rows)
+        self.logger.info("Manifest: recorded {} assimilated lake files".format(len(rows)))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def dirty(self, file_df) -> list:
+        ''' Return the str_dates of the given lake files that are new, republished (other filename/version) or modified (other content).
+            Size & mtime are checked first: only files whose size or mtime changed, are hashed.
+            Republished files with the same content-hash as the assimilated ones (known from the lake index) are not dirty.
+        '''
+        if file_df.empty:
+            return []
+
+        known = self.read()
+        current = self._describe(file_df, with_hash=False)
+        merged = current.join(known, rsuffix='_known', how='left')
+
+        new = merged['filename_known'].isna() | (merged['filename'] != merged['filename_known'])
+        identical = new & merged['sha256'].notna() & (merged['sha256'] == merged['sha256_known'])
+        if identical.any(): # byte-identical republication: what the database holds is already this content
+            self.execute('UPDATE assimilated SET filename = ?, true_version = ?, size = ?, mtime = ? WHERE str_date = ?',
+                         [(row['filename'], int(row['true_version']), int(row['size']), float(row['mtime']), d) for d, row in merged[identical].iterrows()])
+            new = new & ~identical
+
+        touched = ~new & ~identical & ((merged['size'] != merged['size_known']) | (merged['mtime'] != merged['mtime_known']))
+
+        changed = []
+        unchanged = []
+        for str_date, row in merged[touched].iterrows():
+            if ZipHandler.sha256(row['filepaths'])[1] != row['sha256']:
+                changed.append(str_date)
+            else:
+                unchanged.append(str_date)
+
+        if unchanged: # same content, only touched: refresh size/mtime so that next time the fast path applies
+            self.execute('UPDATE assimilated SET size = ?, mtime = ? WHERE str_date = ?',
+                         [(int(merged.loc[d, 'size']), float(merged.loc[d, 'mtime']), d) for d in unchanged])
+
+        dirty = sorted(merged[new].index.to_list() + changed)
+        self.logger.info("Manifest: {} new/republished and {} modified lake files, {} byte-identical republications skipped (out of {} checked)".format(
+            new.sum(), len(changed), identical.sum(), merged.shape[0]))
+        return dirty
+
+    # *******  *******   *******   *******   *******   *******   *******
+    # *******  *******   *******   *******   *******   *******   *******
@@ -67,9 +67,13 @@ class Status:
 
 
     # *******  *******   *******   *******   *******   *******   *******
-    def refresh(self, dir):
+    def refresh(self, dir, sample_filepath = None):
+        ''' sample_filepath: a previously found guide-file, to avoid searching the whole database directory again '''
 
-        self.sample_filepath = self.get_sample_filepath(dir)
+        if sample_filepath and sample_filepath.exists():
+            self.sample_filepath = sample_filepath
+        else:
+            self.sample_filepath = self.get_sample_filepath(dir)
 
         if self.sample_filepath:
             self.exists = True
@@ -12,6 +12,7 @@ from exso.IO.Nodes import Node, DNA
 from exso.IO.Tree import Tree
 from exso.Utils.DateTime import DateTime
 from exso.Utils.Misc import Misc
+from exso.Utils.Profiler import Telemetry
 from exso.Utils.STR import STR
 
 # *******  *******   *******   *******   *******   *******   *******
@@ -63,8 +64,78 @@ class Update:
         return self.requirements
 
 
+    # *******  *******   *******   *******   *******   *******   *******
+    def get_dirty_requirements(self, requirements, lake_file_df):
+        ''' Extend the (tail-based) update requirements, with the dates of lake files that the manifest says were never assimilated,
+            or changed since they were assimilated (republished versions, filled-in gaps in the middle of the database).
+
+        :param requirements: as returned by .get_update_requirements()
+        :param lake_file_df: the (version-deduplicated) datalake file dataframe (DataLake.status.file_df)
+        :return: requirements dict. If dirty dates exist within the already-stored range, requirements['mode'] = 'upsert'
+        '''
+        if not self.status.exists or lake_file_df.empty:
+            return requirements
+
+        covered = lake_file_df[(lake_file_df['dates'] >= pd.Timestamp(self.status.dates.min.observed.date)) &
+                               (lake_file_df['dates'] <= pd.Timestamp(self.status.dates.max.observed.date))]
+
+        if self.manifest.is_empty:
+            self.logger.info("Manifest is empty, but the database exists. Bootstrapping it with the {} lake files of the stored range.".format(covered.shape[0]))
+            self.manifest.record(covered)
+            return requirements
+
+        dirty = self.manifest.dirty(covered)
+        if not dirty:
+            return requirements
+
+        self.logger.info("\tDirty (new or changed) lake dates within the stored database range: {}".format(dirty))
+        dirty_dates = pd.DatetimeIndex(covered.loc[dirty, 'dates'])
+        if requirements:
+            drange = requirements['range']['date'].union(dirty_dates)
+        else:
+            drange = dirty_dates.sort_values()
+            requirements['start'] = drange[0]
+            requirements['end'] = drange[-1]
+
+        requirements['range'] = {'date': drange, 'str': list(map(lambda x: DateTime.make_string_date(x, sep=""), drange))}
+        requirements['mode'] = 'upsert'
+        return requirements
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def get_resume_requirements(self, requirements, checkpoint:dict|None):
+        ''' Extend the update requirements with the part of an interrupted windowed build, that was not committed.
+            The window being written at the time of the interruption may be partially stored, so everything after the
+            last committed window is re-processed as an upsert.
+
+        :param requirements: as returned by .get_update_requirements() / .get_dirty_requirements()
+        :param checkpoint: as returned by .checkpoint.load()
+        '''
+        if not checkpoint:
+            return requirements
+
+        if checkpoint['committed_until']:
+            resume_from = pd.Timestamp(checkpoint['committed_until']) + pd.Timedelta(1, 'D')
+        else:
+            resume_from = pd.Timestamp(checkpoint['start'])
+        resume_until = pd.Timestamp(checkpoint['end'])
+
+        self.logger.info("Found the checkpoint of an interrupted build: {}. Resuming from {}".format(checkpoint, resume_from.date()))
+        drange = pd.date_range(resume_from, resume_until, freq='D')
+        if requirements:
+            drange = requirements['range']['date'].union(drange)
+        else:
+            requirements['start'] = drange[0]
+            requirements['end'] = drange[-1]
+
+        requirements['range'] = {'date': drange, 'str': list(map(lambda x: DateTime.make_string_date(x, sep=""), drange))}
+        if self.status.exists:
+            requirements['mode'] = 'upsert'
+        return requirements
+
     # *******  *******   *******   *******   *******   *******   *******
     def update(self, lobby, locator: None| str | Path | DNA | Node = None, mode = 'slow'):
+        ''' mode: 'slow' (robust merge), 'fast' (append), 'append' (append, unless a file gains columns: then robust merge, per file)
+                  or 'upsert' (rows of the lobby replace the stored rows with the same index) '''
 
         if lobby == {}:
             self.logger.info("Came to database update with empty lobby {}. Returning idle.")
@@ -80,9 +151,20 @@ class Update:
         #   for now, I check the whole directory size
 
         dirsize_thresh_MB = 50
+        with Telemetry.stage('database_write'):
+            self.__write(lobbytree, mode)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def __write(self, lobbytree, mode):
         if self.status.exists == False:
             self.__fast_update(self.tree, lobbytree)
 
+        elif mode == 'upsert':
+            self.__slow_update(self.tree, lobbytree, upsert = True)
+
+        elif mode == 'append' and self.is_multiindex is False:
+            self.__append_update(self.tree, lobbytree)
+
         else:
             big_report_hints = ['AggDemandSupplyCurves', 'Offers']
             if mode  == 'fast' or any([big_hint in self.r.report_name for big_hint in big_report_hints]):
@@ -142,7 +224,35 @@ class Update:
             IO.write_file(fn.path, df, mode='a')
 
     # *******  *******   *******   *******   *******   *******   *******
-    def __slow_update(self, basetree, lobbytree ):
+    def __append_update(self, basetree, lobbytree):
+        ''' Per file: append the new rows (as __fast_update), if their columns are all in the stored header.
+            Otherwise (a new unit/entity column), the file is rewritten as in __slow_update, and a file that does not exist yet is written anew.
+            For data that only extends the stored dates (e.g. windows 2..N of a fresh build).
+        '''
+        file_nodes = basetree.get_nodes_whose('kind', equals='file')
+        pbar = tqdm.tqdm(file_nodes,
+                         desc="\tDatabase Update (append)",
+                         **exso._pbar_settings)
+        for fn in pbar:
+
+            lobby_df = lobbytree.get_node(fn.dna)()
+            pbar.set_postfix_str(s=fn.name)
+            lobby_df = self.force_timezone_to(lobby_df, timezone=None)
+
+            if not fn.path.exists():
+                IO.write_file(fn.path, self.__cleaning_pipeline(lobby_df), mode='w')
+                continue
+
+            head = IO.read_file(fn.path, nrows = 2)
+            if lobby_df.columns.isin(head.columns).all():
+                df = self.__cleaning_pipeline(self.custom_df_align(host=head, new=lobby_df), drop_trivial_cols = False)
+                IO.write_file(fn.path, df, mode='a')
+            else:
+                df = self.__cleaning_pipeline(pd.concat([fn(), lobby_df], axis = 0))
+                IO.write_file(fn.path, df, mode='w')
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def __slow_update(self, basetree, lobbytree, upsert = False):
 
         basenode = basetree.root
 
@@ -159,6 +269,9 @@ class Update:
             if self.is_multiindex == False:
                 lobby_df = self.force_timezone_to(lobby_df, timezone=None)
 
+            if upsert:
+                base_df = base_df[~base_df.index.isin(lobby_df.index)]
+
             df = pd.concat([base_df, lobby_df], axis = 0)
             df = self.__cleaning_pipeline(df)
 
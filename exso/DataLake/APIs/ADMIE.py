@@ -5,11 +5,11 @@ import re
 import shutil
 from pathlib import Path
 
-import requests
 from exso.DataLake.APIs import ZipHandler
 from exso.DataLake.APIs.Assistant import Assistant
 from exso.Utils.DateTime import DateTime
 from exso.Utils.Paths import Paths
+from exso.Utils.Profiler import Telemetry
 
 # *******  *******   *******   *******   *******   *******   *******
 date_lambda = lambda x: datetime.datetime.strftime(DateTime.date_magician(x, return_stamp = False), format="%d-%b-%y")
@@ -29,6 +29,8 @@ def date_wrapper(func):
 ###############################################################################################
 ###############################################################################################
 class API(Assistant):
+    publisher = 'admie'
+
     def __init__(self, save_dir:str):
         self.save_dir = save_dir
         os.makedirs(self.save_dir, exist_ok=True)
@@ -39,12 +41,16 @@ class API(Assistant):
     # *******  *******   *******   *******   *******   *******   *******
     # *******  *******   *******   *******   *******   *******   *******
     @date_wrapper
-    def query(self, report_name, start_date, end_date, dry_run = False, n_threads = 1):
+    def query(self, report_name, start_date, end_date, dry_run = False, n_threads = 1, check_revisions = False):
+        ''' check_revisions: the links whose files already exist in save_dir are checked for revisions at the source (conditional requests),
+                             and re-downloaded only if they changed (see Assistant.check_revisions)
+        '''
         self.dry_run = dry_run
         self.logger.info("Making query with arguments: report_name: {}, start_date: {}, end_date: {}, dry_run: {}, n_threads: {}".
                          format(report_name, start_date, end_date, dry_run, n_threads))
 
-        candidate_links = self.get_links(report_name, start_date, end_date) # query the api and ask for the links only
+        with Telemetry.stage('link_discovery'):
+            candidate_links = self.get_links(report_name, start_date, end_date) # query the api and ask for the links only
         if isinstance(candidate_links, type(None)):
             candidate_links = []
         self.logger.info("Got {} candidate links".format(len(candidate_links)))
@@ -53,6 +59,11 @@ class API(Assistant):
         valid_indices, trivial_indices = self.get_non_trivial_mask(candidate_filenames=candidate_filenames)
         links = self.get_indexed_slice(valid_indices, candidate_links)
 
+        if check_revisions and trivial_indices and not dry_run:
+            existing_links = [link for link in self.get_indexed_slice(trivial_indices, candidate_links) if os.path.isfile(os.path.join(self.save_dir, Path(link).name))]
+            existing_filepaths = [os.path.join(self.save_dir, Path(link).name) for link in existing_links]
+            self.revised = self.check_revisions(existing_links, existing_filepaths, n_threads)
+
         self.logger.info("Non-trivial links (links that their corresponding filepaths does not exist in directory: {}) : {}".format(self.save_dir, len(links)))
         filepaths, filenames, dates = self.extract_filepaths_filenames_dates(links)
 
@@ -87,7 +98,7 @@ class API(Assistant):
 
         url = self.home_url + 'getOperationMarketFilewRange?dateStart={}&dateEnd={}&FileCategory={}'.format(start_date, end_date, report_name)
 
-        r = requests.get(url, allow_redirects=True)
+        r = self.http.get(url, allow_redirects=True)
 
 
         if r.status_code == 200:
@@ -1,14 +1,24 @@
+import asyncio
+import contextlib
 import datetime
+import hashlib
+import json
 import logging
 import os
 import re
-import sys
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
 
 import requests
 import exso
+from exso.DataLake.APIs.RateLimiter import RateLimiter
+from exso.DataLake.APIs.Sessions import Sessions
+from exso.DataLake.LinkManifest import LinkManifest
 from exso.Utils.DateTime import DateTime
+from exso.Utils.Paths import Paths
+from exso.Utils.Profiler import Telemetry
 from tqdm import tqdm
 
 # *******  *******   *******   *******   *******   *******   *******
@@ -29,36 +39,59 @@ def date_wrapper(func):
 ###############################################################################################
 ###############################################################################################
 class Assistant:
+    on_saved = None # optional callable(filepath), called after every successfully saved file (streaming consumers)
+    download_engine = 'threads' # 'threads' or 'async' (requires aiohttp: pip install exso[async])
+    async_max_in_flight = 256 # async engine: maximum concurrent requests overall
+    async_per_host = 16 # async engine: maximum concurrent requests per host
+    publisher = None # selects the pooled session & its settings (Files/http_settings.json)
+    chunk_size = 1024 * 1024 # streamed downloads: bytes per chunk written to disk
+    resume_tries = 3 # streamed downloads: attempts to resume (http Range) a transfer that broke mid-stream
+    range_size = 8 * 1024 * 1024 # ranged downloads: bytes per range request
+    ranged_min_size = 32 * 1024 * 1024 # ranged downloads: smaller files (or servers without Range support) are streamed in one request
+
     def __init__(self, save_dir):
         self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
         self.save_dir = save_dir
         os.makedirs(save_dir, exist_ok=True)
 
     # *******  *******   *******   *******   *******   *******   *******
-    def unit_request(self, link:str) -> (bool, str or None):
+    @property
+    def http(self):
+        ''' The shared (pooled, retrying) session of this publisher '''
+        return Sessions.get(self.publisher)
 
-        self.logger.info("Requesting link: {}".format(link))
+    # *******  *******   *******   *******   *******   *******   *******
+    @property
+    def manifest(self):
+        ''' The record of the links fetched into save_dir (http validators & content-hashes) '''
+        return LinkManifest(self.save_dir)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _remember(self, link, filepath, headers, sha256, size):
+        ''' Buffered (thread-safe list.append), and written to the manifest in one transaction, at the end of the download '''
+        if not hasattr(self, '_fetched'):
+            self._fetched = []
+        self._fetched.append(LinkManifest.describe(link, filepath, headers, sha256, size))
 
-        max_tries  = 3
-        try_number = 0
-        success = False
-        while try_number<max_tries:
-           try:
+    # *******  *******   *******   *******   *******   *******   *******
+    def _flush_manifest(self):
+        fetched, self._fetched = getattr(self, '_fetched', []), []
+        try:
+            self.manifest.record(fetched)
+        except Exception as ex:
+            self.logger.warning("Failed to update the link manifest ({}). Revision checks will treat these links as unknown.".format(repr(ex)))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def unit_request(self, link:str) -> (bool, str or None):
 
-               response = requests.get(link)
-               success = True
-               break
-           except:
-               try:
-                   response = requests.get(link, proxies={'https': "http://10.100.133.251:80"})
-                   success  = True
-                   break
-               except:
-                   try_number += 1
+        self.logger.info("Requesting link: {}".format(link))
 
-        if success == False:
-            return False,  None
-            sys.exit("Failed 3 times to download link: {}")
+        # retries (with backoff & Retry-After) and the fallback proxies are handled by the session
+        try:
+            response = self.http.get(link)
+        except requests.exceptions.RequestException as ex:
+            self.logger.warning("Failed to download link: {} ({})".format(link, repr(ex)))
+            return False, None
 
 
         if response.status_code == 200:
@@ -77,48 +110,363 @@ class Assistant:
         return link_is_valid, payload
 
     # *******  *******   *******   *******   *******   *******   *******
-    def unit_save(self, content, filepath):
+    @staticmethod
+    def part_path(filepath):
+        ''' The in-progress download of filepath: a dot-file next to it (invisible to the lake's glob rules) '''
+        filepath = str(filepath)
+        save_dir, filename = os.path.split(filepath)
+        return os.path.join(save_dir, '.{}.part'.format(filename))
 
-        with open(filepath, 'wb') as f:
-            f.write(content)
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def commit_part(part, filepath):
+        ''' fsync'ed .part file --> filepath. A crash never leaves a truncated file under the final name. '''
+        with open(part, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(part, filepath)
 
     # *******  *******   *******   *******   *******   *******   *******
-    def unit_request_and_save(self, link, filepath):
+    def unit_stream(self, link, filepath, unless_sha256 = None) -> bool:
+        ''' Streams the response to a .part file, in chunks (memory stays at chunk_size, even for ~GB archives).
+            If a .part file exists (interrupted transfer), it is resumed with an http Range request (if the server supports it).
+            The .part file is validated against Content-Length, and only then renamed to filepath.
+
+            :param unless_sha256: (revision checks) if the downloaded content has this sha256, filepath is left untouched
+            Returns True if the link was valid and the file was saved.
+            Raises requests.exceptions.RequestException, if the transfer breaks (the .part file is kept, for resuming).
+        '''
+        part = self.prepare_part(filepath)
+        while True:
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            headers = {'Range': 'bytes={}-'.format(offset)} if offset else {}
+
+            with self.http.stream(link, headers=headers) as response:
+                mode = self.part_mode(link, part, offset, response.status_code, response.headers)
+                if mode == 'restart':
+                    continue # out of the with-block (which releases the rate-limiter slot), then start over
+
+                if mode is None:
+                    self.logger.warning({"Response status":response.status_code,
+                                   "Response Ok? ":response.ok,
+                                   'Response Encoding':response.encoding,
+                                   'Response Text Beginning':response.text[:100]})
+                    return False
+
+                offset = offset if mode == 'ab' else 0
+                expected_size = self.expected_size(offset, response.headers)
+                sha = self.part_sha256(part, offset)
+                with open(part, mode) as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        f.write(chunk)
+                        sha.update(chunk)
+                response_headers = response.headers
+            break
+
+        return self.validate_part(link, filepath, expected_size, sha.hexdigest(), response_headers, unless_sha256)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def prepare_part(self, filepath):
+        ''' The .part path of filepath. A (sparse) .part of a ranged download is not a prefix: it is discarded, and the download starts over '''
+        part = self.part_path(filepath)
+        if os.path.exists(self.ranges_path(filepath)):
+            os.remove(self.ranges_path(filepath))
+            with contextlib.suppress(FileNotFoundError): # the .part may be gone already (crash between the two writes, manual cleanup)
+                os.remove(part)
+        return part
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def part_mode(self, link, part, offset, status, headers):
+        ''' How to write the response to the .part file: 'ab' (resumed at offset), 'wb' (from scratch),
+            'restart' (the .part did not fit the remote file, and was discarded: request again), or None (not a valid response)
+        '''
+        if offset and status == 416: # the .part does not fit the remote file (anymore): start over
+            self.logger.info("Range not satisfiable for {}. Discarding the partial download.".format(link))
+            os.remove(part)
+            return 'restart'
+
+        if status == 206:
+            # Content-Range: bytes <start>-<end>/<total>
+            content_range = re.match(r'bytes (\d+)-\d+/(\d+|\*)', headers.get('Content-Range', ''))
+            if not content_range or int(content_range.group(1)) != offset:
+                self.logger.info("Unexpected Content-Range for {}. Discarding the partial download.".format(link))
+                os.remove(part)
+                return 'restart'
+            self.logger.info("Resuming download of {} at byte {:,}".format(link, offset))
+            return 'ab'
+
+        if status == 200:
+            return 'wb' # no Range support (or no partial file): full download
+        return None
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def expected_size(offset, headers):
+        # Content-Length is the size on the wire: not comparable to the decoded bytes, if the response is compressed
+        content_length = headers.get('Content-Length')
+        encoded = headers.get('Content-Encoding', 'identity').lower() != 'identity'
+        return None if content_length is None or encoded else offset + int(content_length)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def part_sha256(self, part, offset):
+        ''' sha256 object, fed with the first offset bytes of the .part file (the resumed prefix) '''
+        sha = hashlib.sha256()
+        if offset:
+            with open(part, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                    sha.update(chunk)
+        return sha
 
-        link_is_valid, content = self.unit_request(link)
+    # *******  *******   *******   *******   *******   *******   *******
+    def validate_part(self, link, filepath, expected_size, sha256, headers, unless_sha256 = None) -> bool:
+        ''' Validates the complete .part file (size), and renames it to filepath. True if filepath was saved. '''
+        part = self.part_path(filepath)
+        size = os.path.getsize(part)
+        if expected_size is not None and size != expected_size:
+            self.logger.warning("Incomplete download of {}: {:,} of {:,} bytes".format(link, size, expected_size))
+            if size > expected_size:
+                os.remove(part)
+            return False
+
+        if size == 0:
+            self.logger.warning( "Empty content arrived, although it shouldn't get until here. Just skipping...")
+            self.logger.warning("Link: {}".format(link))
+            self.logger.warning('Target-filepath was: {}'.format(filepath))
+            os.remove(part)
+            return False
+
+        if unless_sha256 and sha256 == unless_sha256:
+            os.remove(part)
+            self._remember(link, filepath, headers, unless_sha256, size)
+            return False
+
+        self.commit_part(part, filepath)
+        self._remember(link, filepath, headers, sha256, size)
+        return True
 
-        if link_is_valid:
-            if content:
-                self.unit_save(content, filepath)
+    # *******  *******   *******   *******   *******   *******   *******
+    def unit_revision_check(self, link, filepath, entry) -> bool:
+        ''' Was the (already downloaded) file of link revised at the source? If so, it is re-downloaded. Returns True if filepath was replaced.
+
+            - link in the manifest: conditional HEAD (If-None-Match / If-Modified-Since). 304, or the same validators --> unchanged.
+              Otherwise, the link is downloaded, and filepath is replaced only if the content-hash differs.
+            - link not in the manifest (downloaded before the manifest existed): a HEAD request records the server's validators,
+              together with the hash of the local file, as the baseline for the next checks.
+        '''
+        if entry is None:
+            response = self.http.head(link)
+            if response.status_code == 200:
+                self._remember(link, filepath, response.headers, Paths.sha256(filepath), os.path.getsize(filepath))
+            return False
+
+        response = self.http.head(link, headers=LinkManifest.conditional_headers(entry))
+        if response.status_code == 304 or (response.status_code == 200 and LinkManifest.same_version(entry, response.headers)):
+            self._checked.append(link)
+            return False
+
+        if response.status_code not in [200, 405]: # 405: HEAD not allowed, so only a GET can tell
+            self.logger.warning("Revision check of {} returned status {}. Skipping it.".format(link, response.status_code))
+            return False
+
+        revised = self.unit_stream(link, filepath, unless_sha256=entry.get('sha256'))
+        if revised:
+            self.logger.info("Revised at the source: {}".format(link))
+        return revised
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def check_revisions(self, links, filepaths, n_threads = 1):
+        ''' Revision check of already downloaded links (see .unit_revision_check()). Returns one bool per link: True if it was re-downloaded '''
+        entries = self.manifest.lookup(links)
+        self._checked = []
+
+        def check(link, filepath):
+            try:
+                return self.unit_revision_check(link, filepath, entries.get(link))
+            except requests.exceptions.RequestException as ex:
+                self.logger.warning("Revision check of {} failed ({})".format(link, repr(ex)))
+                return False
+
+        t = time.time()
+        with Telemetry.stage('revision_check'):
+            if n_threads > 1 and len(links) > 4:
+                with ThreadPoolExecutor(max_workers=n_threads) as executor:
+                    revised = list(executor.map(check, links, filepaths))
             else:
-                self.logger.warning( "Empty content arrived, although it shouldn't get until here. Just skipping...")
-                self.logger.warning("Link: {}".format(link))
-                self.logger.warning('Target-filepath was: {}'.format( link, filepath))
-                link_is_valid = False
+                revised = [check(link, filepath) for link, filepath in zip(links, filepaths)]
+
+        self._flush_manifest()
+        self.manifest.touch(self._checked)
+        self.logger.info("Revision check of {} links: {} unchanged, {} revised, {} baselined ({:,} sec)".format(
+            len(links), len(self._checked), sum(revised), len(links) - len(entries), round(time.time() - t, 3)))
+        return revised
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def unit_request_and_save(self, link, filepath):
+
+        self.logger.info("Requesting link: {}".format(link))
+        link_is_valid = False
+        for try_number in range(self.resume_tries):
+            try:
+                link_is_valid = self.unit_stream(link, filepath)
+                break
+            except requests.exceptions.RequestException as ex:
+                # connection-level retries are exhausted by the session; what is left is a transfer broken mid-stream
+                self.logger.warning("Download of {} broke ({}). Attempt {}/{}".format(link, repr(ex), try_number + 1, self.resume_tries))
+
+        if link_is_valid and self.on_saved:
+            self.on_saved(filepath)
 
         return link_is_valid
 
     # *******  *******   *******   *******   *******   *******   *******
     def _concurrent_download(self, links, filepaths, n_threads=6):
         # print('\tDownloading concurrently with {} threads.'.format(n_threads))
-        validation = []
+        # progress is reported in completion order (a slow link doesn't stall the bar), validation is kept in link order
+        validation = [False] * len(links)
         with ThreadPoolExecutor(max_workers=n_threads) as executor:
-            futures = [executor.submit(self.unit_request_and_save, link, filepath) for link, filepath in zip(links, filepaths)]
+            futures = {executor.submit(self.unit_request_and_save, link, filepath): i for i, (link, filepath) in enumerate(zip(links, filepaths))}
 
-            pbar = tqdm(range(len(futures)),
+            pbar = tqdm(total=len(futures),
                         desc="\tDownloading Progress (mt)",
                         **exso._pbar_settings)
 
-            for i in pbar:
-                link_is_valid = futures[i].result()
-                validation.append(link_is_valid)
+            for future in as_completed(futures):
+                validation[futures[future]] = future.result()
+                pbar.update(1)
+            pbar.close()
+
+        return validation
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _async_download(self, links, filepaths):
+        ''' Runs the asyncio engine to completion. If an event loop is already running (e.g. jupyter), it runs in a separate thread. '''
+        coroutine = self._async_download_all(links, filepaths)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+
+    # *******  *******   *******   *******   *******   *******   *******
+    async def _async_download_all(self, links, filepaths):
+        import aiohttp
+
+        validation = [False] * len(links)
+        settings = Sessions.settings(self.publisher)
+        connector = aiohttp.TCPConnector(limit=self.async_max_in_flight, limit_per_host=self.async_per_host)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=settings['connect_timeout'], sock_read=settings['read_timeout'])
+        pbar = tqdm(total=len(links),
+                    desc="\tDownloading Progress (async)",
+                    **exso._pbar_settings)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            async def fetch(i, link, filepath):
+                validation[i] = await self._async_request_and_save(session, link, filepath, settings)
+                pbar.update(1)
 
-            #for future in as_completed(futures):
-            #    link_is_valid = future.result()
-            #    validation.append(link_is_valid)
+            await asyncio.gather(*[fetch(i, link, filepath) for i, (link, filepath) in enumerate(zip(links, filepaths))])
 
+        pbar.close()
         return validation
 
+    # *******  *******   *******   *******   *******   *******   *******
+    async def _async_request_and_save(self, session, link, filepath, settings):
+        ''' Same contract as .unit_request_and_save(): True if the link was valid and its content was saved.
+            Same .part file, Range resume and validation as .unit_stream() (the body is streamed in chunks, never held in memory).
+            Same retry policy as the pooled sessions (settings: see Sessions.settings())
+        '''
+        self.logger.info("Requesting link (async): {}".format(link))
+        import aiohttp
+
+        scheme = urlsplit(link).scheme
+        limiter = RateLimiter.get(RateLimiter.host_of(link)) if RateLimiter.enabled else None
+        proxies = dict.fromkeys([settings['proxies'].get(scheme), settings['fallback_proxies'].get(scheme)])
+        max_tries = settings['retries'] + 1
+        await asyncio.to_thread(self.prepare_part, filepath)
+        attempt = {}
+        for try_number in range(max_tries):
+            for proxy in proxies:
+                attempt = {'status': None, 'retry_after': None, 'saved': False}
+                await self._async_acquire(limiter)
+                try:
+                    await self._async_stream(session, link, filepath, proxy, attempt)
+                    break
+                except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+                    continue # the .part file is kept: the next attempt resumes it
+                finally:
+                    if limiter:
+                        limiter.release(attempt['status'])
+
+            response_status, retry_after = attempt['status'], attempt['retry_after']
+            if limiter and response_status in settings['status_forcelist']:
+                limiter.throttle(Sessions.backoff_time(settings, try_number, retry_after) if retry_after else None)
+
+            if attempt.get('done'):
+                break
+            if try_number < max_tries - 1:
+                await asyncio.sleep(Sessions.backoff_time(settings, try_number, retry_after))
+
+        if not attempt.get('done'):
+            self.logger.warning("Failed {} times to download link: {}".format(max_tries, link))
+            return False
+
+        if attempt['saved'] and self.on_saved:
+            await asyncio.to_thread(self.on_saved, filepath) # may block on its queue: off the event loop
+        return attempt['saved']
+
+    # *******  *******   *******   *******   *******   *******   *******
+    async def _async_stream(self, session, link, filepath, proxy, attempt):
+        ''' One request (resumed and restarted as .unit_stream() does), streamed to the .part file. Fills attempt with the status,
+            and sets attempt['done'] when there is nothing left to retry (attempt['saved']: whether filepath was saved).
+        '''
+        part = self.part_path(filepath)
+        while True:
+            offset = os.path.getsize(part) if os.path.exists(part) else 0
+            headers = {'Range': 'bytes={}-'.format(offset)} if offset else {}
+
+            async with session.get(link, proxy=proxy, headers=headers) as response:
+                attempt['status'] = response.status
+                attempt['retry_after'] = response.headers.get('Retry-After')
+                mode = await asyncio.to_thread(self.part_mode, link, part, offset, response.status, response.headers)
+                if mode == 'restart':
+                    continue # the same rate-limiter slot is used for the new request
+
+                if mode is None:
+                    if response.status not in Sessions.settings(self.publisher)['status_forcelist']:
+                        self.logger.warning({"Response status": response.status,
+                                             'Link': link,
+                                             'Response Text Beginning': await response.content.read(100)})
+                        attempt['done'] = True
+                    return
+
+                offset = offset if mode == 'ab' else 0
+                expected_size = self.expected_size(offset, response.headers)
+                sha = await asyncio.to_thread(self.part_sha256, part, offset)
+                f = await asyncio.to_thread(open, part, mode)
+                try:
+                    async for chunk in response.content.iter_chunked(self.chunk_size):
+                        await asyncio.to_thread(f.write, chunk)
+                        sha.update(chunk)
+                finally:
+                    await asyncio.to_thread(f.close)
+                response_headers = response.headers
+            break
+
+        attempt['saved'] = await asyncio.to_thread(self.validate_part, link, filepath, expected_size, sha.hexdigest(), response_headers)
+        attempt['done'] = True
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    async def _async_acquire(limiter):
+        ''' HostLimiter.acquire() without blocking the event loop '''
+        if limiter is None:
+            return
+        wait = limiter.try_acquire()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = limiter.try_acquire()
+
     # *******  *******   *******   *******   *******   *******   *******
     def _sequential_download(self, links, filepaths):
         validation = []
@@ -138,18 +486,194 @@ class Assistant:
         return validation
 
     # *******  *******   *******   *******   *******   *******   *******
-    def download(self, links, filepaths, n_threads = 1):
+    @classmethod
+    def ranges_path(cls, filepath):
+        ''' Ranged downloads: the progress of a .part file (size & version of the remote file, and the byte-ranges already written) '''
+        return cls.part_path(filepath) + '.ranges'
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _probe_ranged(self, link):
+        ''' (size, validators) if the server serves byte-ranges of link, else (None, None) '''
+        response = self.http.head(link)
+        if response.status_code != 200 or response.headers.get('Accept-Ranges', '').lower() != 'bytes':
+            return None, None
+        if not response.headers.get('Content-Length') or 'Content-Encoding' in response.headers:
+            return None, None
+        validators = {k: response.headers[k] for k in ['ETag', 'Last-Modified'] if k in response.headers}
+        return int(response.headers['Content-Length']), validators
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _resume_ranges(self, filepath, size, validators):
+        ''' The ranges already written to the .part file, if it was started for the same remote file. Otherwise, a fresh (pre-allocated) .part. '''
+        part = self.part_path(filepath)
+        try:
+            with open(self.ranges_path(filepath), 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = None
+
+        if state and state['size'] == size and state['validators'] == validators and os.path.exists(part) and os.path.getsize(part) == size:
+            return set(state['done'])
+
+        with open(part, 'wb') as f:
+            f.truncate(size)
+        self._save_ranges(filepath, {'size': size, 'validators': validators, 'done': set()})
+        return set()
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _save_ranges(self, filepath, job):
+        ranges_path = self.ranges_path(filepath)
+        temp_file = ranges_path + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump({'size': job['size'], 'validators': job['validators'], 'done': sorted(job['done'])}, f)
+        os.replace(temp_file, ranges_path)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _fetch_range(self, link, filepath, job, start, pbar):
+        ''' Writes bytes [start, start + range_size) of link into the .part file. Returns True if it was the last missing range of the file. '''
+        end = min(start + self.range_size, job['size']) - 1
+        for try_number in range(self.resume_tries):
+            written = 0
+            try:
+                with self.http.stream(link, headers={'Range': 'bytes={}-{}'.format(start, end)}) as response:
+                    content_range = response.headers.get('Content-Range', '')
+                    if response.status_code != 206 or not content_range.startswith('bytes {}-{}/'.format(start, end)):
+                        raise IOError("Range {}-{} of {} was not served (status: {}, Content-Range: '{}')".format(start, end, link, response.status_code, content_range))
+
+                    with open(self.part_path(filepath), 'r+b') as f:
+                        f.seek(start)
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            f.write(chunk)
+                            written += len(chunk)
+                            pbar.update(len(chunk))
+
+                if written != end - start + 1:
+                    raise IOError("Range {}-{} of {}: {:,} bytes arrived".format(start, end, link, written))
+                break
+
+            except (requests.exceptions.RequestException, IOError) as ex:
+                pbar.update(-written)
+                if try_number == self.resume_tries - 1:
+                    raise
+                self.logger.warning("Range {}-{} of {} failed ({}). Attempt {}/{}".format(start, end, link, repr(ex), try_number + 1, self.resume_tries))
+
+        with job['lock']:
+            job['done'].add(start)
+            self._save_ranges(filepath, job)
+            return len(job['done']) == job['n_ranges']
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _commit_ranged(self, link, filepath, job):
+        self.commit_part(self.part_path(filepath), filepath)
+        os.remove(self.ranges_path(filepath))
+        self._remember(link, filepath, job['validators'], Paths.sha256(filepath), job['size'])
+        if self.on_saved:
+            self.on_saved(filepath)
+        return True
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def ranged_download(self, links, filepaths, n_threads = 4):
+        ''' For few, large files (e.g. the yearly archives): every file is split into byte-ranges (range_size), which are fetched in parallel
+            (all files' ranges share the n_threads), written in place into the file's .part, and the file is committed when all its ranges arrived.
+
+            - progress is reported in bytes
+            - the ranges written so far are recorded next to the .part file, so an interrupted download resumes with the missing ranges only
+            - files smaller than ranged_min_size, or whose server doesn't serve ranges, go through .download()
+
+        :return: validation: list of bools (one per link, in the order of links), as in .download()
+        '''
+        validation = [False] * len(links)
+        jobs = {}
+        plain = []
+        for i, (link, filepath) in enumerate(zip(links, filepaths)):
+            try:
+                size, validators = self._probe_ranged(link)
+            except requests.exceptions.RequestException as ex:
+                self.logger.warning("HEAD request of {} failed ({}). It will be downloaded in one piece.".format(link, repr(ex)))
+                size, validators = None, None
+
+            if size is None or size < self.ranged_min_size:
+                plain.append(i)
+                continue
+
+            done = self._resume_ranges(filepath, size, validators)
+            jobs[i] = {'size': size, 'validators': validators, 'done': done, 'lock': threading.Lock(),
+                       'n_ranges': len(range(0, size, self.range_size))}
+            if done:
+                self.logger.info("Resuming ranged download of {}: {} of {} ranges already downloaded".format(link, len(done), jobs[i]['n_ranges']))
+
+        t = time.time()
+        total = sum(job['size'] for job in jobs.values())
+        resumed = sum(min(self.range_size, job['size'] - start) for job in jobs.values() for start in job['done'])
+        self.logger.info("Starting ranged download of {} files ({:,} bytes, {:,} already downloaded), using {} threads".format(len(jobs), total, resumed, n_threads))
+
+        with Telemetry.stage('download'):
+            pbar = tqdm(total=total, initial=resumed, unit='B', unit_scale=True, unit_divisor=1024,
+                        desc="\tDownloading Progress (ranged)",
+                        **exso._pbar_settings)
+
+            with ThreadPoolExecutor(max_workers=n_threads) as executor:
+                futures = {}
+                for i, job in jobs.items():
+                    missing = [start for start in range(0, job['size'], self.range_size) if start not in job['done']]
+                    if not missing:
+                        validation[i] = self._commit_ranged(links[i], filepaths[i], job)
+                    for start in missing:
+                        futures[executor.submit(self._fetch_range, links[i], filepaths[i], job, start, pbar)] = i
+
+                failed = set()
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        if future.result():
+                            validation[i] = self._commit_ranged(links[i], filepaths[i], jobs[i])
+                    except Exception as ex:
+                        if i not in failed:
+                            self.logger.warning("Ranged download of {} failed ({}). Its .part file is kept, for resuming.".format(links[i], repr(ex)))
+                        failed.add(i)
+            pbar.close()
+
+        self._flush_manifest()
+        self.logger.info("Ranged download completed in {:,} sec".format(round(time.time() - t, 3)))
+
+        if plain:
+            plain_validation = self.download([links[i] for i in plain], [filepaths[i] for i in plain], n_threads)
+            for i, valid in zip(plain, plain_validation):
+                validation[i] = valid
+
+        return validation
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def download(self, links, filepaths, n_threads = 1, engine = None):
+        '''
+        :param n_threads: 'threads' engine: number of threads (if 1, or few links, the download is sequential)
+        :param engine: 'threads' or 'async'. Default: Assistant.download_engine.
+                       'async' keeps up to async_max_in_flight requests in flight (at most async_per_host per host), and requires aiohttp.
+        :return: validation: list of bools (one per link, in the order of links): True if the link was valid and its file was saved
+        '''
+        engine = engine or self.download_engine
+        if engine == 'async':
+            try:
+                import aiohttp
+            except ImportError:
+                self.logger.warning("The async download engine requires aiohttp (pip install exso[async]). Falling back to threads.")
+                engine = 'threads'
 
         t = time.time()
         n_links = len(links)
-        if n_threads > 1 and len(links) > 4:
-            self.logger.info(
-                "Starting multi-threaded download of {} links, using {} threads".format(n_links, n_threads))
-            validation = self._concurrent_download(links, filepaths, n_threads)
-        else:
-            self.logger.info("Starting sequential download of {} links".format(n_links))
-            validation = self._sequential_download(links, filepaths)
+        with Telemetry.stage('download'):
+            if engine == 'async' and n_links > 1:
+                self.logger.info("Starting async download of {} links (max in flight: {}, per host: {})".format(n_links, self.async_max_in_flight, self.async_per_host))
+                validation = self._async_download(links, filepaths)
+            elif n_threads > 1 and len(links) > 4:
+                self.logger.info(
+                    "Starting multi-threaded download of {} links, using {} threads".format(n_links, n_threads))
+                validation = self._concurrent_download(links, filepaths, n_threads)
+            else:
+                self.logger.info("Starting sequential download of {} links".format(n_links))
+                validation = self._sequential_download(links, filepaths)
 
+        self._flush_manifest()
         self.logger.info("Downloading completed in {:,} sec".format(round(time.time() - t, 3)))
         return validation
 
@@ -196,30 +720,13 @@ class Assistant:
 
         filenames = list(map(lambda link: os.path.split(link)[-1], links_to_dnld))
         filepaths = list(map(lambda filename: os.path.join(self.save_dir, filename), filenames))
-        try:
-            # well named files are named as: YYYYMMDD_ReportName_#vv.xls*
-            dates = list(map(lambda filename: DateTime.date_magician(re.findall(r'\d{8}', filename)), filenames))
 
-        except:
-            # some files may have ill-formed names, such as: 20200722_ISP1_ISPResults_ISP1_2020-07-22_20200721140009.xlsx
-            # even if one of those exists, the map() will break. so, doing it with a for loop
-
-            dates = []
-            for fn in filenames:
-                try:
-                    str_date = re.findall(r'\d{8}_', fn)
-                    if len(str_date) == 0: # the file is very ill-formed and will be ignored (very rarely)
-                        continue
-
-                    str_date = str_date[0][:-1] # sdelect the first encounterd 8-digit long batch
-                    dates.append(DateTime.date_magician(str_date))
-                except:
-                    self.logger.error("Failure while extracting dates from links / filepaths")
-                    self.logger.error("Problematic file: {}".format(fn))
-                    self.logger.error("Perceived str_date : {}".format(str_date))
-                    print('Fatal error while trying to assess file: {}'.format(fn))
-
-                    sys.exit()
+        # well named files are named as: YYYYMMDD_ReportName_#vv.xls*
+        # some files may have ill-formed names, such as: 20200722_ISP1_ISPResults_ISP1_2020-07-22_20200721140009.xlsx (see DateTime.dates_from_filenames)
+        parsed = DateTime.dates_from_filenames(filenames)
+        if parsed['dates'].isna().any(): # very ill-formed names: kept (aligned with the links), with a NaT date
+            self.logger.warning("Links without a valid YYYYMMDD date in their names: {}".format(list(parsed['filenames'][parsed['dates'].isna()])))
+        dates = list(parsed['dates'])
 
         return filepaths, filenames, dates
 
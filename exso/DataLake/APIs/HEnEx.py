@@ -5,18 +5,30 @@ import os
 import re
 import shutil
 import sys
-import urllib.request
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
 import numpy as np
 import pandas as pd
+import requests
 from pathlib import Path
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from colorama import Fore
 import exso
 from exso.DataLake.APIs.Assistant import Assistant
+from exso.DataLake.APIs.Sessions import Sessions
 from exso.Utils.DateTime import DateTime
+from exso.Utils.Profiler import Telemetry
 from tqdm import tqdm
 
+try:
+    import lxml # optional: much faster html parsing (pip install lxml)
+    html_parser = 'lxml'
+except ImportError:
+    html_parser = 'html.parser'
+
 # *******  *******   *******   *******   *******   *******   *******
 date_lambda = lambda x: datetime.datetime.strftime(DateTime.date_magician(x, return_stamp = False), format="%d-%b-%y")
 # *******  *******   *******   *******   *******   *******   *******
@@ -34,6 +46,10 @@ def date_wrapper(func):
 ###############################################################################################
 ###############################################################################################
 class API(Assistant):
+    publisher = 'henex'
+    probe_versions = True # HEAD-probe the versions (v01, v02, ...) of every date, and download only the newest one
+    max_versions = 9 # probe mode: highest version probed
+    recheck_days = 3 # probe mode: dates before start_date that are re-probed for newer versions (republished files)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -53,7 +69,8 @@ class API(Assistant):
 
         self.report_name = report_name
 
-        candidate_links = self.get_links(report_name, start_date, end_date) #
+        with Telemetry.stage('link_discovery'):
+            candidate_links = self.get_links(report_name, start_date, end_date) #
 
         candidate_filenames = list(map(lambda x: Path(x).name, candidate_links))
         valid_indices, trivial_indices = self.get_non_trivial_mask(candidate_filenames=candidate_filenames)
@@ -96,11 +113,67 @@ class API(Assistant):
         link_gen = self.get_link_generator(report_name)
         if not link_gen:
             return []
+        elif self.probe_versions:
+            recheck = pd.date_range(pd.Timestamp(start_date) - pd.Timedelta(self.recheck_days, 'D'), start_date, freq='D', inclusive='left')
+            str_dates = list(map(lambda x: DateTime.make_string_date(x, sep=""), recheck)) + str_dates
+            links = self.probe_links(link_gen, str_dates)
+            self.logger.info("Got {} candidate links (newest versions of {} probed dates)".format(len(links), len(str_dates)))
+            return links
         else:
             yolo_links = list(map(lambda x: link_gen.format(x, ver), str_dates))
             self.logger.info("Got {} candidate links".format(len(yolo_links)))
             return yolo_links
 
+    # *******  *******   *******   *******   *******   *******   *******
+    def probe_links(self, link_gen, str_dates, n_threads = 6):
+        ''' The link of the newest version of every date, found with HEAD requests (concurrent over dates, over the pooled henex session).
+
+            Per date, the versions after the newest one already in the lake are probed in order, until the first missing one (early stop).
+            So, a date already in the lake costs a single HEAD request. Every version found is recorded in the link manifest.
+            If HEAD is not answered properly (neither 200 nor 404), the date falls back to its v01 link.
+        '''
+        filename_gen = link_gen.rsplit('/', 1)[-1]
+        in_lake = set(os.listdir(self.save_dir))
+
+        def probe(str_date):
+            versions = range(1, self.max_versions + 1)
+            newest = max([v for v in versions if filename_gen.format(str_date, '{:02d}'.format(v)) in in_lake], default=0)
+            found = []
+            for version in range(newest + 1, self.max_versions + 1):
+                link = link_gen.format(str_date, '{:02d}'.format(version))
+                try:
+                    response = self.http.head(link)
+                    status = response.status_code
+                except requests.exceptions.RequestException as ex:
+                    response, status = None, repr(ex)
+
+                if status == 200:
+                    found.append((str_date, version, link, response.headers))
+                    newest = version
+                    continue
+
+                if newest == 0 and status not in [404, 410]:
+                    self.logger.warning("Version probing of {} failed ({}). Falling back to v01.".format(link, status))
+                    newest = 1
+                break
+
+            link = link_gen.format(str_date, '{:02d}'.format(newest)) if newest else None
+            return link, found
+
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            results = list(executor.map(probe, str_dates))
+
+        found = [f for _, date_found in results for f in date_found]
+        try:
+            self.manifest.record_versions(found)
+        except Exception as ex:
+            self.logger.warning("Failed to record the probed versions in the link manifest ({})".format(repr(ex)))
+
+        republished = sorted({str_date for str_date, version, _, _ in found if version > 1})
+        if republished:
+            self.logger.info("Newer file-versions (v02+) found for dates: {}".format(republished))
+        return [link for link, _ in results if link]
+
     # *******  *******   *******   *******   *******   *******   *******
     @staticmethod
     def link_generators():
@@ -168,6 +241,8 @@ class API(Assistant):
 ###############################################################################################
 class Scrapers(Assistant):
     ''' onlt for categories that cannot be automated '''
+    publisher = 'henex'
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
@@ -185,7 +260,8 @@ class Scrapers(Assistant):
 
         print("\n\tDownloading from Henex Webpage (scraping)")
         try:
-            links, dates, filenames = self.get_links(start_date,end_date)
+            with Telemetry.stage('link_discovery'):
+                links, dates, filenames = self.get_links(start_date,end_date)
         except:
             print(f'\tFailed to connect to henex webpage. This could refer to an archived-only report, in which case ignore the warning.')
             self.logger.warning("Failed to connect in henex via scraping.")
@@ -234,7 +310,7 @@ class Scrapers(Assistant):
         start_date, end_date = self.proactive_check(max_n_pages, n_files_per_page, start_date, end_date)
 
         days_requested = (end_date - start_date).days
-        pages_to_be_read = int(days_requested/n_files_per_page) + 2 # this was +1
+        pages_to_be_read = min(int(days_requested/n_files_per_page) + 2, max_n_pages) # this was +1
 
         start_date_int = int(DateTime.make_string_date(start_date, sep=""))
         end_date_int = int(DateTime.make_string_date(end_date, sep=""))
@@ -288,7 +364,65 @@ class Scrapers(Assistant):
         return start_date, end_date
 
     # *******  *******   *******   *******   *******   *******   *******
-    def iterate(self, max_n_pages, market_url, start_date, end_date):
+    def iterate(self, max_n_pages, market_url, start_date, end_date, n_threads = 6):
+        ''' Reads the portlet's pages (newest dates first), until start_date is reached.
+
+            The page urls are derived from the portlet's pagination parameter (..._cur=N), and fetched concurrently, n_threads pages at a time.
+            The pages of a batch that are older than the page where start_date was reached, are discarded, so the result is the same as
+            following the "next" links one by one (which is still done, if the pagination parameter can't be found).
+        '''
+        first_page = self.web.get_webpage_links(market_url)
+        section = first_page[-1]
+        page_url = self.web.page_url_maker(section) if section else None
+        if page_url is None:
+            self.logger.info("Pagination parameter not found. Following the pagination links page by page.")
+            return self._iterate_serially(max_n_pages, market_url, start_date, end_date)
+
+        links = []; dates = []; filenames = []
+        tqdm._instances.clear()
+        progress_bar = tqdm(total=max_n_pages,
+                            desc='\tScraping Progress: ',
+                            **exso._pbar_settings,
+                            disable=self.dry_run)
+
+        pages = {1: first_page}
+        next_page = 2
+        reached_start = False
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            for page_no in range(1, max_n_pages + 1):
+                if page_no not in pages:
+                    batch = list(range(next_page, min(next_page + n_threads, max_n_pages + 1)))
+                    pages.update(zip(batch, executor.map(lambda n: self.web.get_webpage_links(page_url(n)), batch)))
+                    next_page = batch[-1] + 1
+
+                page_filenames, page_dates, page_links, section = pages.pop(page_no)
+                progress_bar.update(1)
+                if not section or not page_dates:
+                    break
+
+                date_reached = page_dates[-1]
+                progress_bar.set_postfix_str(s=date_lambda(str(date_reached)))
+                self.logger.info("Page {}: \tDate reached: {}".format(page_no, date_reached))
+
+                filenames.extend(page_filenames)
+                links.extend(page_links)
+                dates.extend(page_dates)
+
+                if date_reached < start_date:
+                    reached_start = True
+                    break
+        progress_bar.close()
+        self.logger.info("Scraped {} pages concurrently ({} threads). Start date reached: {}".format(page_no, n_threads, reached_start))
+
+        # consecutive pages may overlap, if the portlet was updated while being read
+        keep = sorted({link: i for i, link in reversed(list(enumerate(links)))}.values())
+        links, dates, filenames = [links[i] for i in keep], [dates[i] for i in keep], [filenames[i] for i in keep]
+
+        links = list(map(lambda x: self.home_url + x, links))
+        return np.array(links), np.array(dates), np.array(filenames)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _iterate_serially(self, max_n_pages, market_url, start_date, end_date):
 
         links = []; dates = []; filenames = []
         url =  market_url
@@ -380,13 +514,53 @@ class Scrapers(Assistant):
             self.home_url = home_url
 
         # *******  *******   *******   *******   *******   *******   *******
-        @staticmethod
-        def get_section(url, selector):
-            html_page = urllib.request.urlopen(url,timeout=2)
-            soup = BeautifulSoup(html_page, 'html.parser')
-            section = soup.findAll('section', selector)[0]
+        page_ttl = 300 # seconds for which a fetched page is re-used (e.g. the first pages, requested by every sniff & query)
+        _pages = {} # url: (fetched at, html)
+        _lock = threading.Lock()
+
+        # *******  *******   *******   *******   *******   *******   *******
+        @classmethod
+        def fetch(cls, url):
+            ''' The html of url, from the page-cache if fetched less than page_ttl seconds ago '''
+            with cls._lock:
+                cached = cls._pages.get(url)
+            if cached and time.monotonic() - cached[0] < cls.page_ttl:
+                return cached[1]
+
+            response = Sessions.get('henex').get(url)
+            response.raise_for_status()
+            with cls._lock:
+                cls._pages = {u: v for u, v in cls._pages.items() if time.monotonic() - v[0] < cls.page_ttl}
+                cls._pages[url] = (time.monotonic(), response.text)
+            return response.text
+
+        # *******  *******   *******   *******   *******   *******   *******
+        @classmethod
+        def get_section(cls, url, selector):
+            # only the portlet's <section> is parsed into a tree, not the whole page
+            soup = BeautifulSoup(cls.fetch(url), html_parser, parse_only=SoupStrainer('section', selector))
+            section = soup.find_all('section', selector)[0]
             return section
 
+        # *******  *******   *******   *******   *******   *******   *******
+        def page_url_maker(self, section):
+            ''' From the "next" link of a page, a function: page number --> page url. None, if the link has no ..._cur parameter '''
+            try:
+                next_url = self.pagination(section)
+            except Exception:
+                return None
+
+            parts = urlsplit(next_url)
+            query = parse_qsl(parts.query, keep_blank_values=True)
+            cur_keys = [k for k, v in query if k.endswith('_cur')]
+            if len(cur_keys) != 1:
+                return None
+
+            def page_url(page_no):
+                new_query = [(k, str(page_no) if k == cur_keys[0] else v) for k, v in query]
+                return urlunsplit(parts._replace(query=urlencode(new_query)))
+            return page_url
+
         # *******  *******   *******   *******   *******   *******   *******
         @staticmethod
         def pagination(section):
@@ -6,13 +6,14 @@ import warnings
 from pathlib import Path
 import numpy as np
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 from colorama import Fore
 import exso
 from exso.DataLake.APIs import ZipHandler
 from exso.DataLake.APIs.Assistant import Assistant
 from exso.Utils.DateTime import DateTime
+from exso.Utils.Paths import Paths
+from exso.Utils.Profiler import Telemetry
 from tqdm import tqdm
 
 # *******  *******   *******   *******   *******   *******   *******
@@ -33,6 +34,8 @@ date_lambda = lambda x: datetime.datetime.strftime(DateTime.date_magician(x, ret
 # *******  *******   *******   *******   *******   *******   *******
 # *******  *******   *******   *******   *******   *******   *******
 class ArchiveScraper(Assistant):
+    publisher = 'henex'
+
     def __init__(self, save_dir:str|Path):
         ''' save_dir should be:
             Either an empty henex-report type (e.g. root_lake / henex / DAM_Results)
@@ -44,7 +47,7 @@ class ArchiveScraper(Assistant):
         if isinstance(save_dir, str):
             save_dir = Path(save_dir)
 
-        if len(list(save_dir.glob('*'))) != 0:
+        if len(Paths.visible(save_dir)) != 0:
             warnings.warn("Caution: The directory provided was not empty. ({})".format(save_dir))
             input("Caution: The directory provided was not empty. ({}). Proceed? ".format(save_dir))
 
@@ -65,7 +68,8 @@ class ArchiveScraper(Assistant):
         anchor_text_must_contain = self.anchor_text_must_contain
         anchor_text_must_not_contain = self.anchor_text_must_not_contain
 
-        all_anchors = self._get_anchors(archive_url)
+        with Telemetry.stage('link_discovery'):
+            all_anchors = self._get_anchors(archive_url)
         filtered_anchors = self._filter_anchors(anchors=all_anchors, anchor_text_must_contain=anchor_text_must_contain, anchor_text_must_not_contain=anchor_text_must_not_contain)
         links, filepaths = self._get_links_and_filepaths(filtered_anchors, base_url, save_dir)
 
@@ -100,7 +104,7 @@ class ArchiveScraper(Assistant):
     # *******  *******   *******   *******   *******   *******   *******
     def _get_anchors(self, archive_url, href_prefix = '"/el/c/document_library"'):
 
-        response = requests.get(archive_url).text
+        response = self.http.get(archive_url).text
         soup = BeautifulSoup(response, 'html.parser')
         anchors = soup.select('a[href^={}]'.format(href_prefix))
 
@@ -202,7 +206,7 @@ class MarketArchive(ArchiveScraper):
         print('\n\t\t*HEnEx API is a joke because, only some report-types can be downloaded, and only within approximately the last year. \n\t\t Previous data cannot be downloaded')
         print('\n\t\t**HEnEx Archive is also a joke, because it used to be one zip per report per year, again, only for some data. \n\t\t  Now, they mixed report-types together, and still, they have mistakes in years and missing data.')
         print('\n\tThus, this cold-start overhead is necessary for later smooth usage. \n\tAfter that, the henex api or scraping process are used to get the recent files (i.e. belonging in the current calendar year)')
-        print('\n\tTotal Size ~1GB, so may take up to 5-20 minutes, depending on you internet speed. \n\t(The progress bar in multi-threaded zipfiles is not always representative. Even if it seems stuck, leave it running)')
+        print('\n\tTotal Size ~1GB, so may take up to 5-20 minutes, depending on you internet speed. \n\t(The archives are downloaded in byte-ranges, in parallel. If the download is interrupted, the next run resumes it)')
         print('\n\t---> IMPORTANT: Do not interrupt this process.')
         print('\t     ^^^^^^^^^')
         print('\t                (If by accident you do, it\'s best that you DELETE the whole datalake > henex directory, and re-launch the process.)\n\n')
@@ -225,7 +229,11 @@ class MarketArchive(ArchiveScraper):
         self.n_links = len(self.links)
         self.link_dates = list(map(lambda x: re.findall(r'\d+', str(x)), self.filepaths))
 
-        self.download(self.links, self.filepaths, n_threads=n_threads)
+        self.ranged_download(self.links, self.filepaths, n_threads=max(n_threads, 4))
+
+        if ZipHandler.ZipHandler.keep_zipped:
+            self.link_archives()
+            return
 
         zh = ZipHandler.ZipHandler(zipped_dir = self.save_dir, extract_to_dir = self.save_dir, must_not_contain = 'DryRun')
         zh.run(move_to_dst = True, delete_leftovers = True)
@@ -233,6 +241,22 @@ class MarketArchive(ArchiveScraper):
         pool_cleaner = ZipHandler.PoolCleaner(pool_dir = self.save_dir, new_root = self.save_dir.parent, split_in_categs = self.categories, renamer = self.renamer)
         pool_cleaner.clean()
 
+    # *******  *******   *******   *******   *******   *******   *******
+    def link_archives(self):
+        ''' Keep-zipped mode: the archives (they mix report-types) are moved to a shared pool-dir (henex/.archives), and every
+            report-type dir gets a links-file with the virtual paths of its members. Nothing is extracted.
+        '''
+        pool_dir = self.save_dir.parent / '.archives'
+        pool_dir.mkdir(exist_ok = True)
+        for zf in self.save_dir.glob('*.zip'):
+            shutil.move(zf, pool_dir / zf.name)
+
+        zh = ZipHandler.ZipHandler(zipped_dir = pool_dir, extract_to_dir = pool_dir, must_not_contain = 'DryRun')
+        zh.run()
+
+        pool_cleaner = ZipHandler.PoolCleaner(pool_dir = pool_dir, new_root = self.save_dir.parent, split_in_categs = self.categories, renamer = self.renamer)
+        pool_cleaner.link(zh.payload)
+
 
 # *******  *******   *******   *******   *******   *******   *******
 # *******  *******   *******   *******   *******   *******   *******
@@ -0,0 +1,218 @@
+import contextlib
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+from exso import Files
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class HostLimiter:
+    ''' Token bucket (requests per second, with a burst) plus a cap on the requests in flight, for a single host.
+
+        Both adapt to the server (AIMD): a throttling response (429/5xx) halves the rate and the in-flight cap, and pauses the host
+        for the Retry-After period. Every successful response raises them again, additively, up to their configured values.
+    '''
+    def __init__(self, host, rate = 10.0, burst = 20, max_in_flight = 8, min_rate = 0.5):
+        self.host = host
+        self.max_rate = float(rate)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+
+        self.rate = self.max_rate
+        self.cap = max_in_flight
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._cond = threading.Condition()
+        self._successes = 0
+
+        self.queued = 0
+        self.in_flight = 0
+        self.acquired = 0
+        self.throttled = 0
+        self.waited_sec = 0.0
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _try_take(self):
+        ''' Takes a token and an in-flight slot, if both are available (returns 0). Otherwise, returns the seconds to wait. Caller holds the lock. '''
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.in_flight >= self.cap:
+            return None # until a release
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+
+        self.tokens -= 1
+        self.in_flight += 1
+        self.acquired += 1
+        return 0
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def acquire(self):
+        t = time.monotonic()
+        with self._cond:
+            self.queued += 1
+            try:
+                wait = self._try_take()
+                while wait != 0:
+                    self._cond.wait(timeout=wait)
+                    wait = self._try_take()
+            finally:
+                self.queued -= 1
+                self.waited_sec += time.monotonic() - t
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def try_acquire(self):
+        ''' Non-blocking .acquire() (for the asyncio engine): 0 if acquired, else the seconds to wait before trying again '''
+        with self._cond:
+            wait = self._try_take()
+        return 0.05 if wait is None else wait
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def release(self, status = None):
+        ''' status: http status of the response (None if the request failed). Successes (< 400) restore the rate & cap, additively. '''
+        with self._cond:
+            self.in_flight -= 1
+            if status is not None and status < 400:
+                self.rate = min(self.rate + self.max_rate / 20, self.max_rate)
+                self._successes += 1
+                if self._successes >= self.cap and self.cap < self.max_in_flight:
+                    self.cap += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def throttle(self, retry_after = None):
+        ''' The server pushed back (429/5xx): halve the rate & the in-flight cap, and pause the host for retry_after seconds '''
+        with self._cond:
+            self.throttled += 1
+            self.rate = max(self.rate / 2, self.min_rate)
+            self.cap = max(self.cap // 2, 1)
+            self._successes = 0
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def metrics(self):
+        with self._cond:
+            return {'queued': self.queued,
+                    'in_flight': self.in_flight,
+                    'acquired': self.acquired,
+                    'throttled': self.throttled,
+                    'waited_sec': round(self.waited_sec, 3),
+                    'rate': round(self.rate, 3),
+                    'max_in_flight': self.cap}
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class RateLimiter:
+    ''' Process-wide registry of HostLimiters: every request to a host (from any thread, report, or download engine) acquires from the same one.
+
+        Settings: the "hosts" section of Files/http_settings.json ("default", overridden per host name).
+        RateLimiter.share scales the rate and the in-flight cap of every host: in scheduler mode, each process gets its share
+        of the per-publisher budget (1 / max_per_publisher), so that N processes don't multiply the load on a server.
+
+        Usage: with RateLimiter.slot(url) as slot:
+                    response = ...
+                    slot.status = response.status_code
+    '''
+    settings_file = Files.files_dir / 'http_settings.json'
+    enabled = True
+    share = 1.0
+    _limiters = {}
+    _settings = None
+    _lock = threading.Lock()
+    logger = logging.getLogger(__name__ + '.RateLimiter')
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def settings(cls, host) -> dict:
+        if cls._settings is None:
+            with open(cls.settings_file, 'r') as f:
+                cls._settings = json.load(f).get('hosts', {})
+        settings = {'rate': 10.0, 'burst': 20, 'max_in_flight': 8, 'min_rate': 0.5}
+        settings.update(cls._settings.get('default', {}))
+        settings.update(cls._settings.get(host, {}))
+        return settings
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def get(cls, host) -> HostLimiter:
+        limiter = cls._limiters.get(host)
+        if limiter is None:
+            with cls._lock:
+                limiter = cls._limiters.get(host)
+                if limiter is None:
+                    s = cls.settings(host)
+                    limiter = cls._limiters[host] = HostLimiter(host,
+                                                                rate = s['rate'] * cls.share,
+                                                                burst = max(int(s['burst'] * cls.share), 1),
+                                                                max_in_flight = max(int(s['max_in_flight'] * cls.share), 1),
+                                                                min_rate = s['min_rate'])
+        return limiter
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def host_of(url):
+        return urlsplit(url).hostname or ''
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    @contextlib.contextmanager
+    def slot(cls, url):
+        ''' Holds a token & an in-flight slot of the url's host for the duration of the block. Set slot.status to feed the response back. '''
+        if not cls.enabled:
+            yield _Slot()
+            return
+
+        limiter = cls.get(cls.host_of(url))
+        limiter.acquire()
+        slot = _Slot()
+        try:
+            yield slot
+        finally:
+            limiter.release(slot.status)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def throttle(cls, host, retry_after = None):
+        if cls.enabled:
+            cls.get(host).throttle(retry_after)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def metrics(cls) -> dict:
+        ''' {host: {queued, in_flight, acquired, throttled, waited_sec, rate, max_in_flight}} '''
+        return {host: limiter.metrics() for host, limiter in list(cls._limiters.items())}
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def reset(cls, share = None):
+        with cls._lock:
+            cls._limiters = {}
+            cls._settings = None
+            if share is not None:
+                cls.share = share
+
+
+# *******  *******   *******   *******   *******   *******   *******
+class _Slot:
+    status = None
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
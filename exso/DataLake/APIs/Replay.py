@@ -0,0 +1,297 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from exso.DataLake.APIs.Sessions import Sessions
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class Cassette:
+    ''' A directory of recorded http responses:
+            index.json: {"<METHOD> <url>": {"status", "headers", "body" (sha256 of the body, or null)}}
+            bodies/<sha256>: response bodies (identical payloads are stored once)
+    '''
+    kept_headers = ['Content-Type', 'ETag', 'Last-Modified', 'Accept-Ranges', 'Content-Disposition']
+
+    def __init__(self, dir:str|Path):
+        self.dir = Path(dir)
+        self.index_path = self.dir / 'index.json'
+        self.bodies_dir = self.dir / 'bodies'
+        self._lock = threading.Lock()
+        try:
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def add(self, method, url, status, headers, body = None):
+        entry = {'status': status,
+                 'headers': {k: headers[k] for k in self.kept_headers if k in headers},
+                 'body': None}
+        if body is not None:
+            entry['body'] = hashlib.sha256(body).hexdigest()
+            body_path = self.bodies_dir / entry['body']
+            if not body_path.exists():
+                self.bodies_dir.mkdir(exist_ok=True, parents=True)
+                body_path.write_bytes(body)
+
+        with self._lock:
+            self.index['{} {}'.format(method, url)] = entry
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def save(self):
+        self.dir.mkdir(exist_ok=True, parents=True)
+        with self._lock:
+            with open(self.index_path, 'w') as f:
+                json.dump(self.index, f, indent=1)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def lookup(self, method, url):
+        ''' (status, headers, body_path) of the recorded response. HEAD requests are answered from the GET recording, if there is one. '''
+        entry = self.index.get('{} {}'.format(method, url))
+        if method == 'HEAD' and 'GET {}'.format(url) in self.index:
+            entry = self.index['GET {}'.format(url)]
+        if entry is None:
+            return None
+        body_path = self.bodies_dir / entry['body'] if entry['body'] else None
+        return entry['status'], entry['headers'], body_path
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def links(self, pattern = None):
+        ''' The recorded GET urls with a body (optionally, only those matching the regex pattern) '''
+        urls = [key.split(' ', 1)[1] for key, entry in self.index.items() if key.startswith('GET ') and entry['body'] and entry['status'] == 200]
+        return [u for u in urls if not pattern or re.search(pattern, u)]
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class Recorder:
+    ''' Record mode: every (complete) response that goes through the pooled sessions is saved into a cassette.
+
+        Usage: with Recorder(cassette_dir):
+                    StreamHandler(save_dir).query(...)
+
+        Only the requests-based download paths are recorded (use download_engine = 'threads'). Partial (206) responses are not recorded,
+        so ranged downloads are switched off while recording: the replay server serves byte-ranges out of the complete bodies.
+    '''
+    def __init__(self, cassette_dir:str|Path):
+        self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.cassette = Cassette(cassette_dir)
+        self.n_recorded = 0
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _hook(self, response, *args, **kwargs):
+        if response.status_code == 206 or response.request.method not in ['GET', 'HEAD']:
+            return response
+        body = response.content if response.request.method == 'GET' else None # a streamed body is kept, and re-served to the caller
+        self.cassette.add(response.request.method, response.request.url, response.status_code, response.headers, body)
+        self.n_recorded += 1
+        return response
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _install(self, session):
+        session.session.hooks['response'].append(self._hook)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def __enter__(self):
+        from exso.DataLake.APIs.Assistant import Assistant
+        self._ranged_min_size = Assistant.ranged_min_size
+        Assistant.ranged_min_size = float('inf')
+        Sessions.reset()
+        Sessions.on_create = self._install
+        return self
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def __exit__(self, *exc):
+        from exso.DataLake.APIs.Assistant import Assistant
+        Assistant.ranged_min_size = self._ranged_min_size
+        Sessions.on_create = None
+        Sessions.reset()
+        self.cassette.save()
+        self.logger.info("Recorded {} responses into: {}".format(self.n_recorded, self.cassette.dir))
+        return False
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # keep-alive, as the publishers' servers
+    server = None
+
+    def do_HEAD(self):
+        self._serve(send_body = False)
+
+    def do_GET(self):
+        self._serve(send_body = True)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _serve(self, send_body):
+        replay = self.server.replay
+        url = replay.original_url(self.path)
+        found = replay.cassette.lookup(self.command, url) if url else None
+        time.sleep(replay.latency)
+
+        if found is None:
+            replay.count('misses')
+            self._respond(404, {}, b'')
+            return
+
+        status, headers, body_path = found
+        body = body_path.read_bytes() if body_path else b''
+        replay.count('hits')
+
+        if headers.get('ETag') and self.headers.get('If-None-Match') == headers['ETag']:
+            self._respond(304, headers, b'', send_body)
+            return
+
+        byte_range = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+        if byte_range and status == 200:
+            start = int(byte_range.group(1))
+            end = min(int(byte_range.group(2) or len(body) - 1), len(body) - 1)
+            if start > end:
+                self._respond(416, {'Content-Range': 'bytes */{}'.format(len(body))}, b'', send_body)
+                return
+            headers = dict(headers, **{'Content-Range': 'bytes {}-{}/{}'.format(start, end, len(body))})
+            status, body = 206, body[start:end + 1]
+
+        self._respond(status, dict(headers, **{'Accept-Ranges': 'bytes'}), body, send_body)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _respond(self, status, headers, body, send_body = True):
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not send_body:
+            return
+
+        bandwidth = self.server.replay.bandwidth
+        chunk_size = 64 * 1024
+        t0 = time.perf_counter()
+        for i in range(0, len(body), chunk_size):
+            self.wfile.write(body[i:i + chunk_size])
+            if bandwidth:
+                ahead = (i + chunk_size) / bandwidth - (time.perf_counter() - t0)
+                if ahead > 0:
+                    time.sleep(ahead)
+        self.server.replay.count('bytes', len(body))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def log_message(self, *args):
+        pass
+
+
+# *******  *******   *******   *******   *******   *******   *******
+class _ReplayAdapter(HTTPAdapter):
+    ''' Sends every request of a pooled session to the replay server (same retry policy and pool size as the session's own adapter) '''
+    def __init__(self, replay, **kwargs):
+        self.replay = replay
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        request.url = self.replay.local_url(request.url)
+        kwargs['proxies'] = {}
+        return super().send(request, **kwargs)
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class ReplayServer:
+    ''' Replay mode: a local http server that answers from a cassette, with a configurable latency and bandwidth.
+
+        - .install(): the pooled sessions (all publishers) send their requests to this server instead of the real hosts,
+                      so StreamHandler, HEnEx, ADMIE and HEnExArchives run end-to-end, offline (rate limiter & retries included)
+        - .local_url(url): the url of the recorded response on this server (e.g. to feed Assistant.download(engine = 'async') directly)
+        - supports HEAD, byte-ranges (206) and If-None-Match (304). Unknown urls are answered with 404 (and counted as misses).
+
+        :param latency: seconds before each response
+        :param bandwidth: bytes per second, per response (None: unthrottled)
+
+        Usage: with ReplayServer(cassette_dir, latency = 0.1, bandwidth = 2e6) as replay:
+                    StreamHandler(save_dir).query(...)
+    '''
+    def __init__(self, cassette_dir:str|Path, latency = 0.0, bandwidth = None, port = 0):
+        self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.cassette = Cassette(cassette_dir)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.stats = {'hits': 0, 'misses': 0, 'bytes': 0}
+        self._stats_lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), _ReplayHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.request_queue_size = 1024
+        self.httpd.replay = self
+        self.base_url = 'http://127.0.0.1:{}'.format(self.httpd.server_address[1])
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def count(self, stat, n = 1):
+        with self._stats_lock:
+            self.stats[stat] += n
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def local_url(self, url):
+        ''' https://host/path?query --> http://127.0.0.1:port/https/host/path?query '''
+        parts = urlsplit(url)
+        return '{}/{}/{}{}{}'.format(self.base_url, parts.scheme, parts.netloc, parts.path or '/', '?' + parts.query if parts.query else '')
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def original_url(path):
+        found = re.match(r'/(https?)/([^/]+)(/.*)?$', path)
+        if not found:
+            return None
+        return '{}://{}{}'.format(found.group(1), found.group(2), found.group(3) or '/')
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _install(self, session):
+        adapter = session.session.get_adapter('https://')
+        replay_adapter = _ReplayAdapter(self, pool_maxsize = session.settings['pool_maxsize'], max_retries = adapter.max_retries)
+        session.session.mount('https://', replay_adapter)
+        session.session.mount('http://', replay_adapter)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def install(self):
+        Sessions.reset()
+        Sessions.on_create = self._install
+        return self
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def stop(self):
+        if Sessions.on_create == self._install:
+            Sessions.on_create = None
+            Sessions.reset()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def __enter__(self):
+        return self.start().install()
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def __exit__(self, *exc):
+        self.stop()
+        self.logger.info("Replay stats: {}".format(self.stats))
+        return False
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
@@ -0,0 +1,208 @@
+import contextlib
+import copy
+import json
+import logging
+import random
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from exso import Files
+from exso.DataLake.APIs.RateLimiter import RateLimiter
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class JitteredRetry(Retry):
+    ''' urllib3 Retry, with exponential backoff plus a random jitter (so that concurrent threads don't retry in lock-step),
+        a cap on the backoff, and a cap on the server's Retry-After (429/503 responses)
+    '''
+    def __init__(self, *args, jitter = 0.0, backoff_cap = 60, max_retry_after = 300, **kwargs):
+        self.jitter = jitter
+        self.backoff_cap = backoff_cap
+        self.max_retry_after = max_retry_after
+        super().__init__(*args, **kwargs)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def new(self, **kwargs):
+        # urllib3 creates a new Retry object after every attempt, from the __init__ parameters it knows of
+        retry = super().new(**kwargs)
+        retry.jitter = self.jitter
+        retry.backoff_cap = self.backoff_cap
+        retry.max_retry_after = self.max_retry_after
+        return retry
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def increment(self, method = None, url = None, response = None, error = None, _pool = None, _stacktrace = None):
+        # every throttling response (not only the last one) is fed back to the host's rate limiter
+        if response is not None and _pool is not None and response.status in self.status_forcelist:
+            RateLimiter.throttle(_pool.host, retry_after = self.get_retry_after(response))
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return 0
+        return min(backoff + random.uniform(0, self.jitter), self.backoff_cap)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def parse_retry_after(self, retry_after):
+        return min(super().parse_retry_after(retry_after), self.max_retry_after)
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class PublisherSession:
+    ''' A pooled requests.Session of a single publisher, with its retry policy, timeouts and proxies.
+        Shared by all the threads that download from this publisher (the connection pool of the adapter is thread-safe).
+        Every request acquires from the host's RateLimiter first.
+    '''
+    def __init__(self, publisher, settings:dict):
+        self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.publisher = publisher
+        self.settings = settings
+        self.timeout = (settings['connect_timeout'], settings['read_timeout'])
+        self.fallback_proxies = settings['fallback_proxies']
+
+        retry = JitteredRetry(total = settings['retries'],
+                              backoff_factor = settings['backoff_factor'],
+                              jitter = settings['backoff_jitter'],
+                              backoff_cap = settings['backoff_max'],
+                              max_retry_after = settings['max_retry_after'],
+                              status_forcelist = settings['status_forcelist'],
+                              allowed_methods = ['HEAD', 'GET', 'OPTIONS'],
+                              respect_retry_after_header = True,
+                              raise_on_status = False) # after the last retry, the (non-200) response is returned to the caller
+
+        adapter = HTTPAdapter(pool_connections = 4, pool_maxsize = settings['pool_maxsize'], max_retries = retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.proxies.update(settings['proxies'])
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.exceptions.ConnectionError as ex:
+            if not self.fallback_proxies or 'proxies' in kwargs:
+                raise
+            self.logger.info("Connection to {} failed ({}). Retrying through the fallback proxies.".format(url, ex.__class__.__name__))
+            return self.session.request(method, url, proxies = self.fallback_proxies, **kwargs)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def request(self, method, url, **kwargs):
+        ''' session.request() with the configured timeout, within a rate-limiter slot of the host.
+            If the connection fails (after the retries), the fallback proxies are tried once.
+            With stream = True, the slot is released as soon as the headers arrive: use .stream() to hold it for the whole transfer.
+        '''
+        with RateLimiter.slot(url) as slot:
+            response = self._request(method, url, **kwargs)
+            slot.status = response.status_code
+        return response
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @contextlib.contextmanager
+    def stream(self, url, **kwargs):
+        ''' Streamed GET, holding the host's rate-limiter slot until the response is consumed and closed '''
+        with RateLimiter.slot(url) as slot:
+            with self._request('GET', url, stream = True, **kwargs) as response:
+                slot.status = response.status_code
+                yield response
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def head(self, url, **kwargs):
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('HEAD', url, **kwargs)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def close(self):
+        self.session.close()
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class Sessions:
+    ''' One shared PublisherSession per publisher (keep-alive connection pooling across all the requests of a process).
+
+        Settings are read from Files/http_settings.json: "default", overridden per publisher ("admie", "henex", "entsoe").
+        To use another settings file, set Sessions.settings_file before the first request (or call Sessions.reset() afterwards).
+        Sessions.on_create: optional callable(PublisherSession), applied to every new session (e.g. the Replay recorder/server hooks).
+
+        Usage: Sessions.get('admie').get(url)
+    '''
+    settings_file = Files.files_dir / 'http_settings.json'
+    on_create = None
+    _settings = None
+    _sessions = {}
+    _lock = threading.Lock()
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def _load(cls):
+        if cls._settings is None:
+            with open(cls.settings_file, 'r') as f:
+                cls._settings = json.load(f)
+        return cls._settings
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def settings(cls, publisher = None) -> dict:
+        ''' The effective settings of a publisher (defaults, updated with its own entry) '''
+        with cls._lock:
+            all_settings = cls._load()
+        settings = copy.deepcopy(all_settings['default'])
+        if publisher:
+            settings.update(copy.deepcopy(all_settings.get(publisher.lower(), {})))
+        return settings
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def get(cls, publisher = None) -> PublisherSession:
+        key = publisher.lower() if publisher else 'default'
+        session = cls._sessions.get(key)
+        if session is None:
+            settings = cls.settings(publisher)
+            with cls._lock:
+                session = cls._sessions.get(key)
+                if session is None:
+                    session = PublisherSession(key, settings)
+                    if cls.on_create is not None:
+                        cls.on_create(session)
+                    cls._sessions[key] = session
+        return session
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def backoff_time(settings, try_number, retry_after = None):
+        ''' Seconds to wait before retry no. try_number + 1, for clients that don't go through a PublisherSession (the async engine) '''
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), settings['max_retry_after'])
+            except ValueError:
+                pass # an http-date: fall back to the exponential backoff
+        backoff = settings['backoff_factor'] * 2 ** try_number + random.uniform(0, settings['backoff_jitter'])
+        return min(backoff, settings['backoff_max'])
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def reset(cls):
+        ''' Close all sessions and re-read the settings file on the next request '''
+        with cls._lock:
+            for session in cls._sessions.values():
+                session.close()
+            cls._sessions = {}
+            cls._settings = None
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
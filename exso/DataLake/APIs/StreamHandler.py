@@ -5,9 +5,10 @@ from pathlib import Path
 
 import numpy as np
 import pandas as pd
-from exso.DataLake.APIs import ADMIE, HEnEx
+from exso.DataLake.APIs import ADMIE, HEnEx, ZipHandler
 from exso.DataLake.APIs import HEnExArchives
 from exso.Utils.DateTime import DateTime
+from exso.Utils.Paths import Paths
 from exso.Utils.Misc import Misc
 
 # *******  *******   *******   *******   *******   *******   *******
@@ -29,15 +30,17 @@ def date_wrapper(func):
 ###############################################################################################
 ###############################################################################################
 class StreamHandler:
-    def __init__(self, save_dir):
+    def __init__(self, save_dir, on_saved = None):
+        ''' on_saved: optional callable(filepath), passed to the api objects. Not applied to the (zipped) archives. '''
         self.save_dir = save_dir
+        self.on_saved = on_saved
         self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
 
     # *******  *******   *******   *******   *******   *******   *******
     # *******  *******   *******   *******   *******   *******   *******
     @date_wrapper
-    def query(self, report_name, start_date, end_date, publisher, dry_run = False):
-
+    def query(self, report_name, start_date, end_date, publisher, dry_run = False, check_revisions = False):
+        ''' check_revisions: (admie) the already downloaded files of the date-range are checked for revisions at the source (see Assistant.check_revisions) '''
         self.dry_run = dry_run
 
         archive_api = self.archive_bypass(publisher, report_name, dry_run)
@@ -50,16 +53,19 @@ class StreamHandler:
 
             if api_class:
                 api = api_class(self.save_dir)
+                api.on_saved = self.on_saved
                 api.query(report_name, start_date=query_start, end_date=query_end, dry_run=dry_run, n_threads = 6)
             else:
                 api = archive_api
 
         elif publisher == 'admie':
             api = ADMIE.API(self.save_dir)
-            api.query(report_name, start_date=start_date, end_date=end_date, dry_run=dry_run, n_threads = 6)
+            api.on_saved = self.on_saved
+            api.query(report_name, start_date=start_date, end_date=end_date, dry_run=dry_run, n_threads = 6, check_revisions = check_revisions)
 
         elif publisher == 'entsoe':
             api = Entsoe.API(self.save_dir)
+            api.on_saved = self.on_saved
             api.query(report_name, start_date=start_date, end_date=end_date,dry_run=dry_run, n_threads = 1)
 
         self.api = api
@@ -80,7 +86,7 @@ class StreamHandler:
     # *******  *******   *******   *******   *******   *******   *******
     def archive_bypass(self, publisher, report_name, dry_run):
         sys.stdout = sys.__stdout__
-        lake_content = len(list(Path(self.save_dir).glob('*')))
+        lake_content = len(Paths.visible(Path(self.save_dir))) + (Path(self.save_dir) / ZipHandler.ZipHandler.links_filename).exists() # kept-zipped archive members count as content
 
         exclude_from_triggers_to_download_archive = ['IDM_XBID_Results', 'DAM_GasVTP', 'IDM_IDA1_Results',
                                                      'IDM_IDA2_Results', 'IDM_IDA3_Results', 'IDM_IDA1_AggDemandSupplyCurves',
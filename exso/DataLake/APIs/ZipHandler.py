@@ -1,4 +1,9 @@
 import re, os
+import fnmatch
+import functools
+import hashlib
+import io
+import json
 import shutil
 from pathlib import Path
 from zipfile import ZipFile
@@ -6,12 +11,23 @@ import logging
 import haggis.string_util
 import numpy as np
 import pandas as pd
+from exso.Utils.Paths import Paths
+from exso.Utils.Profiler import Telemetry
 
 
 ###############################################################################################
 ###############################################################################################
 ###############################################################################################
 class ZipHandler:
+    ''' Deep-unzips the zipfiles of a directory, and moves the payload files (must_contain) to extract_to_dir.
+
+        With ZipHandler.keep_zipped = True, nothing is extracted: .run() only indexes the payload members of the zipfiles (nested zips included),
+        as virtual paths: "archive.zip::dir/member.xlsx" (or "archive.zip::inner.zip::member.xlsx"). Readers load them with ZipHandler.open_member().
+    '''
+    keep_zipped = False
+    member_sep = '::'
+    links_filename = '.archives.json' # virtual paths of members of archives kept elsewhere (see PoolCleaner.link())
+
     def __init__(self, zipped_dir:str|Path|None, zip_filepaths:list|None = None, extract_to_dir:str|Path|None=None, must_contain:str|None = '*.xls*', must_not_contain = None):
         self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
 
@@ -66,12 +82,18 @@ class ZipHandler:
 
     # *******  *******   *******   *******   *******   *******   *******
     def run(self, move_to_dst =True, delete_leftovers = True):
-        self.deep_unzip()
-        if move_to_dst:
-            self.move_to_destination()
+        if self.keep_zipped:
+            with Telemetry.stage('zip_index'):
+                self.payload = self.index_members()
+            return
 
-        if delete_leftovers:
-            self.delete_leftovers()
+        with Telemetry.stage('unzip'):
+            self.deep_unzip()
+            if move_to_dst:
+                self.move_to_destination()
+
+            if delete_leftovers:
+                self.delete_leftovers()
 
     # *******  *******   *******   *******   *******   *******   *******
     def deep_unzip(self):
@@ -146,6 +168,97 @@ class ZipHandler:
         with ZipFile(zipfile, 'r') as zipper:
             zipper.extractall(to_dir)
 
+    # *******  *******   *******   *******   *******   *******   *******
+    def index_members(self):
+        ''' Virtual paths of the payload members (must_contain / must_not_contain) of all the zipfiles in zipped_dir, recursing into nested zips '''
+        members = []
+        for zf in self.scan_for_zipfiles(ignore = self.ignore_zips):
+            if self.must_not_contain and bool(re.search(self.must_not_contain, zf.name)):
+                continue
+            try:
+                with ZipFile(zf, 'r') as zipper:
+                    members.extend(self._walk(zipper, str(zf) + self.member_sep))
+            except Exception as ex:
+                self.logger.warning("Could not index zipfile {}: {}".format(zf, ex))
+
+        self.logger.info("Indexed {} payload members of the zipfiles in {}".format(len(members), self.zipped_dir))
+        return members
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _walk(self, zipper, prefix):
+        members = []
+        for info in zipper.infolist():
+            if info.is_dir():
+                continue
+            name = info.filename.rsplit('/', 1)[-1]
+            if name.lower().endswith('.zip'):
+                if not (self.must_not_contain and bool(re.search(self.must_not_contain, name))):
+                    with ZipFile(io.BytesIO(zipper.read(info)), 'r') as inner:
+                        members.extend(self._walk(inner, prefix + info.filename + self.member_sep))
+                continue
+
+            if self.must_contain and not fnmatch.fnmatch(name, self.must_contain):
+                continue
+            if self.must_not_contain and self.must_not_contain in name:
+                continue
+            members.append(prefix + info.filename)
+        return members
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def is_member(cls, path):
+        return cls.member_sep in str(path)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def open_member(cls, path):
+        ''' In-memory (BytesIO) file-object of a zip member, from its virtual path. Nothing is written to disk. '''
+        zip_path, *nested, member = str(path).split(cls.member_sep)
+        if nested:
+            zipper = ZipFile(io.BytesIO(cls._nested_bytes(zip_path, tuple(nested), os.path.getmtime(zip_path))), 'r')
+        else:
+            zipper = ZipFile(zip_path, 'r')
+        with zipper:
+            return io.BytesIO(zipper.read(member))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def stat(cls, path) -> os.stat_result:
+        ''' os.stat of a lake file. For a zip member (virtual path), os.stat of its archive: the member can only change if the archive does. '''
+        return os.stat(str(path).split(cls.member_sep, 1)[0])
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def sha256(cls, path) -> tuple:
+        ''' (size, sha256) of a lake file, or of a zip member (read in memory) '''
+        if cls.is_member(path):
+            data = cls.open_member(path).getbuffer()
+            return len(data), hashlib.sha256(data).hexdigest()
+        return os.path.getsize(path), Paths.sha256(path)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    @functools.lru_cache(maxsize = 2)
+    def _nested_bytes(zip_path, nested, mtime):
+        # the members of a nested zip are read one after the other: keep the last inner zips in memory, instead of re-inflating them per member
+        with ZipFile(zip_path, 'r') as zipper:
+            data = zipper.read(nested[0])
+        for inner in nested[1:]:
+            with ZipFile(io.BytesIO(data), 'r') as zipper:
+                data = zipper.read(inner)
+        return data
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def linked_members(cls, dir):
+        ''' Virtual paths listed in the dir's links-file (members of archives kept in a shared pool), if any '''
+        links_path = Path(dir) / cls.links_filename
+        if not links_path.exists():
+            return []
+        with open(links_path, 'r') as f:
+            relative = json.load(f)
+        return [os.path.normpath(os.path.join(dir, zip_path)) + cls.member_sep + member for zip_path, member in (p.split(cls.member_sep, 1) for p in relative)]
+
 
     # *******  *******   *******   *******   *******   *******   *******
     # *******  *******   *******   *******   *******   *******   *******
@@ -205,4 +318,21 @@ class PoolCleaner:
             shutil.rmtree(self.pool_dir)
 
     # *******  *******   *******   *******   *******   *******   *******
+    def link(self, members:list):
+        ''' The keep-zipped counterpart of .clean(): the archives stay (zipped) in the pool, and each category-dir gets a links-file
+            with the virtual paths of its members (relative to the category-dir), to be indexed by the datalake (Status)
+        '''
+        for i in range(len(self.split_in_categs)):
+            rule = '*{}_*.xls*'.format(self.split_in_categs[i])
+            categ_members = [m for m in members if fnmatch.fnmatch(m.rsplit('/', 1)[-1].rsplit(ZipHandler.member_sep, 1)[-1], rule)]
+            categ_dir = self.new_root / self.new_categs[i]
+            categ_dir.mkdir(exist_ok=True, parents=True)
+
+            relative = [os.path.relpath(zip_path, categ_dir) + ZipHandler.member_sep + member for zip_path, member in (m.split(ZipHandler.member_sep, 1) for m in categ_members)]
+            tmp_path = categ_dir / (ZipHandler.links_filename + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(relative, f, indent=1)
+            os.replace(tmp_path, categ_dir / ZipHandler.links_filename)
+
+    # *******  *******   *******   *******   *******   *******   *******
 
@@ -48,6 +48,18 @@ class DataLake(Update, Query):
         self.status.refresh(timeslice={'start_date':self.status.dates.min.potential.date},
                             use_lake_version = use_lake_version)
 
+    # *******  *******   *******   *******   *******   *******   *******
+    def refresh(self, max_potential_date = None):
+        ''' Re-scan the datalake directory, optionally with a new maximum potential date (e.g. after re-sniffing the api).
+            Used when the DataLake object is kept alive between updates (watch mode).
+        '''
+        if max_potential_date is not None:
+            self.status._temp_max_potential_date = max_potential_date
+
+        self.status.initialize()
+        self.status.refresh(timeslice={'start_date':self.status.dates.min.potential.date},
+                            use_lake_version = self.status.use_lake_version)
+
 
 
 
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
 import datetime
+import fnmatch
 import logging
+import os
+import queue
+import threading
 import time
 import traceback
 from concurrent.futures import ThreadPoolExecutor
@@ -12,6 +16,7 @@ import pandas as pd
 from colorama import Fore
 from exso.DataLake.ETL.FileReaders import Readers
 from exso.Utils.DateTime import DateTime
+from exso.Utils.Paths import Paths
 import exso
 from tqdm import tqdm
 
@@ -114,12 +119,15 @@ class Loader:
                             desc='\tReading Progress',
                             **exso._pbar_settings)
 
+        prefetched = getattr(self, 'prefetched', None) or {}
         in_memory = {}
         for i, date, fp in zip(progress_bar, self.str_dates, self.filepaths):
 
             progress_bar.set_postfix_str(s=date_lambda(date))
             try:
-                dfs = self._reader(self.kwargs, fp)
+                dfs = prefetched.pop(Prefetcher.key(fp), None)
+                if dfs is None:
+                    dfs = self._reader(self.kwargs, fp)
                 in_memory[date] = dfs
 
             except:
@@ -163,6 +171,89 @@ class Loader:
 
 
 
+###############################################################################################
+###############################################################################################
+###############################################################################################
+class Prefetcher(Loader):
+    ''' Streaming (producer/consumer) reading of datalake files, while they are still being downloaded.
+
+        The downloaders (APIs.Assistant) call .put(filepath) each time a file is saved (producers).
+        A few reader-threads consume the (bounded) queue and load the files into memory with the same reader that the Loader would use.
+        If the readers fall behind, the queue fills up and the downloaders wait (back-pressure), so memory does not explode.
+
+        When the download is over, .close() returns the {filepath: dfs} dict, to be handed over to the Pipeline.
+        With max_files, only the first max_files saved files are read (and held in memory): the Loader reads the rest, as usual.
+        Files that failed to be read here, are simply not included, and the Loader will retry them (and report them) as usual.
+
+        Usage:  prefetcher = Prefetcher(report_object).start()
+                lake.update(..., on_saved = prefetcher.put)
+                prefetched = prefetcher.close()
+                lake.query(..., prefetched = prefetched)
+    '''
+    def __init__(self, report_object, n_threads = 2, max_queued = 8, max_files = None):
+        self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.r = report_object
+        self.n_threads = n_threads
+        self.queue = queue.Queue(maxsize = max_queued)
+        self.max_files = max_files
+        self.prefetched = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._accepted = 0
+
+        self.decide_reading_engine()
+        self.get_reader()
+        self._name_rule = Paths.make_glob_filter('', self.r.eligibility).lstrip('\\')
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def key(filepath):
+        return os.path.normcase(os.path.abspath(filepath))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def start(self):
+        self.logger.info("Starting {} prefetching reader-threads (name-rule: {})".format(self.n_threads, self._name_rule))
+        for i in range(self.n_threads):
+            thread = threading.Thread(target = self._consume, daemon = True, name = 'exso-prefetch-{}'.format(i))
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def put(self, filepath):
+        ''' Producer side: called (from the downloading threads) each time a file is saved '''
+        if not fnmatch.fnmatch(os.path.split(filepath)[-1], self._name_rule):
+            return
+        with self._lock:
+            if self.max_files is not None and self._accepted >= self.max_files:
+                return
+            self._accepted += 1
+        self.queue.put(filepath)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _consume(self):
+        while True:
+            filepath = self.queue.get()
+            if filepath is None:
+                break
+            try:
+                dfs = self._reader(self.kwargs.copy(), filepath)
+                with self._lock:
+                    self.prefetched[self.key(filepath)] = dfs
+            except:
+                self.logger.warning("Prefetching failed for: {}. It will be re-tried by the Loader. Exception: {}".format(filepath, traceback.format_exc()))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def close(self):
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.logger.info("Prefetching completed. Files read while downloading: {}".format(len(self.prefetched)))
+        return self.prefetched
+
+
 ###############################################################################################
 ###############################################################################################
 ###############################################################################################
@@ -5,22 +5,31 @@ import warnings
 import openpyxl
 import numpy as np, pandas as pd
 from pathlib import Path
+from exso.DataLake.APIs.ZipHandler import ZipHandler
 # *******  *******   *******   *******   *******   *******   *******
 # *******  *******   *******   *******   *******   *******   *******
 # *******  *******   *******   *******   *******   *******   *******
 class Readers:
+    @staticmethod
+    def source(filepath):
+        ''' What the readers actually read: the filepath, or an in-memory file-object, if it is a zip member (keep-zipped lakes) '''
+        if ZipHandler.is_member(filepath):
+            return ZipHandler.open_member(filepath)
+        return filepath
+
+    # *******  *******   *******   *******   *******   *******   *******
     @staticmethod
     def csv_reader(kwargs, filepath):
         if 'sheet_name' in kwargs:
             kwargs.pop('sheet_name')
-        df = pd.read_csv(filepath, **kwargs)
+        df = pd.read_csv(Readers.source(filepath), **kwargs)
         return {0:df}
 
     # *******  *******   *******   *******   *******   *******   *******
     @staticmethod
     def imbabe_reader(kwargs, filepath):
 
-        df_sheets = pd.read_excel(filepath, **kwargs)
+        df_sheets = pd.read_excel(Readers.source(filepath), **kwargs)
         # from 03-Apr-2023, added 5 lines on top. So, I cant read it correctly with header = 0 anymore.
         # I drop rows contaning less than 5 non-nan values
         df = df_sheets[0].dropna(axis='rows', thresh=5) #
@@ -46,7 +55,7 @@ class Readers:
             return df_sheets
 
         if isinstance(kwargs['header'], dict):
-            xl = pd.ExcelFile(filepath)
+            xl = pd.ExcelFile(Readers.source(filepath))
             _kwargs = kwargs.copy()
             _kwargs.pop('header')
             _kwargs.pop('sheet_name')
@@ -54,13 +63,13 @@ class Readers:
             return df_sheets
 
         try:
-            df_sheets = pd.read_excel(filepath, **kwargs) # at later pandas maybe this will sometimes break instead of warn
+            df_sheets = pd.read_excel(Readers.source(filepath), **kwargs) # at later pandas maybe this will sometimes break instead of warn
         except:
 
             try: # None reader can read xls and xlsx. openpyxl reader can only read xlsx
                 engine_as_passed = kwargs['engine']
                 kwargs['engine'] = None
-                df_sheets = pd.read_excel(filepath, **kwargs)
+                df_sheets = pd.read_excel(Readers.source(filepath), **kwargs)
             except:
                 kwargs['engine'] = engine_as_passed
 
@@ -73,7 +82,7 @@ class Readers:
                 kwargs['usecols'] = usecols
                 kwargs['index_col'] = index_col
                 try:
-                    df_sheets = pd.read_excel(filepath, **kwargs)
+                    df_sheets = pd.read_excel(Readers.source(filepath), **kwargs)
                 except:
                     print()
                     raise ValueError(f"ERROR reading filepath: {filepath}, {kwargs = }")
@@ -100,7 +109,7 @@ class Readers:
         skip_rows = kwargs['skiprows']
         use_cols = kwargs['usecols']
         header_row = kwargs['header']
-        wb = openpyxl.load_workbook(filepath)
+        wb = openpyxl.load_workbook(Readers.source(filepath))
         dfs = {}
         for sheet_loc in sheet_locators:
 
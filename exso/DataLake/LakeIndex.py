@@ -0,0 +1,167 @@
+import contextlib
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from exso.DataLake.APIs.ZipHandler import ZipHandler
+from exso.Utils.DateTime import DateTime
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class LakeIndex:
+    ''' Persistent index of the eligible files of a report-lake (one sqlite dot-file per report-lake):
+        path, filename, str_date, true_version, size, mtime and sha256 of every file (or zip member, in keep-zipped lakes).
+
+        A refresh of the lake only re-scans the directory if it changed since the last scan (directory mtime, which changes whenever
+        a file is added, removed or replaced in it), and then only hashes the new or changed files. Otherwise, the index is the answer.
+        Files edited in-place (without touching the directory) are picked up after a .rebuild().
+
+        .canonical(entries) collapses byte-identical republications of a date (same sha256 as the previous version) into one entry.
+
+        The index is a dot-file, so it is ignored by the lake's glob rules.
+    '''
+    filename = '.lake_index.sqlite'
+    columns = ['path', 'filename', 'str_date', 'true_version', 'size', 'mtime', 'sha256']
+    layout_version = 2 # bumped when the meaning of the indexed columns changes (2: dates parsed by DateTime.dates_from_filenames)
+    settle_sec = 2 # a directory modified less than this ago is not trusted as "unchanged" (coarse mtime resolution of some filesystems)
+
+    def __init__(self, dir:str|Path):
+        self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.dir = Path(dir)
+        self.path = self.dir / self.filename
+
+        self.dir.mkdir(exist_ok=True, parents=True)
+        self.execute('''CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY,
+                                                          filename TEXT,
+                                                          str_date TEXT,
+                                                          true_version INTEGER,
+                                                          size INTEGER,
+                                                          mtime INTEGER,
+                                                          sha256 TEXT)''')
+        self.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _connect(self):
+        # no journal file: it would be created & deleted next to the index, changing the mtime of the very directory the index watches
+        con = sqlite3.connect(self.path, timeout=30)
+        con.execute('PRAGMA journal_mode=MEMORY')
+        return con
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def execute(self, statement, rows = None):
+        with contextlib.closing(self._connect()) as con:
+            with con:
+                if rows is None:
+                    con.execute(statement)
+                else:
+                    con.executemany(statement, rows)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _meta(self):
+        with contextlib.closing(self._connect()) as con:
+            return dict(con.execute('SELECT key, value FROM meta').fetchall())
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def signature(self, name_rule):
+        ''' What the index of the directory depends on: the name-rule, the keep-zipped mode, the directory mtime (and the index layout version) '''
+        return '{}|{}|{}|{}'.format(self.layout_version, name_rule, ZipHandler.keep_zipped, os.stat(self.dir).st_mtime_ns)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def is_stale(self, name_rule) -> bool:
+        return self._meta().get('signature') != self.signature(name_rule)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def entries(self) -> list:
+        ''' [{column: value}], ordered by str_date and true_version '''
+        with contextlib.closing(self._connect()) as con:
+            con.row_factory = sqlite3.Row
+            rows = con.execute('SELECT * FROM files ORDER BY str_date, true_version').fetchall()
+        return [dict(row) for row in rows]
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def canonical(entries:list) -> list:
+        ''' Collapse each run of consecutive, byte-identical versions of a date (e.g. _01, _02 and _03 with the same sha256) into its first
+            file: the canonical entry, which lists the paths of the collapsed ones under 'duplicates'. Versions that differ are all kept
+            (so a date whose content changed and then changed back, keeps the three versions: the latest content is still the latest version).
+            true_version is renumbered over the canonical entries.
+
+        :param entries: as returned by .entries() / .update() (ordered by str_date and true_version)
+        '''
+        kept = []
+        for e in entries:
+            last = kept[-1] if kept else None
+            if last and last['str_date'] == e['str_date'] and e['sha256'] and last['sha256'] == e['sha256']:
+                last['duplicates'].append(e['path'])
+                continue
+            version = last['true_version'] + 1 if last and last['str_date'] == e['str_date'] else 1
+            kept.append(dict(e, true_version = version, duplicates = []))
+        return kept
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def update(self, filepaths:list, name_rule) -> list:
+        ''' Sync the index with the eligible filepaths (as found by a directory scan): new or changed files are (re)hashed, missing ones are dropped '''
+        t0 = time.perf_counter()
+        known = {e['path']: e for e in self.entries()}
+
+        filepaths = list(map(str, filepaths))
+        parsed = DateTime.dates_from_filenames(filepaths) # the same dates as Status.get_file_df
+        entries = []
+        n_hashed = 0
+        for fp, filename, str_date in zip(filepaths, parsed['filenames'], parsed['str_dates']):
+            if not isinstance(str_date, str):
+                self.logger.warning("Ignoring lake file without a valid YYYYMMDD date in its name: {}".format(fp))
+                continue
+
+            size, mtime = self.stat(fp)
+            entry = known.get(fp)
+            if entry is None or entry['mtime'] != mtime or (size is not None and entry['size'] != size):
+                size, sha256 = ZipHandler.sha256(fp)
+                entry = {'path': fp, 'size': size, 'mtime': mtime, 'sha256': sha256}
+                n_hashed += 1
+            entries.append(dict(entry, filename = filename, str_date = str_date))
+
+        entries.sort(key = lambda e: (e['str_date'], e['filename']))
+        version, previous = 0, None
+        for e in entries:
+            version = version + 1 if e['str_date'] == previous else 1
+            e['true_version'] = version
+            previous = e['str_date']
+
+        rows = [tuple(e[c] for c in self.columns) for e in entries]
+        with contextlib.closing(self._connect()) as con:
+            with con:
+                con.execute('DELETE FROM files')
+                con.executemany('INSERT INTO files ({}) VALUES ({})'.format(', '.join(self.columns), ', '.join('?' * len(self.columns))), rows)
+                con.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', ('signature', self._settled_signature(name_rule)))
+
+        n_dropped = len(set(known) - set(e['path'] for e in entries))
+        self.logger.info("Lake index updated: {} files ({} new or changed, {} dropped) in {:.3f} sec".format(len(entries), n_hashed, n_dropped, time.perf_counter() - t0))
+        return entries
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _settled_signature(self, name_rule):
+        # a directory that is still being written to (or with a coarse mtime) is re-scanned on the next refresh
+        if time.time() - os.stat(self.dir).st_mtime < self.settle_sec:
+            return None
+        return self.signature(name_rule)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def rebuild(self):
+        ''' Forget everything: the next refresh re-scans and re-hashes the whole lake '''
+        self.execute('DELETE FROM files')
+        self.execute('DELETE FROM meta')
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def stat(filepath):
+        ''' (size, mtime_ns) of a file. For a zip member: (None, mtime of the archive), since its size is only known by opening the archive '''
+        st = ZipHandler.stat(filepath)
+        return None if ZipHandler.is_member(filepath) else st.st_size, st.st_mtime_ns
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
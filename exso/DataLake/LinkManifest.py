@@ -0,0 +1,155 @@
+import contextlib
+import datetime
+import logging
+import os
+import sqlite3
+from pathlib import Path
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class LinkManifest:
+    ''' Persistent record of the links downloaded into a datalake directory (one sqlite dot-file per report-lake).
+
+        For every fetched link, it keeps the http validators of the response (ETag, Last-Modified), the size and the sha256 of the saved file.
+        With them, a "check for revisions" pass (DataLake retroactive_update) can ask the server whether an already downloaded file changed
+        (conditional HEAD requests), and re-download only the files that actually did, instead of the whole date-range.
+        It also keeps every file-version found by version probing (HEnEx.API), downloaded or not.
+
+        The manifest is a dot-file, so it is ignored by the lake's glob rules.
+        (Not to be confused with the database Manifest, which records the lake files assimilated into a report-database.)
+    '''
+    filename = '.links.sqlite'
+    legacy_filename = '.manifest.sqlite' # its name before the rename: picked up (renamed) if found
+    columns = ['link', 'filename', 'etag', 'last_modified', 'size', 'sha256', 'fetched_at', 'checked_at']
+    version_columns = ['str_date', 'version', 'link', 'etag', 'last_modified', 'size', 'probed_at']
+
+    def __init__(self, dir:str|Path):
+        self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.dir = Path(dir)
+        self.path = self.dir / self.filename
+
+        self.dir.mkdir(exist_ok=True, parents=True)
+        legacy_path = self.dir / self.legacy_filename
+        if legacy_path.exists() and not self.path.exists():
+            os.replace(legacy_path, self.path)
+        self.execute('''CREATE TABLE IF NOT EXISTS fetched (link TEXT PRIMARY KEY,
+                                                             filename TEXT,
+                                                             etag TEXT,
+                                                             last_modified TEXT,
+                                                             size INTEGER,
+                                                             sha256 TEXT,
+                                                             fetched_at TEXT,
+                                                             checked_at TEXT)''')
+        self.execute('''CREATE TABLE IF NOT EXISTS versions (str_date TEXT,
+                                                              version INTEGER,
+                                                              link TEXT,
+                                                              etag TEXT,
+                                                              last_modified TEXT,
+                                                              size INTEGER,
+                                                              probed_at TEXT,
+                                                              PRIMARY KEY (str_date, version))''')
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def execute(self, statement, rows = None):
+        with contextlib.closing(sqlite3.connect(self.path, timeout=30)) as con:
+            with con:
+                if rows is None:
+                    con.execute(statement)
+                else:
+                    con.executemany(statement, rows)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def lookup(self, links = None) -> dict:
+        ''' {link: {column: value}} of the given links (all, if None). Links never fetched are missing. '''
+        with contextlib.closing(sqlite3.connect(self.path, timeout=30)) as con:
+            con.row_factory = sqlite3.Row
+            rows = con.execute('SELECT * FROM fetched').fetchall()
+
+        entries = {row['link']: dict(row) for row in rows}
+        if links is not None:
+            entries = {link: entries[link] for link in links if link in entries}
+        return entries
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def record(self, records:list):
+        ''' records: list of dicts, as made by LinkManifest.describe(). One transaction for all of them. '''
+        if not records:
+            return
+        rows = [tuple(rec[c] for c in self.columns) for rec in records]
+        self.execute('INSERT OR REPLACE INTO fetched ({}) VALUES ({})'.format(', '.join(self.columns), ', '.join('?' * len(self.columns))), rows)
+        self.logger.info("Manifest: recorded {} fetched links".format(len(rows)))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def record_versions(self, found:list):
+        ''' found: list of (str_date, version, link, headers) of the file-versions that exist at the source '''
+        if not found:
+            return
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        rows = [(str_date, version, link, headers.get('ETag'), headers.get('Last-Modified'),
+                 int(headers['Content-Length']) if headers.get('Content-Length') else None, now) for str_date, version, link, headers in found]
+        self.execute('INSERT OR REPLACE INTO versions ({}) VALUES ({})'.format(', '.join(self.version_columns), ', '.join('?' * len(self.version_columns))), rows)
+        self.logger.info("Manifest: recorded {} probed file-versions".format(len(rows)))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def versions(self) -> dict:
+        ''' {str_date: [versions found at the source]} '''
+        with contextlib.closing(sqlite3.connect(self.path, timeout=30)) as con:
+            rows = con.execute('SELECT str_date, version FROM versions ORDER BY str_date, version').fetchall()
+        versions = {}
+        for str_date, version in rows:
+            versions.setdefault(str_date, []).append(version)
+        return versions
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def touch(self, links:list):
+        ''' Mark links as checked (unchanged) now '''
+        if not links:
+            return
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        self.execute('UPDATE fetched SET checked_at = ? WHERE link = ?', [(now, link) for link in links])
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def describe(link, filepath, headers, sha256, size) -> dict:
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        return {'link': link,
+                'filename': Path(filepath).name,
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'size': size,
+                'sha256': sha256,
+                'fetched_at': now,
+                'checked_at': now}
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def conditional_headers(entry) -> dict:
+        ''' If-None-Match / If-Modified-Since headers, from the validators of a previous response '''
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def same_version(entry, headers) -> bool | None:
+        ''' Compares the validators of a (HEAD) response with the recorded ones. None, if the response carries no comparable validators.
+            (for servers that ignore conditional requests, and answer 200 instead of 304)
+        '''
+        if entry.get('etag') and headers.get('ETag'):
+            return entry['etag'] == headers['ETag']
+
+        if entry.get('last_modified') and headers.get('Last-Modified'):
+            same = entry['last_modified'] == headers['Last-Modified']
+            if same and entry.get('size') is not None and headers.get('Content-Length') is not None and 'Content-Encoding' not in headers:
+                same = int(headers['Content-Length']) == entry['size']
+            return same
+
+        return None
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
@@ -357,9 +357,8 @@ class DailyAuctionsSpecificationsATC(ArchetypeWide):
 
         dfs = {'Imports': {},
                'Exports': {}}
-        for d in dates:
-            str_date = DateTime.make_string_date(d, sep='')
-            datetime = DateTime.date_magician(str_date, return_stamp=True)
+        stamps = DateTime.to_dates(dates)
+        for str_date, datetime in zip(stamps.strftime('%Y%m%d'), stamps):
             candidates = _files_df[_files_df.dates_str == str_date]
             d_datetime = pd.date_range(datetime, datetime + pd.Timedelta('23h'), freq='h', tz='CET')
 
@@ -4,6 +4,7 @@ import logging
 
 from exso.DataLake.ETL.ETL import Loader, Parser, Joiner
 from exso.Utils.DateTime import DateTime
+from exso.Utils.Profiler import Telemetry
 
 date_lambda = lambda x: datetime.datetime.strftime(DateTime.date_magician(x, return_stamp=False), format="%d-%b-%y")
 ###############################################################################################
@@ -28,7 +29,7 @@ class Query:
         self.status = status
 
     # *******  *******   *******   *******   *******   *******   *******
-    def query(self, start_date: None | str | datetime.datetime=None, end_date: None | str | datetime.datetime=None, dates_iterable = None, str_dates = None, keep_raw = False):
+    def query(self, start_date: None | str | datetime.datetime=None, end_date: None | str | datetime.datetime=None, dates_iterable = None, str_dates = None, keep_raw = False, prefetched:dict|None = None):
 
         self.status.refresh(timeslice = {'start_date':start_date, 'end_date':end_date, 'dates_iterable':dates_iterable, 'str_dates':str_dates})
         if self.status.file_df.empty:
@@ -36,7 +37,7 @@ class Query:
             self.data = {}
         else:
             self.logger.info("Making Datalake ETL query for {} files".format(self.status.file_df.shape[0]))
-            self.pipeline = Pipeline(self.status.file_df, self.r)
+            self.pipeline = Pipeline(self.status.file_df, self.r, prefetched = prefetched)
             self.pipeline.run(keep_raw = keep_raw)
             self.data = self.pipeline.data
 
@@ -71,10 +72,11 @@ class Pipeline(Loader, Parser, Joiner):
         #todo later: multi-processing file-driven (multi-threading performing poorly)
 
     '''
-    def __init__(self, file_df, report):
+    def __init__(self, file_df, report, prefetched:dict|None = None):
         self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
         self.r = report
         self.file_df = file_df
+        self.prefetched = prefetched
 
     # *******  *******   *******   *******   *******   *******   *******
     def run(self, keep_raw=False):
@@ -84,7 +86,8 @@ class Pipeline(Loader, Parser, Joiner):
 
         self.decide_reading_engine()
         self.get_reader()
-        self.readAll()
+        with Telemetry.stage('read'):
+            self.readAll()
 
         # a_date = list(self.data.keys())[0]
         # a_field = list(self.data[a_date].keys())[0]
@@ -92,10 +95,11 @@ class Pipeline(Loader, Parser, Joiner):
         if keep_raw:
             self.as_read = copy.deepcopy(self.data)
 
-        self.get_parser()
-        self.dates_per_period, self.dates_flat_series = self.datetime_constructor()
+        with Telemetry.stage('parse'):
+            self.get_parser()
+            self.dates_per_period, self.dates_flat_series = self.datetime_constructor()
 
-        self.transformAll()
+            self.transformAll()
         # a_subfield = list(self.data[a_date][a_field].keys())[0]
 
         # print()
@@ -113,7 +117,8 @@ class Pipeline(Loader, Parser, Joiner):
         #     print()
         # print(f'\n\nend of transposeAll')
 
-        self.joinAll()
+        with Telemetry.stage('join'):
+            self.joinAll()
         #
         # print()
         # print(f'End of joinAll ({self.r.report_name}')
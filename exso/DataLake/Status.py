@@ -1,5 +1,6 @@
-import copy
+import collections
 import datetime
+import fnmatch
 import glob
 import logging
 import os
@@ -10,6 +11,7 @@ from pathlib import Path
 import numpy as np
 import pandas as pd
 from exso.DataLake.APIs import ZipHandler
+from exso.DataLake.LakeIndex import LakeIndex
 from exso.Utils.DateTime import DateTime
 from exso.Utils.Misc import Misc
 from exso.Utils.Paths import Paths
@@ -17,6 +19,76 @@ from exso.Utils.STR import STR
 
 date_lambda = lambda x: datetime.datetime.strftime(DateTime.date_magician(x, return_stamp = False), format="%d-%b-%y")
 
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class VersionJournal:
+    ''' Compact, bounded record of the lake refreshes of a process (what Status.compare_to_previous needs, instead of a deep copy of every Status).
+
+        Per lake-dir, it keeps only the latest snapshot of the number of file-versions per date: two small integer arrays (YYYYMMDD -> latest_available).
+        Each refresh that changes a snapshot appends an entry to a bounded changelog: (time, dir, str_dates, old_versions, new_versions).
+        At most max_lakes snapshots (least recently refreshed are dropped) and max_changes changelog entries are kept.
+
+        API:
+            .record(dir, str_dates, versions) -> pd.DataFrame of the changes since the previous snapshot of dir (None, if there is none)
+            .previous(dir)                    -> pd.Series (index: int YYYYMMDD, values: latest_available), or None
+            .changes(dir = None)              -> list of changelog entries (all lakes, or one)
+            .lakes()                          -> dirs with a snapshot, least recently refreshed first
+            .n_refreshes                      -> number of refreshes recorded
+            .clear()
+    '''
+    def __init__(self, max_lakes = 256, max_changes = 1000):
+        self.max_lakes = max_lakes
+        self._snapshots = collections.OrderedDict()
+        self._changes = collections.deque(maxlen = max_changes)
+        self.n_refreshes = 0
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def snapshot(str_dates, versions) -> pd.Series:
+        s = pd.Series(np.asarray(versions, dtype='int16'), index = np.asarray(str_dates).astype('int32'))
+        return s[~s.index.duplicated(keep = 'last')].sort_index()
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def previous(self, dir):
+        return self._snapshots.get(str(dir))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def record(self, dir, str_dates, versions):
+        ''' Stores the new snapshot of dir, and returns its changes: index = str_dates, columns = ['old', 'new'] (0: no file) '''
+        key = str(dir)
+        new = self.snapshot(str_dates, versions)
+        old = self._snapshots.pop(key, None)
+        self._snapshots[key] = new
+        self.n_refreshes += 1
+        while len(self._snapshots) > self.max_lakes:
+            self._snapshots.popitem(last = False)
+
+        if old is None:
+            return None
+
+        both = pd.concat([old.rename('old'), new.rename('new')], axis = 1).fillna(0).astype('int16')
+        changed = both[both['old'] != both['new']]
+        changed.index = changed.index.astype(str)
+        if not changed.empty:
+            self._changes.append((datetime.datetime.now(), key, changed.index.values, changed['old'].values, changed['new'].values))
+        return changed
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def changes(self, dir = None) -> list:
+        return [c for c in self._changes if dir is None or c[1] == str(dir)]
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def lakes(self) -> list:
+        return list(self._snapshots.keys())
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def clear(self):
+        self._snapshots.clear()
+        self._changes.clear()
+        self.n_refreshes = 0
+
+
 # *******  *******   *******   *******   *******   *******   *******
 # *******  *******   *******   *******   *******   *******   *******
 # *******  *******   *******   *******   *******   *******   *******
@@ -25,10 +97,16 @@ class Status:
         This is a stand-alone class, that can be instantiated directly. It requires a call to .initialize() after instantiation
 
         The .refresh() method, updates the variable attributes of the object (e.g. after an update has occured)
+        The lake files are listed through a persistent LakeIndex: the directory is only re-scanned (and unzipped) if it changed since the last refresh.
+        Set Status.use_lake_index = False, to scan it on every refresh instead.
+        With the lake index, byte-identical republications of a date are collapsed into their first version (Status.dedup_versions),
+        and file_df carries the sha256 of each file (so the database manifest does not need to re-hash them).
 
-
+        Status.journal records the file-versions per date found by each refresh (per lake), for .compare_to_previous().
     '''
-    history = []
+    journal = VersionJournal()
+    use_lake_index = True
+    dedup_versions = True
 
     def __init__(self, dir:str|Path, min_potential_date, max_potential_date, eligibility, time_lag_days:int, sheet_tags:list, period_covered:str):
         '''
@@ -65,6 +143,7 @@ class Status:
 
         self.up_to_date = False
         self.exists = False
+        self.lake_index = None
 
         self.make_dir_if_not_exists()
         self.file_df = pd.DataFrame({'filepaths': [], 'filenames': [], 'dates': []}, index=[])
@@ -103,8 +182,7 @@ class Status:
 
         self.file_df = self.get_file_df(filepaths)
 
-        if Status.history:
-            self.diff = self.compare_to_previous()
+        self.diff = self.compare_to_previous()
 
         self.file_df = self.get_timeslice(self.file_df, **timeslice)
 
@@ -122,19 +200,16 @@ class Status:
             self.check_if_complete()
             self.logger.info('\n-->Comparing the files found in datalake, with the potential range of the filetype.')
 
-        self.history.append(copy.deepcopy(self))
     # *******  *******   *******   *******   *******   *******   *******
     def compare_to_previous(self):
+        ''' File-versions added per date, since the previous refresh of the same lake (if any, in this process) '''
+        changed = Status.journal.record(self.dir, self._file_df_all.index, self._file_df_all['latest_available'])
+        if changed is None:
+            return
 
-        prev = Status.history[-1]
-
-        dff = pd.merge(prev._file_df_all, self._file_df_all, how='outer', left_index=True, right_index=True, suffixes=("_old", '_new'))
-
-        show = dff[dff['latest_available_new'] != dff['latest_available_old']].drop_duplicates(
-            subset='dates_new', keep='last')
-
-        version_addition = pd.DataFrame({'dates': show['dates_new']}, index=show.index)
-        version_addition['added_versions'] = show['latest_available_new'] - show['latest_available_old'].fillna(0)
+        version_addition = pd.DataFrame({'dates': pd.to_datetime(changed.index, format='%Y%m%d')}, index=changed.index)
+        version_addition.loc[changed['new'].values == 0, 'dates'] = pd.NaT
+        version_addition['added_versions'] = changed['new'] - changed['old']
 
         self._refresh_overview = version_addition
 
@@ -163,38 +238,84 @@ class Status:
         if not eligibility:
             eligibility = self.eligibility
 
-        self.raw_lake_content = list(_dir.glob('*'))
-
         rule = Paths.make_glob_filter(str(_dir), eligibility)
+        name_rule = re.split(r'[\\/]', rule)[-1] # the rule is built with a '\' separator
 
-        zh = ZipHandler.ZipHandler(zipped_dir = _dir, extract_to_dir = None, must_contain = os.path.split(rule)[-1], must_not_contain = None)
+        self.lake_index = None
+        lake_index = LakeIndex(_dir) if self.use_lake_index else None
+        if lake_index and not lake_index.is_stale(name_rule):
+            self.logger.info('\tDatalake directory unchanged since the last scan: using the lake index.')
+            return self.canonical_paths(lake_index.entries())
+
+        self.raw_lake_content = list(_dir.glob('*'))
+
+        zh = ZipHandler.ZipHandler(zipped_dir = _dir, extract_to_dir = None, must_contain = name_rule, must_not_contain = None)
         zh.run()
 
         filepaths = glob.glob(rule)
 
+        if ZipHandler.ZipHandler.keep_zipped:
+            filepaths = self.add_zip_members(filepaths, zh.payload + ZipHandler.ZipHandler.linked_members(_dir), name_rule)
+
         if len(filepaths) == 0:
-            if len(list(_dir.glob('*'))) > 0:
+            if len(Paths.visible(_dir)) > 0: # the lake index (a dot-file) does not count
                 warnings.warn("Possibly there is a problem with the glob rule. No files were found in the datalake.")
 
+        if lake_index:
+            filepaths = self.canonical_paths(lake_index.update(filepaths, name_rule))
+
         self.logger.info('\t\tUsed filtering rule --> ' + rule)
         self.logger.info("Initially perceived number of eligible files: {}".format(len(filepaths)))
 
         return filepaths
 
+    # *******  *******   *******   *******   *******   *******   *******
+    def canonical_paths(self, entries):
+        ''' Sets .lake_index (the index entries of the lake files, after collapsing byte-identical versions, if .dedup_versions) '''
+        self.lake_index = LakeIndex.canonical(entries) if self.dedup_versions else entries
+        n_duplicates = len(entries) - len(self.lake_index)
+        if n_duplicates:
+            self.logger.info("\tCollapsed {} byte-identical file-versions into their canonical version ({} lake files left)".format(n_duplicates, len(self.lake_index)))
+        return [e['path'] for e in self.lake_index]
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def add_zip_members(self, filepaths, members, name_rule):
+        ''' Keep-zipped lakes: the eligible zip members (virtual paths, "archive.zip::member.xlsx") are lake files too.
+            The zipfiles themselves are not, and a member whose name also exists as an extracted file is skipped.
+        '''
+        filepaths = [fp for fp in filepaths if not fp.lower().endswith('.zip')]
+        filenames = set(os.path.split(fp)[-1] for fp in filepaths)
+
+        n_files = len(filepaths)
+        for member in sorted(members):
+            member_name = member.rsplit(ZipHandler.ZipHandler.member_sep, 1)[-1].rsplit('/', 1)[-1]
+            if fnmatch.fnmatch(member_name, name_rule) and member_name not in filenames:
+                filenames.add(member_name)
+                filepaths.append(member)
+
+        self.logger.info("Zip members included in the lake files: {} (of {} indexed)".format(len(filepaths) - n_files, len(members)))
+        return filepaths
+
     # *******  *******   *******   *******   *******   *******   *******
     def get_file_df(self, filepaths):
         ''' Create a dataframe with columns: [filepaths, filenames, dates],
                                 and index: str_dates
         '''
 
-        filenames = list(map(lambda x: os.path.split(x)[-1], filepaths))
-        str_dates = list(map(lambda x: re.findall(r'\d{8}', x)[0], filenames))
-
-        dates = DateTime.date_magician(str_dates, return_stamp=False)
+        parsed = DateTime.dates_from_filenames(filepaths)
+        ill_formed = parsed['dates'].isna().values
+        if ill_formed.any():
+            self.logger.warning("Ignoring {} lake files without a valid YYYYMMDD date in their names: {}".format(ill_formed.sum(), list(parsed['filenames'][ill_formed])))
 
-        df = pd.DataFrame({'filepaths': filepaths, 'filenames': filenames, 'dates': dates}, index=str_dates)
+        df = pd.DataFrame({'filepaths': np.asarray(filepaths, dtype=object)[~ill_formed],
+                           'filenames': parsed['filenames'].values[~ill_formed],
+                           'dates': pd.DatetimeIndex(parsed['dates'].values[~ill_formed])},
+                          index=parsed['str_dates'].values[~ill_formed])
 
         df['true_version'] = df.groupby('dates').cumcount() + 1
+        if self.lake_index is not None:
+            sha256 = {e['path']: e['sha256'] for e in self.lake_index}
+            df['sha256'] = [sha256.get(fp) for fp in df['filepaths']]
         vcounts = df.index.value_counts().sort_index().to_frame(name='latest_available')
         df = pd.merge(df, vcounts, left_index=True, right_index=True)
         self._file_df_all = df.copy()
@@ -30,7 +30,8 @@ class Update:
         self.retroactive_update = retroactive_update
 
     # *******  *******   *******   *******   *******   *******   *******
-    def update(self, start_date: None | str | datetime.datetime = None, end_date: None | str | datetime.datetime = None):
+    def update(self, start_date: None | str | datetime.datetime = None, end_date: None | str | datetime.datetime = None, on_saved = None):
+        ''' on_saved: optional callable(filepath), called for every file saved in the datalake, as soon as it is downloaded (see ETL.Prefetcher) '''
 
         self.udates = self.dates_pipeline(start_date, end_date) # zero-in on the actual days that require download
 
@@ -40,7 +41,7 @@ class Update:
             return
 
         else:
-            self.__update_lake(suspend_stdout=False)
+            self.__update_lake(suspend_stdout=False, on_saved=on_saved)
             lake_size_before = self.status.file_df.shape[0]
             self.status.refresh()
             lake_size_after = self.status.file_df.shape[0]
@@ -59,7 +60,7 @@ class Update:
 
 
     # *******  *******   *******   *******   *******   *******   *******
-    def __update_lake(self, suspend_stdout=True):
+    def __update_lake(self, suspend_stdout=True, on_saved = None):
         ''' to enter here, it means that the query is not degenerate.
             but maybe, e.g. the raw cache is up-to-date (manual download)
             but the merged cache doesnt exist, or you want overwrite, or it is not yet up-to-date
@@ -73,10 +74,10 @@ class Update:
         if not self.status.up_to_date or self.retroactive_update:
             self.logger.info('Making API call to download required dates. (from: {} to: {})'.format(self.udates.start, self.udates.end))
 
-            api = StreamHandler(save_dir=self.status.dir)
+            api = StreamHandler(save_dir=self.status.dir, on_saved=on_saved)
 
             api.query(self.report_name, start_date=self.udates.start, end_date=self.udates.end,
-                      publisher=self.publisher)
+                      publisher=self.publisher, check_revisions=self.retroactive_update)
             sys.stdout = sys.__stdout__
 
     # *******  *******   *******   *******   *******   *******   *******
@@ -94,9 +95,9 @@ class Update:
             self.logger.info("Datalake does not exist yet. Will download everything.")
             return self.udates
 
-        if self.retroactive_update and self.r.is_alive and self.r.publisher == 'admie' and len(Status.history) == 0:
+        if self.retroactive_update and self.r.is_alive and self.r.publisher == 'admie' and Status.journal.n_refreshes == 0:
             self.logger.info("Check for new versions was True. The report is still alive, and it's not a henex-report")
-            self.logger.info("So, the datalake updater will request for the whole date-range.")
+            self.logger.info("So, the datalake updater will request the links of the whole date-range: new files are downloaded, and the existing ones are only checked for revisions (conditional requests).")
             self.status.up_to_date = False
             return self.udates
 
@@ -1,12 +1,16 @@
 import ast
 import datetime
+import gc
 import json
 import logging
+import os
 import re
 import shutil
 import sys
+import tempfile
 import time
 import traceback
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 
 import colorama
@@ -17,9 +21,15 @@ import exso
 from exso import Files
 from exso.DataBase import DataBase
 from exso.DataLake import DataLake
+from exso.DataLake.APIs.Assistant import Assistant
+from exso.DataLake.APIs.RateLimiter import RateLimiter
+from exso.DataLake.APIs.ZipHandler import ZipHandler
+from exso.DataLake.ETL.ETL import Prefetcher
 from exso.IO.Tree import Tree
 from exso.ReportsInfo import Report
+from exso.ReportsInfo.Sniffer import Sniffer
 from exso.Utils.DateTime import DateTime
+from exso.Utils.Profiler import Telemetry, CodeProfiler
 from exso.Utils.Similarity import Similarity
 from haggis import string_util as hag
 
@@ -30,6 +40,9 @@ from haggis import string_util as hag
 class Updater:
     """ The main API-class of the exso project to update datasets.
         Check out the __init__.__doc__ for more information """
+    window_days = 90 # the database requirements are parsed & written in date-windows of this size (0: all at once)
+    retroactive_update = False # if True, already downloaded lake files are checked for revisions at the source (see DataLake.LinkManifest)
+
     def __init__(self, root_lake:str|Path|None=None, root_base:str|Path|None=None, reports_pool:Report.Pool|None = None, which:str|list|None = None, exclude:str|list|None = None, groups:None|list|str = None, publishers: None|list|str = None, countries: None|list|str = None, only_ongoing:bool = False, allow_handshake_connection = True):
         """
         Constructor parameters for the Updater class:
@@ -149,16 +162,46 @@ class Updater:
         self.mode = 'debugging'
 
     # *******  *******   *******   *******   *******   *******   *******
-    def run(self, use_lake_version = 'latest', warnings_verbose = 0, lake_only = False):
-
-        fulfilled_refreshes = []
-        self.warnings_verbose = warnings_verbose
-
-        self.log_split = LogSplitter(root_logfile=Files.root_log, save_at_dir=Files.latest_logs_dir)
+    def run(self, use_lake_version = 'latest', warnings_verbose = 0, lake_only = False, workers = 1, max_per_publisher = None, streaming = False, profile = False, profile_code = None, sniff_ttl = None, window_days = None, download_engine = None, retroactive_update = None, keep_zipped = None):
+        '''
+        :param use_lake_version: 'latest', 'first' or an integer file-version to use from the datalake
+        :param warnings_verbose: if 1, the warnings logged for each report are also printed
+        :param lake_only: if True, only the datalake is updated (no parsing, no database)
+        :param workers: number of processes to use. If > 1, independent reports are updated in parallel (scheduler mode)
+        :param max_per_publisher: (scheduler mode) maximum number of reports of the same publisher running concurrently.
+                                  If None, it is set equal to "workers"
+        :param streaming: if True, the datalake files are read while they are still being downloaded (see .single())
+        :param profile: if True, the wall/cpu time and peak memory of every update stage (sniff, link_discovery, download, unzip,
+                        read, parse, join, database_write) are recorded per report, and exported to update_telemetry.json/.csv (logs dir)
+        :param profile_code: None, 'cprofile' or 'pyinstrument'. Function-level profiling of each report update. Implies profile = True.
+                             Only the profile of the slowest report is kept (logs dir: slowest_report.prof/.html)
+        :param sniff_ttl: [pd.Timedelta|str|None] maximum age of the cached api-sniffing results (latest available date of ongoing reports).
+                          Default: Sniffer.ttl (15 min). Zero disables the cache.
+        :param window_days: [int|None] the database requirements of each report are parsed and written in windows of this many days,
+                            with a checkpoint after each window (bounded memory, resumable first-time builds). 0: all at once.
+                            Default: Updater.window_days (90)
+        :param download_engine: 'threads' or 'async' (many concurrent requests, requires aiohttp). Default: Assistant.download_engine ('threads')
+        :param retroactive_update: if True, the already downloaded files of (live, admie) reports are checked for revisions at the source,
+                                   with conditional requests, and only the files that changed are re-downloaded. Default: Updater.retroactive_update (False)
+        :param keep_zipped: if True, downloaded zip archives are not extracted: their members are indexed by the datalake and read
+                            directly from the archives (in memory). Default: ZipHandler.keep_zipped (False)
+        '''
+        if window_days is not None:
+            self.window_days = window_days
+        if retroactive_update is not None:
+            self.retroactive_update = retroactive_update
+        if download_engine is not None:
+            Assistant.download_engine = download_engine
+        if keep_zipped is not None:
+            ZipHandler.keep_zipped = keep_zipped
+        self.streaming = streaming
+        self.profile_code = profile_code
+        self.profile_dumps = {}
+        Telemetry.enable(profile or bool(profile_code))
+
+        self._open_session(warnings_verbose)
         self.logger.info('\n\n\n\n\n')
         self.logger.info("Running Update Kernel")
-        self.failed = {}
-        self.update_summary = {}
         t0 = time.perf_counter()
 
         now = datetime.datetime.strftime(datetime.datetime.now(), format='%Y-%m-%d %H:%M')
@@ -166,23 +209,31 @@ class Updater:
         colorama.init(autoreset=True)
         print(Fore.LIGHTCYAN_EX + '\n\n--> Update started at: {} \n'.format(now))
 
+        if sniff_ttl is not None:
+            Sniffer.ttl = pd.Timedelta(sniff_ttl)
+        self.prefetch_sniffs()
+
         if lake_only:
             self.update_lake(report_names=self.report_names)
             self._post_run(t0)
             return
 
+        if workers and workers > 1 and len(self.report_names) > 1:
+            self._run_parallel(use_lake_version, workers=workers, max_per_publisher=max_per_publisher)
+            self._post_run(t0)
+            return self
+
         for report_name in self.report_names:
 
             print(Fore.LIGHTWHITE_EX + hag.make_box(report_name, style='bold-line', alignment='center', horizontal_padding=10, vertical_padding=1,))
             t = time.perf_counter()
+            self.log_capture.begin(report_name)
             self.logger.info('\n' + '<{}>'.format(report_name))
 
             try:
-                self.single(report_name, use_lake_version)
+                self._single(report_name, use_lake_version, streaming = streaming)
                 self.logger.info('\n\n++UpdateStatus:Success')
-                if report_name.lower() in [_r.lower() for _r in self.reports_to_refresh]:
-                    exso.settings.set_refresh_requirements(force_no_refresh=report_name, mode = 'a')
-                    fulfilled_refreshes.append(report_name)
+                self._fulfill_refresh_requirement(report_name)
 
                 print(Fore.CYAN + hag.align('\n\t' + report_name + ' --> Succeeded', alignment = 'right', width = 10))
                 self.update_summary[report_name] = {'Status':'Success'}
@@ -197,6 +248,164 @@ class Updater:
 
         return self
 
+    # *******  *******   *******   *******   *******   *******   *******
+    def _open_session(self, warnings_verbose = 0):
+        ''' Per-run bookkeeping: update summary, and the per-report log capture/export (also used by the Watcher) '''
+        self.fulfilled_refreshes = []
+        self.warnings_verbose = warnings_verbose
+        self.log_split = LogSplitter(root_logfile=Files.root_log, save_at_dir=Files.latest_logs_dir)
+        self.log_capture = ReportLogCapture.attach()
+        self.failed = {}
+        self.update_summary = {}
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def prefetch_sniffs(self, report_names = None, force = False):
+        ''' Sniff the api for all (ongoing) reports concurrently. Every Report() created afterwards, consumes the cached results. '''
+        if not self.allow_handshake:
+            return {}
+
+        report_names = self.report_names if report_names is None else report_names
+        t = time.perf_counter()
+        results = Sniffer(self.rp, self.root_lake).prefetch(report_names, force = force)
+        if results:
+            print(Fore.LIGHTWHITE_EX + '\tSniffed the latest available dates of {} reports ({:.1f} sec)\n'.format(len(results), time.perf_counter() - t))
+        return results
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _fulfill_refresh_requirement(self, report_name):
+        ''' Only the main process touches the refresh-requirements file (also in scheduler mode) '''
+        if report_name.lower() in [_r.lower() for _r in self.reports_to_refresh]:
+            exso.settings.set_refresh_requirements(force_no_refresh=report_name, mode = 'a')
+            self.fulfilled_refreshes.append(report_name)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _worker_options(self, use_lake_version):
+        ''' Everything a scheduler process needs, in order to run .single() as if it was this Updater '''
+        options = {'root_lake': self.root_lake,
+                   'root_base': self.root_base,
+                   'reports_pool': self.rp,
+                   'allow_handshake': self.allow_handshake,
+                   'reports_to_refresh': self.reports_to_refresh,
+                   'mode': self.mode,
+                   'start_date': self.start_date,
+                   'end_date': self.end_date,
+                   'use_lake_version': use_lake_version,
+                   'streaming': self.streaming,
+                   'profile': Telemetry.enabled,
+                   'profile_code': self.profile_code,
+                   'sniff_ttl': Sniffer.ttl,
+                   'window_days': self.window_days,
+                   'retroactive_update': self.retroactive_update,
+                   'download_engine': Assistant.download_engine,
+                   'keep_zipped': ZipHandler.keep_zipped,
+                   'rate_share': RateLimiter.share,
+                   'system_formats': {'_decimal_sep': exso._decimal_sep,
+                                      '_list_sep': exso._list_sep,
+                                      '_thousand_sep': exso._thousand_sep}}
+        return options
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def _from_worker_options(cls, options):
+        ''' Lightweight Updater for scheduler processes: no path-confirmation prompt, no report derivation, no pool re-initialization '''
+        upd = cls.__new__(cls)
+        upd.logger = logging.getLogger(__name__ + '.' + cls.__name__)
+        upd.root_lake = options['root_lake']
+        upd.root_base = options['root_base']
+        upd.rp = options['reports_pool']
+        upd.allow_handshake = options['allow_handshake']
+        upd.reports_to_refresh = options['reports_to_refresh']
+        upd.mode = options['mode']
+        upd.start_date = options['start_date']
+        upd.end_date = options['end_date']
+        upd.keep_steps = False
+        upd.profile_code = options['profile_code']
+        upd.profile_dumps = {}
+        upd.window_days = options['window_days']
+        upd.retroactive_update = options['retroactive_update']
+        return upd
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _run_parallel(self, use_lake_version, workers, max_per_publisher = None):
+        ''' Scheduler mode: every report is updated through .single() in its own process.
+            Reports share nothing on disk (each one has its own lake & base directory), so they are independent.
+            However, reports of the same publisher hit the same servers, so their concurrency is capped by max_per_publisher.
+
+            Each worker writes its own log-file. When a worker finishes, its log is appended as a <report>...</report>
+            section to the root log, so that the LogSplitter keeps working exactly as in the sequential mode.
+        '''
+        if not max_per_publisher:
+            max_per_publisher = workers
+
+        all_reports = self.rp.allmighty_df[['report_name', 'publisher']]
+        publisher_of = dict(zip(all_reports['report_name'].str.lower(), all_reports['publisher']))
+
+        self.logger.info("Scheduler mode: {} workers, at most {} concurrent reports per publisher".format(workers, max_per_publisher))
+        print(Fore.LIGHTWHITE_EX + '\tScheduler mode: {} processes, max {} per publisher\n'.format(workers, max_per_publisher))
+
+        options = self._worker_options(use_lake_version)
+        # up to max_per_publisher processes hit the same hosts: each one gets its share of the per-host rate limits
+        options['rate_share'] = RateLimiter.share / max_per_publisher
+        pending = list(self.report_names)
+        running = {} # future: (report_name, publisher, perf_counter at submission)
+        busy = {}
+
+        # Worker processes re-import exso: make sure they don't truncate the root log
+        os.environ['EXSO_WORKER'] = '1'
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                while pending or running:
+                    for report_name in list(pending):
+                        if len(running) >= workers:
+                            break
+                        publisher = publisher_of[report_name.lower()]
+                        if busy.get(publisher, 0) >= max_per_publisher:
+                            continue
+
+                        pending.remove(report_name)
+                        busy[publisher] = busy.get(publisher, 0) + 1
+                        future = executor.submit(_single_worker, report_name, options)
+                        running[future] = (report_name, publisher, time.perf_counter())
+                        print(Fore.LIGHTWHITE_EX + '\t--> Started: {} ({})'.format(report_name, publisher))
+
+                    done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        report_name, publisher, t = running.pop(future)
+                        busy[publisher] -= 1
+                        self._collect_worker(report_name, future, t)
+        finally:
+            os.environ.pop('EXSO_WORKER', None)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _collect_worker(self, report_name, future, t0):
+        try:
+            result = future.result()
+        except BaseException as ex: # the worker process itself crashed (or exited)
+            result = {'status': 'Fail', 'exception': repr(ex), 'trace': traceback.format_exc(), 'log': None, 'elapsed': None}
+
+        Telemetry.records.extend(result.get('telemetry', []))
+        if result.get('profile'):
+            self.profile_dumps[report_name] = result['profile']
+
+        print(Fore.LIGHTWHITE_EX + hag.make_box(report_name, style='bold-line', alignment='center', horizontal_padding=10, vertical_padding=1,))
+        self.log_capture.begin(report_name)
+        self.logger.info('\n' + '<{}>'.format(report_name))
+        if result['log'] and Path(result['log']).exists():
+            with open(result['log'], 'r', encoding='utf-8') as f:
+                worker_log = f.read()
+            self.logger.info('\n' + worker_log)
+            self.log_capture.feed_text(worker_log) # the worker's records arrive as a single record: pick its warnings/facts
+
+        if result['status'] == 'Success':
+            self.logger.info('\n\n++UpdateStatus:Success')
+            self._fulfill_refresh_requirement(report_name)
+            print(Fore.CYAN + hag.align('\n\t' + report_name + ' --> Succeeded', alignment='right', width=10))
+        else:
+            self._print_error(report_name=report_name, exc=result['exception'], trace=result['trace'])
+
+        self.update_summary[report_name] = {'Status': result['status']}
+        self._post_single(report_name, t0=t0, elapsed=result['elapsed'])
+
     # *******  *******   *******   *******   *******   *******   *******
     def _print_error(self, report_name, exc, trace):
 
@@ -216,15 +425,18 @@ class Updater:
         print('\n\nMoving on ....\n\n')
 
     # *******  *******   *******   *******   *******   *******   *******
-    def _post_single(self, report_name, t0):
-        elapsed = round(time.perf_counter() - t0, 3)
+    def _post_single(self, report_name, t0, elapsed = None):
+        if elapsed is None:
+            elapsed = time.perf_counter() - t0
+        elapsed = round(elapsed, 3)
         now = datetime.datetime.strftime(datetime.datetime.now(), format='%Y-%m-%d %H_%M')
         self.update_summary[report_name]['Elapsed (sec)'] = elapsed
 
         self.logger.info('\n\n++PerformedAt:{}'.format(now))
         self.logger.info('\n\n++Elapsed: {:.3f} sec'.format(elapsed))
         self.logger.info('\n' + '</{}>'.format(report_name))
-        warnings = self.log_split.extract(report_name)
+        LogSplitter.report_logs[report_name] = self.log_capture.end(report_name)
+        warnings = LogSplitter.report_logs[report_name]['warnings']
         if self.warnings_verbose == 1 and warnings:
             print(Fore.CYAN + "\t\twarnings: ")
             print('\t\t\t' + hag.align(warnings, alignment='right', width=1))
@@ -233,6 +445,8 @@ class Updater:
 
     # *******  *******   *******   *******   *******   *******   *******
     def _post_run(self, t0):
+        if getattr(self, 'log_capture', None):
+            self.log_capture.detach()
 
         elapsed = time.perf_counter() - t0
         self.logger.info("\n\n\n\n\nTotal Time: {}".format(elapsed))
@@ -251,6 +465,10 @@ class Updater:
         with open(Files._logs_dir / 'update_summary.log', 'w') as f:
             [f.write(json.dumps({report: content}) + '\n') for report, content in self.update_summary.items()]
 
+        self._export_profiles()
+        if RateLimiter.metrics():
+            self.logger.info("Rate limiter metrics (per host): {}".format(json.dumps(RateLimiter.metrics())))
+
         print('\n==> Total Time Elapsed: {:.3f} sec ({:.2f} min)\n\n'.format(elapsed, elapsed / 60))
 
         print(hag.make_box("Update Summary", style='bold-line', alignment='center', horizontal_padding=10,
@@ -268,6 +486,23 @@ class Updater:
               '\n\t3. Cite the project when it contributes to your work'
               '\n\t4. Become a sponsor: https://github.com/sponsors/ThanosGkou')
 
+    # *******  *******   *******   *******   *******   *******   *******
+    def _export_profiles(self):
+        if Telemetry.enabled:
+            json_path, _ = Telemetry.export(Files._logs_dir)
+            print(Fore.LIGHTWHITE_EX + '\n==> Stage telemetry saved at: {}'.format(json_path))
+            Telemetry.enable(False)
+
+        profile_dumps = getattr(self, 'profile_dumps', {})
+        if profile_dumps:
+            elapsed = {r: self.update_summary.get(r, {}).get('Elapsed (sec)', 0) for r in profile_dumps}
+            kept = CodeProfiler.keep_slowest({r: (elapsed[r], dump) for r, dump in profile_dumps.items()},
+                                             save_as = Files._logs_dir / 'slowest_report')
+            if kept:
+                slowest, target = kept
+                self.logger.info("Code profile of the slowest report ({}) saved at: {}".format(slowest, target))
+                print(Fore.LIGHTWHITE_EX + '==> Code profile of the slowest report ({}) saved at: {}'.format(slowest, target))
+
     # *******  *******   *******   *******   *******   *******   *******
     def _modify_requirements(self, requirements, lake):
         if not self.start_date:
@@ -289,6 +524,7 @@ class Updater:
             report_names = [report_names]
 
         for rname in report_names:
+            Telemetry.set_report(rname)
             r = Report.Report(self.rp, rname, self.root_lake, self.root_base, api_allowed=self.allow_handshake)
 
             lake = DataLake.DataLake(r)
@@ -299,10 +535,46 @@ class Updater:
             lake.update()
             self.update_summary[rname]['Status'] = 'Success'
 
+    # *******  *******   *******   *******   *******   *******   *******
+    def _single(self, report_name, use_lake_version, streaming = False):
+        ''' .single(), with its stage-telemetry attributed to report_name, and code-profiled if run(profile_code = ...) '''
+        Telemetry.set_report(report_name)
+        if not self.profile_code:
+            self.single(report_name, use_lake_version, streaming = streaming)
+            return
+
+        profiler = CodeProfiler(self.profile_code)
+        try:
+            with profiler:
+                self.single(report_name, use_lake_version, streaming = streaming)
+        finally:
+            self.profile_dumps[report_name] = profiler.save(Files._logs_dir / 'profiles' / report_name)
+
     # *******  *******   *******   *******   *******   *******   ******* >>> Logging setup
-    def single(self, report_name, use_lake_version, keep_raw = False):
+    def single(self, report_name, use_lake_version, keep_raw = False, streaming = False, retroactive_update = None):
+        '''
+        :param streaming: if True, the downloaded files are read (loaded into memory) by background threads while the download is still running,
+                          so that network time and excel-reading overlap, instead of adding up.
+        :param retroactive_update: see .run(). Default: self.retroactive_update
+        '''
         self.logger.info('\n\n\n\t\tAssessing report type: {}'.format(report_name))
+        if retroactive_update is None:
+            retroactive_update = self.retroactive_update
+
+        r = self.prepare_report(report_name)
+        lake = DataLake.DataLake(r, use_lake_version=use_lake_version, retroactive_update=retroactive_update)
+        prefetched = self.update_datalake(lake, streaming = streaming)
+
+        base = DataBase.DataBase(r, db_timezone='UTC')
+        self.update_database(lake, base, keep_raw = keep_raw, prefetched = prefetched)
+
+        self.lake = lake
+        self.base = base
+        self.r = r
 
+    # *******  *******   *******   *******   *******   *******   *******
+    def prepare_report(self, report_name):
+        ''' Step 1 of .single(): the Report object (sniffs the api for ongoing reports). Moves the database to .bak if a refresh is required. '''
         r = Report.Report(self.rp, report_name, self.root_lake, self.root_base, api_allowed=self.allow_handshake)
 
         if report_name.lower() in [_r.lower() for _r in self.reports_to_refresh]:
@@ -319,9 +591,13 @@ class Updater:
                 print('\tIt seems like you upgraded to a newer exso version, which brought some changes to the specific report ({}).'
                       ' \n\tThis report\'s data(base), just for this time, will be fully rebuilt instead of just updated.\n'
                       '\t\tThe old database of this report is stored here: {} in case you want to keep it'.format(report_name, move_old_db_to))
+        return r
 
-        lake = DataLake.DataLake(r, use_lake_version=use_lake_version)
-
+    # *******  *******   *******   *******   *******   *******   *******
+    def update_datalake(self, lake, streaming = False):
+        ''' Step 2 of .single(): download the missing lake files. Returns the files read while downloading (if streaming), or None.
+            At most about one database window of files (self.window_days) is read while downloading: the rest is left to the windowed Loader.
+        '''
         if self.mode == 'debugging':
             start_date = self.start_date
             end_date = self.end_date
@@ -329,37 +605,113 @@ class Updater:
             start_date = None
             end_date = None
 
-        lake.update(start_date, end_date)
-        base = DataBase.DataBase(r, db_timezone='UTC')
+        prefetcher = Prefetcher(lake.r, max_files = self.window_days or None).start() if streaming else None
+        try:
+            lake.update(start_date, end_date, on_saved = prefetcher.put if prefetcher else None)
+        finally:
+            prefetched = prefetcher.close() if prefetcher else None
+        return prefetched
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def update_database(self, lake, base, keep_raw = False, prefetched = None):
+        ''' Step 3 of .single(): parse the lake files that the database lacks (or that changed), and write them. Returns the requirements (empty if idle)
+
+            The required dates are processed in windows of self.window_days: each window is read, parsed and committed to the database
+            before the next one is read, so only one window of raw frames is held in memory. After each window, a checkpoint is saved
+            in the database directory, so that an interrupted build resumes from the last committed window.
+            In a fresh build, the windows are ascending and do not overlap: windows 2..N are appended (mode 'append') to what the previous
+            ones wrote, instead of re-reading and rewriting the stored files for every window. Only the files that gain new columns are rewritten.
+        '''
         requirements = base.get_update_requirements()
+        requirements = base.get_dirty_requirements(requirements, lake.status.file_df)
+        requirements = base.get_resume_requirements(requirements, base.checkpoint.load())
 
         if self.mode == 'debugging':
             requirements = self._modify_requirements(requirements, lake)
 
-        if requirements:
-            if report_name == 'DailyAuctionsSpecificationsATC':
-                from exso.DataLake.Parsers.ParsersVerticalWide import DailyAuctionsSpecificationsATC
-                data = DailyAuctionsSpecificationsATC.parse_ATC(lake, requirements['range']['date'])
-            else:
-                data = lake.query(dates_iterable=requirements['range']['date'], keep_raw=keep_raw)
-
-            # for field, dfs in data.items():
-            #     for sf, df in dfs.items():
-            #         print(f'{field}, {sf}')
-            #         print(df.head())
-            #         print(df.shape)
-            #         print()
-            # input('---hust before database update.')
-            # I only want the   s t r u c t u r e   of data:dict, not the actual dataframes.
-            # The dataframes belong to the newly-parsed lake, not to the pre-existing database. So: ignore_fruits = True
-            # TODO: I dont really like the ignore_fruits implementation.
-            base.tree = Tree(root_path=base.tree.root.path, root_dict = data, depth_mapping=base.tree.depth_mapping, ignore_fruits = True)
-            base.tree.make_dirs()
-            base.update(data)
+        if not requirements:
+            base.checkpoint.clear()
+            return requirements
+
+        drange = requirements['range']['date']
+        mode = requirements.get('mode', 'slow')
+        fresh_build = not base.status.exists and mode != 'upsert'
+        windows = self._split_windows(drange, self.window_days)
+        if len(windows) > 1:
+            self.logger.info("Database requirements ({} dates) will be processed in {} windows of {} days".format(len(drange), len(windows), self.window_days))
+
+        if prefetched and len(windows) > 1: # only the first window uses the files read while downloading: later windows are read window by window
+            file_df = lake.status.file_df
+            first_window = set(map(Prefetcher.key, file_df.loc[file_df['dates'].isin(windows[0]), 'filepaths']))
+            prefetched = {key: dfs for key, dfs in prefetched.items() if key in first_window}
+
+        for i, window in enumerate(windows):
+            if len(windows) > 1:
+                print(Fore.LIGHTWHITE_EX + '\tWindow {}/{}: {} to {}'.format(i + 1, len(windows), window[0].date(), window[-1].date()))
+                self.logger.info("Window {}/{}: {} to {}".format(i + 1, len(windows), window[0].date(), window[-1].date()))
+
+            window_mode = 'append' if fresh_build and i > 0 else mode
+            self._update_database_window(lake, base, window, window_mode, keep_raw = keep_raw, prefetched = prefetched)
+
+            if len(windows) > 1:
+                base.checkpoint.save(start = drange[0], end = drange[-1], committed_until = window[-1], window_days = self.window_days, mode = mode)
+                if i < len(windows) - 1:
+                    # the next window appends to what was just written: re-assess the database, and release this window's frames
+                    base.refresh()
+                    lake.data = {}
+                    lake.pipeline = None
+                    prefetched = None
+                    gc.collect()
+
+        base.checkpoint.clear()
+        return requirements
 
-        self.lake = lake
-        self.base = base
-        self.r = r
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def _split_windows(drange, window_days):
+        ''' Split a DatetimeIndex of dates into consecutive windows of (at most) window_days calendar days '''
+        if not window_days or len(drange) == 0:
+            return [drange]
+        labels = (drange - drange[0]).days // window_days
+        return [drange[labels == label] for label in labels.unique()]
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _update_database_window(self, lake, base, dates, mode, keep_raw = False, prefetched = None):
+        report_name = lake.report_name
+        if report_name == 'DailyAuctionsSpecificationsATC':
+            from exso.DataLake.Parsers.ParsersVerticalWide import DailyAuctionsSpecificationsATC
+            data = DailyAuctionsSpecificationsATC.parse_ATC(lake, dates)
+        else:
+            data = lake.query(dates_iterable=dates, keep_raw=keep_raw, prefetched=prefetched)
+
+        if not data:
+            self.logger.info("No lake data for the dates from {} to {}".format(dates[0].date(), dates[-1].date()))
+            return
+
+        # for field, dfs in data.items():
+        #     for sf, df in dfs.items():
+        #         print(f'{field}, {sf}')
+        #         print(df.head())
+        #         print(df.shape)
+        #         print()
+        # input('---hust before database update.')
+        # I only want the   s t r u c t u r e   of data:dict, not the actual dataframes.
+        # The dataframes belong to the newly-parsed lake, not to the pre-existing database. So: ignore_fruits = True
+        # TODO: I dont really like the ignore_fruits implementation.
+        base.tree = Tree(root_path=base.tree.root.path, root_dict = data, depth_mapping=base.tree.depth_mapping, ignore_fruits = True)
+        base.tree.make_dirs()
+        base.update(data, mode = mode)
+        base.manifest.record(self._assimilated_files(lake))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def _assimilated_files(lake):
+        ''' The lake files of the last lake.query(), except those that failed to be read '''
+        file_df = lake.status.file_df
+        pipeline = getattr(lake, 'pipeline', None)
+        if pipeline is not None and pipeline.failed_dates:
+            file_df = file_df[~file_df.index.isin(pipeline.failed_dates)]
+        return file_df
 
     # *******  *******   *******   *******   *******   *******   ******* >>> Logging setup
     def derive_reports(self, rp, which:str|list|None, exclude:str|list|None, groups:str|list|None, publishers:str|list|None, countries:str|list|None, only_ongoing:bool):
@@ -479,6 +831,150 @@ class Updater:
     # *******  *******   *******   *******   *******   *******   *******
 
 
+# *******  *******   *******   *******   *******   *******   *******
+def _single_worker(report_name, options):
+    ''' Entry point of a scheduler process (Updater.run(workers = N)).
+        Logs to its own file, runs Updater.single() and reports back a picklable summary.
+    '''
+    t0 = time.perf_counter()
+    for attr, value in options['system_formats'].items():
+        setattr(exso, attr, value)
+
+    worker_log = Files._logs_dir / 'workers' / (report_name + '.log')
+    worker_log.parent.mkdir(exist_ok=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    handler = logging.FileHandler(worker_log, mode='w', encoding='utf-8')
+    handler.setFormatter(logging.Formatter('[%(asctime)s-%(levelname)s]  %(name)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+    root.addHandler(handler)
+    root.setLevel(logging.DEBUG)
+
+    Telemetry.enable(options['profile'])
+    Sniffer.ttl = options['sniff_ttl']
+    Assistant.download_engine = options['download_engine']
+    ZipHandler.keep_zipped = options['keep_zipped']
+    RateLimiter.reset(share = options['rate_share'])
+    upd = Updater._from_worker_options(options)
+    result = {'status': 'Success', 'exception': None, 'trace': None, 'log': str(worker_log)}
+    try:
+        upd._single(report_name, options['use_lake_version'], streaming = options['streaming'])
+    except Exception as ex:
+        result.update({'status': 'Fail', 'exception': repr(ex), 'trace': traceback.format_exc()})
+
+    result['elapsed'] = time.perf_counter() - t0
+    result['telemetry'] = Telemetry.pop_records()
+    result['profile'] = str(upd.profile_dumps[report_name]) if report_name in upd.profile_dumps else None
+    handler.close()
+    return result
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class ReportLogCapture(logging.Handler):
+    ''' Logging handler that captures the <report> ... </report> sections of the root log while they are being emitted.
+
+        Instead of re-reading (and regex-scanning) the whole root log after every report (LogSplitter.extract), each record is:
+            - appended to the current report's buffer (spooled to disk if large)
+            - checked for warnings, and for "++fact:value" events
+        .end(report_name) returns the same structure as LogSplitter.report_logs[report_name]: {'facts', 'log', 'warnings'}
+    '''
+    spool_size = 8 * 1024 * 1024
+
+    def __init__(self, formatter = None):
+        super().__init__(level = logging.DEBUG)
+        if formatter is None:
+            formatter = logging.Formatter('[%(asctime)s-%(levelname)s]  %(name)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+        self.setFormatter(formatter)
+        self.report_name = None
+        self.buffer = None
+        self.facts = {}
+        self.warnings = []
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def attach(cls, logger = None):
+        ''' Attach to the root logger, re-using the formatter of the root log-file '''
+        logger = logger or logging.getLogger()
+        formatters = [h.formatter for h in logger.handlers if h.formatter is not None]
+        capture = cls(formatter = formatters[0] if formatters else None)
+        logger.addHandler(capture)
+        capture.logger = logger
+        return capture
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def detach(self):
+        self.logger.removeHandler(self)
+        self._close_buffer()
+        self.close()
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def begin(self, report_name):
+        self.acquire()
+        try:
+            self._close_buffer()
+            self.report_name = report_name
+            self.buffer = tempfile.SpooledTemporaryFile(max_size = self.spool_size, mode = 'w+', encoding = 'utf-8')
+            self.facts = {}
+            self.warnings = []
+        finally:
+            self.release()
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def emit(self, record):
+        if self.buffer is None:
+            return
+        try:
+            text = self.format(record)
+            self.buffer.write(text + '\n')
+            if record.levelno == logging.WARNING:
+                self.warnings.append(text[text.find('WARNING'):])
+            self._collect_facts(record.getMessage())
+        except Exception:
+            self.handleError(record)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _collect_facts(self, message):
+        if '++' in message:
+            for event in re.findall(r'\+\+.*', message):
+                self.facts.update(LogSplitter.events_cleaner(event))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def feed_text(self, text):
+        ''' Already-formatted log text (e.g. a scheduler-worker's log-file): only its warnings and facts are collected. '''
+        self.acquire()
+        try:
+            self.warnings.extend(re.findall('WARNING.*', text))
+            self._collect_facts(text)
+        finally:
+            self.release()
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def end(self, report_name):
+        self.acquire()
+        try:
+            if self.buffer is None or report_name != self.report_name:
+                return {'facts': {}, 'log': '', 'warnings': []}
+            self.buffer.seek(0)
+            report_log = self.buffer.read()
+            section = {'facts': self.facts, 'log': report_log, 'warnings': self.warnings}
+            self._close_buffer()
+            self.report_name = None
+            return section
+        finally:
+            self.release()
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _close_buffer(self):
+        if self.buffer is not None:
+            self.buffer.close()
+        self.buffer = None
+
+
 # *******  *******   *******   *******   *******   *******   *******
 # *******  *******   *******   *******   *******   *******   *******
 # *******  *******   *******   *******   *******   *******   *******
@@ -493,7 +989,7 @@ class LogSplitter:
 
         self.root_logfile = root_logfile
         self.save_at_dir = save_at_dir
-        self.read()
+        self.raw_log = '' # read lazily: during an update, the per-report sections are captured by ReportLogCapture
 
     # *******  *******   *******   *******   *******   *******   *******
     def read(self):
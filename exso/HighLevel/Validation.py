@@ -28,6 +28,7 @@ class SingleValidation(Updater):
         self.rp = self.get_pool(reports_pool = reports_pool)
         self.root_base = Path(tempfile.mkdtemp())
         self.root_lake = root_lake
+        self.reports_to_refresh = []
 
 
     # *********************************************
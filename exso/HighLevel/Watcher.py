@@ -0,0 +1,197 @@
+import datetime
+import logging
+import time
+import traceback
+
+import colorama
+from colorama import Fore
+
+import pandas as pd
+from exso.DataBase import DataBase
+from exso.DataLake import DataLake
+from exso.HighLevel.Updater import Updater, LogSplitter
+from exso.Utils.DateTime import DateTime
+from exso.Utils.Profiler import Telemetry
+
+
+###############################################################################################
+###############################################################################################
+###############################################################################################
+class WatchedReport:
+    ''' The warm state of a single report in watch mode: its Report, DataLake and DataBase objects, and its polling schedule '''
+    def __init__(self, report_name):
+        self.report_name = report_name
+        self.r = None
+        self.lake = None
+        self.base = None
+        self.interval = None
+        self.next_due = pd.Timestamp.now()
+        self.healthy = False # True after a successful poll. A failed poll forces a full lake/database re-assessment next time
+        self.n_polls = 0
+        self.n_updates = 0
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @property
+    def is_warm(self):
+        return self.base is not None
+
+
+###############################################################################################
+###############################################################################################
+###############################################################################################
+class Watcher:
+    ''' Resident update loop (py -m exso watch).
+
+        Instead of a fresh "py -m exso update" every e.g. 15 minutes (re-import, Report.Pool, api-sniffing and database
+        assessment for every report), the Watcher keeps the Report.Pool, and each report's Report, DataLake and DataBase objects
+        in memory, and polls each report on its own cadence:
+            - cadence: a quarter of the report's period_covered (e.g. 6 hours for daily files), clipped to [min_interval, max_interval]
+            - warm poll: re-sniff the api. If the latest available date did not move (and the previous poll succeeded), nothing else is done.
+                         Otherwise, only the lake delta is downloaded, and only the missing/dirty dates are parsed and written.
+            - reports with a fixed end-date (not ongoing) are updated once, and then dropped from the watch-list.
+
+        Usage: Watcher(Updater(...)).run()      (Ctrl+C to stop)
+    '''
+    min_interval = pd.Timedelta(15, 'min')
+    max_interval = pd.Timedelta(6, 'h')
+
+    def __init__(self, updater:Updater, use_lake_version = 'latest', streaming = False, min_interval = None, max_interval = None):
+        '''
+        :param updater: an Updater object, defining the root lake/base and the reports to watch
+        :param use_lake_version: see Updater.run()
+        :param streaming: see Updater.single()
+        :param min_interval: [pd.Timedelta|str|None] minimum time between two polls of the same report (default: 15 min)
+        :param max_interval: [pd.Timedelta|str|None] maximum time between two polls of the same report (default: 6 hours)
+        '''
+        self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.updater = updater
+        self.use_lake_version = use_lake_version
+        self.streaming = streaming
+        if min_interval is not None:
+            self.min_interval = pd.Timedelta(min_interval)
+        if max_interval is not None:
+            self.max_interval = pd.Timedelta(max_interval)
+
+        self.watched = {report_name: WatchedReport(report_name) for report_name in updater.report_names}
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def poll_interval(self, r):
+        ''' A quarter of the report's period, clipped to [min_interval, max_interval] '''
+        period = DateTime.disambiguate_timedelta(pd.Timestamp.today(), r.period_covered, return_timedelta=True)
+        return min(max(period / 4, self.min_interval), self.max_interval)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def run(self, rounds = None):
+        '''
+        :param rounds: if given, stop after this number of scheduling rounds (a round polls every report that is due). Default: run forever
+        '''
+        upd = self.updater
+        upd.profile_code = None
+        upd.profile_dumps = {}
+        upd._open_session()
+        t0 = time.perf_counter()
+
+        colorama.init(autoreset=True)
+        print(Fore.LIGHTCYAN_EX + '\n\n--> Watch mode started at: {}. Watching {} reports (Ctrl+C to stop)\n'.format(
+            datetime.datetime.now().strftime('%Y-%m-%d %H:%M'), len(self.watched)))
+        self.logger.info("Watch mode: {} reports, polling intervals within [{}, {}]".format(len(self.watched), self.min_interval, self.max_interval))
+
+        n_rounds = 0
+        try:
+            while self.watched:
+                due = sorted([w for w in self.watched.values() if w.next_due <= pd.Timestamp.now()], key=lambda w: w.next_due)
+                # warm polls start with a re-sniff: do them all at once (the cold ones are sniffed by their Report object)
+                upd.prefetch_sniffs([w.report_name for w in due if w.is_warm], force = True)
+                for watched in due:
+                    self._poll(watched)
+
+                n_rounds += bool(due)
+                if rounds is not None and n_rounds >= rounds:
+                    break
+
+                if self.watched:
+                    next_due = min(w.next_due for w in self.watched.values())
+                    time.sleep(max((next_due - pd.Timestamp.now()).total_seconds(), 1))
+
+        except KeyboardInterrupt:
+            print(Fore.LIGHTCYAN_EX + '\n\n--> Watch mode stopped.')
+            self.logger.info("Watch mode stopped by the user.")
+
+        upd._post_run(t0)
+        return self
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _poll(self, watched):
+        upd = self.updater
+        report_name = watched.report_name
+        t = time.perf_counter()
+        upd.log_capture.begin(report_name)
+        upd.logger.info('\n' + '<{}>'.format(report_name))
+
+        try:
+            outcome = self.poll(watched)
+            upd.logger.info('\n\n++UpdateStatus:Success')
+            upd._fulfill_refresh_requirement(report_name)
+            watched.healthy = True
+            status = 'Success'
+
+        except Exception as ex:
+            upd._print_error(report_name=report_name, exc=ex, trace=traceback.format_exc())
+            watched.healthy = False
+            outcome = 'failed'
+            status = 'Fail'
+
+        elapsed = round(time.perf_counter() - t, 3)
+        watched.n_polls += 1
+        upd.update_summary[report_name] = {'Status': status, 'Elapsed (sec)': elapsed, 'Polls': watched.n_polls, 'Updates': watched.n_updates}
+
+        upd.logger.info('\n\n++PerformedAt:{}'.format(datetime.datetime.now().strftime('%Y-%m-%d %H_%M')))
+        upd.logger.info('\n\n++Elapsed: {:.3f} sec'.format(elapsed))
+        upd.logger.info('\n' + '</{}>'.format(report_name))
+        LogSplitter.report_logs[report_name] = upd.log_capture.end(report_name)
+        upd.log_split.export(report_name)
+
+        if status == 'Success' and not watched.r.is_ongoing:
+            self.watched.pop(report_name)
+            outcome += ', not ongoing: no longer watched'
+        else:
+            watched.next_due = pd.Timestamp.now() + (watched.interval or self.min_interval)
+
+        print(Fore.LIGHTWHITE_EX + '\t{}  {:<40} {} ({:.1f} sec){}'.format(
+            datetime.datetime.now().strftime('%H:%M:%S'), report_name + ':', outcome, elapsed,
+            '' if report_name not in self.watched else '. Next poll at {}'.format(watched.next_due.strftime('%H:%M'))))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def poll(self, watched):
+        ''' One update of a single report. The first poll is a cold start (same as Updater.single()); the next ones re-use the warm objects.
+            Returns a short description of the outcome.
+        '''
+        upd = self.updater
+        Telemetry.set_report(watched.report_name)
+
+        if not watched.is_warm:
+            watched.r = upd.prepare_report(watched.report_name)
+            watched.lake = DataLake.DataLake(watched.r, use_lake_version=self.use_lake_version)
+            watched.base = DataBase.DataBase(watched.r, db_timezone='UTC')
+            watched.interval = self.poll_interval(watched.r)
+            self.logger.info("Cold start of {}. Polling interval: {}".format(watched.report_name, watched.interval))
+
+        else:
+            moved = watched.r.refresh_available_until()
+            if not moved and watched.healthy:
+                self.logger.info("\t{}: latest available date unchanged ({}). Nothing to do.".format(watched.report_name, watched.r.available_until))
+                return 'idle'
+
+            watched.lake.refresh(max_potential_date=watched.r.available_until)
+            watched.base.refresh()
+
+        prefetched = upd.update_datalake(watched.lake, streaming=self.streaming)
+        requirements = upd.update_database(watched.lake, watched.base, prefetched=prefetched)
+        if not requirements:
+            return 'up-to-date'
+
+        watched.n_updates += 1
+        return 'updated ({} dates)'.format(len(requirements['range']['date']))
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
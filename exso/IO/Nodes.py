@@ -5,7 +5,6 @@ from pathlib import Path
 import numpy as np
 import pandas as pd
 import exso
-from exso.Utils.Plot import Plot
 
 
 # ********   *********   *********   *********   *********   *********   *********   *********
@@ -375,6 +374,8 @@ class Node(NodeAccessors, NodeConstructors):
         '''
 
 
+        from exso.Utils.Plot import Plot # plotly/matplotlib are heavy: imported only when plotting
+
         if self.kind not in ['file', 'property']:
             raise AssertionError('\n--> You can only plot a node whose "kind" is "file" or "property". "{}" is of kind: {}'.format(self.dna, self.kind))
 
@@ -7,6 +7,7 @@ import traceback
 import pandas as pd, numpy as np # numpy used in eval. dont remove the import
 from exso.DataLake.APIs.StreamHandler import StreamHandler
 from exso.Utils.DateTime import DateTime
+from exso.Utils.Profiler import Telemetry
 
 ###############################################################################################
 
@@ -92,6 +93,17 @@ class ReadingSettings:
 
     # *******  *******   *******   *******   *******   *******   *******
     def __interpret_eligibility(self, eligib_filename, config_dir):
+        key = ReadingSettings.eligibility_key(eligib_filename, self.file_format)
+        return self.rp.get_compiled(key, ReadingSettings.load_eligibility, eligib_filename, config_dir, self.file_format)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def eligibility_key(eligib_filename, file_format):
+        return ('eligibility', eligib_filename, file_format)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def load_eligibility(eligib_filename, config_dir, file_format):
 
         if not eligib_filename:
             eligib_filename = 'generic.txt'
@@ -104,7 +116,7 @@ class ReadingSettings:
         eligibility = ast.literal_eval(content)
 
         if not 'extension_filter' in eligibility.keys():
-            eligibility['extension_filter'] = self.file_format
+            eligibility['extension_filter'] = file_format
         return eligibility
 
     # *******  *******   *******   *******   *******   *******   *******
@@ -157,8 +169,31 @@ class ParsingSettings:
 
     # *******  *******   *******   *******   *******   *******   *******
     def __interpret_cuepoints(self, sheet_tags):
-        if self.cuepoints_file:
-            cuepoints_filepath = self.config_dir / 'cuepoints' / self.cuepoints_file
+        key = ParsingSettings.cuepoints_key(self.cuepoints_file, sheet_tags)
+        return self.rp.get_compiled(key, ParsingSettings.load_cuepoints, self.cuepoints_file, self.config_dir, sheet_tags)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def __interpret_mappings(self, mapping, search_in_dir):
+        key = ParsingSettings.mapping_key(mapping, search_in_dir)
+        return self.rp.get_compiled(key, ParsingSettings.load_mapping, mapping, search_in_dir)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def cuepoints_key(cuepoints_file, sheet_tags):
+        if cuepoints_file:
+            return ('cuepoints', cuepoints_file)
+        return ('cuepoints', None, tuple(sheet_tags))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def mapping_key(mapping, search_in_dir):
+        return ('mapping', search_in_dir.name, mapping)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @staticmethod
+    def load_cuepoints(cuepoints_file, config_dir, sheet_tags):
+        if cuepoints_file:
+            cuepoints_filepath = config_dir / 'cuepoints' / cuepoints_file
 
             with open(cuepoints_filepath, 'r', encoding='utf-8') as content:
                 raw_cues = content.read()
@@ -171,7 +206,8 @@ class ParsingSettings:
         return cue_rules
 
     # *******  *******   *******   *******   *******   *******   *******
-    def __interpret_mappings(self, mapping, search_in_dir):
+    @staticmethod
+    def load_mapping(mapping, search_in_dir):
         if not mapping:
             mapping = {}
 
@@ -293,7 +329,14 @@ class TimeSettings:
 
         else:  # aN --> file is still ongoing and needs regular updates
             if api_allowed and is_alive:
-                lake_max_date = self.sniff_api(report_name, publisher, lake_dir)
+                from exso.ReportsInfo.Sniffer import Sniffer
+                lake_max_date = Sniffer.lookup(report_name)
+                if lake_max_date is None:
+                    lake_max_date = self.sniff_api(report_name, publisher, lake_dir)
+                    if self.sniffed:
+                        Sniffer.store(report_name, lake_max_date)
+                else:
+                    self.logger.info("Latest available date of {} (sniff-cache): {}".format(report_name, lake_max_date))
             else:
                 lake_max_date = datetime.datetime.today().date()
 
@@ -301,7 +344,11 @@ class TimeSettings:
 
 
     # *******  *******   *******   *******   *******   *******   *******
-    def sniff_api(self, report_name, publisher, lake_dir):
+    def sniff_api(self, report_name, publisher, lake_dir, suspend_stdout = True):
+        ''' Dry-run api query of the last period: returns the latest available date.
+            self.sniffed is False if no date could be acquired (connection failure): the returned date is then just a fallback.
+            suspend_stdout: sys.stdout is process-wide: concurrent callers (Sniffer) silence it once, around all of them.
+        '''
 
         now = pd.Timestamp(datetime.datetime.now()).tz_localize(self.system_tz).tz_convert(self.inherent_tz)
 
@@ -315,15 +362,17 @@ class TimeSettings:
             print('Weird error')
             print(traceback.format_exc())
             input('-X')
-        sys.stdout = None
+        if suspend_stdout:
+            sys.stdout = None
         try:
             start_date = today - DateTime.disambiguate_timedelta(today, self.period_covered, return_timedelta = True)
             end_date = today + pd.Timedelta(1,'D')
-            api.query(report_name,
-                      start_date=start_date,
-                      end_date= end_date,
-                      publisher=publisher,
-                      dry_run=True)
+            with Telemetry.stage('sniff'):
+                api.query(report_name,
+                          start_date=start_date,
+                          end_date= end_date,
+                          publisher=publisher,
+                          dry_run=True)
 
             successful_dates = api.link_dates  # list of datetime.date objects, or empty list
 
@@ -332,7 +381,9 @@ class TimeSettings:
             self.logger.warning(traceback.format_exc())
             successful_dates = []
 
-        sys.stdout = sys.__stdout__
+        if suspend_stdout:
+            sys.stdout = sys.__stdout__
+        self.sniffed = len(successful_dates) > 0
         if len(successful_dates):
             self.logger.info('\n\n\t\tMade test api call. Latest dates: \n{}'.format(
                 str(list(map(date_lambda, successful_dates)))))
@@ -1,8 +1,13 @@
+import ast
+import copy
 import datetime
 import logging
+import os
+import pickle
 import re
 import sys
 import time
+from pathlib import Path
 
 import numpy as np
 import pandas as pd
@@ -10,6 +15,7 @@ from exso import Files
 from exso.ReportsInfo.Interpretation import Metadata, ReadingSettings, ParsingSettings, TimeSettings
 from exso.Utils.DateTime import DateTime
 from exso.Utils.Misc import Misc
+from exso.Utils.Paths import Paths
 from exso.Utils.STR import STR
 from exso.Utils.Similarity import Similarity
 
@@ -31,6 +37,13 @@ halfstar = '*'*25
 # *******  *******   *******   *******   *******   *******   *******
 # *******  *******   *******   *******   *******   *******   *******
 class Pool:
+    ''' The reports pool, as defined in ReportsInfo.xlsx.
+        Reading the workbook is slow, so, a compiled snapshot of it (allmighty_df + the interpreted eligibility, cue-points and mappings of all reports)
+        is pickled in the exso temp-directory, and re-used as long as the workbook (mtime or sha256) and the config-files are unchanged.
+    '''
+    cache_format = 1
+    config_subdirs = ['cuepoints', 'renamers', 'replacers', 'regex', 'datalake_eligibility']
+
     def __init__(self):
         self.logger = logging.getLogger( __name__ + '.' + self.__class__.__name__)
         self.logger.info("Initializing Reports Pool")
@@ -42,6 +55,7 @@ class Pool:
         self.config_dir = config_dir
 
         self.config_file = self.config_dir / 'ReportsInfo.xlsx'
+        self.cache_file = Files._exso_dir / 'cache' / 'ReportsInfo.pkl'
 
         self.logger.info("System timezone: {}".format(self.system_tz))
         self.logger.info("Config Directory: {}".format(self.config_dir))
@@ -54,6 +68,9 @@ class Pool:
 
     # *******  *******   *******   *******   *******   *******   *******
     def initialize(self):
+        if self.load_cache():
+            return
+
         xl = self.load_config_file()
         dfs_dict = self.read_sheets(xl, sheets = ['Metadata', 'Read Settings', 'Parse Settings', 'Time Settings'])
         dfs_dict = self.rename_columns(dfs_dict)
@@ -63,6 +80,114 @@ class Pool:
         self.logger.info("Reports Pool Dataframe: \n\n" + STR.df_to_string(self.allmighty_df))
         xl.close()
 
+        self.compiled = self.compile_settings()
+        self.save_cache()
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def get_compiled(self, key, loader, *args):
+        ''' Interpreted config-file content (eligibility/cue-points/mappings), from the compiled snapshot if available.
+            A deep copy is returned, because the report objects modify them in-place.
+        '''
+        if key not in self.compiled:
+            self.compiled[key] = loader(*args)
+        return copy.deepcopy(self.compiled[key])
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def compile_settings(self):
+        ''' Interpret the config-files referenced by every report, once. Failures are skipped: they will re-surface (and raise) at Report() '''
+        compiled = {}
+        df = self.allmighty_df.replace(np.nan, None)
+        for row in df.to_dict(orient='records'):
+            sheet_tags = [row['report_name']] if row['sheet_tags'] is None else ast.literal_eval(row['sheet_tags'])
+            tasks = [(ReadingSettings.eligibility_key(row['eligibility_file'], row['file_format']), ReadingSettings.load_eligibility, (row['eligibility_file'], self.config_dir, row['file_format'])),
+                     (ParsingSettings.cuepoints_key(row['cuepoints_file'], sheet_tags), ParsingSettings.load_cuepoints, (row['cuepoints_file'], self.config_dir, sheet_tags))]
+            for column, subdir in [('renamer_mapping', 'renamers'), ('replacer_mapping', 'replacers'), ('regex_mapping', 'regex')]:
+                tasks.append((ParsingSettings.mapping_key(row[column], self.config_dir / subdir), ParsingSettings.load_mapping, (row[column], self.config_dir / subdir)))
+
+            for key, loader, args in tasks:
+                if key in compiled:
+                    continue
+                try:
+                    compiled[key] = loader(*args)
+                except Exception as ex:
+                    self.logger.info("Could not pre-compile {} (report: {}): {}".format(key, row['report_name'], repr(ex)))
+
+        return compiled
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def get_fingerprint(self):
+        ''' What the compiled snapshot depends on. The workbook's sha256 is checked separately (only if its mtime/size changed). '''
+        config_dir = Path(str(self.config_dir))
+        config_files = []
+        for subdir in self.config_subdirs:
+            for fp in sorted((config_dir / subdir).glob('*')):
+                if fp.is_file():
+                    st = fp.stat()
+                    config_files.append((subdir, fp.name, st.st_size, st.st_mtime))
+
+        st = Path(str(self.config_file)).stat()
+        fingerprint = {'cache_format': self.cache_format,
+                       'pandas': pd.__version__,
+                       'config_files': config_files,
+                       'workbook': {'size': st.st_size, 'mtime': st.st_mtime}}
+        return fingerprint
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def load_cache(self):
+        if not self.cache_file.exists():
+            self.logger.info("No compiled reports-pool cache found. Will read {}".format(self.config_file))
+            return False
+
+        try:
+            with open(self.cache_file, 'rb') as f:
+                cache = pickle.load(f)
+
+            fingerprint = self.get_fingerprint()
+            cached = cache['fingerprint']
+            if {k: v for k, v in cached.items() if k != 'workbook'} != {k: v for k, v in fingerprint.items() if k != 'workbook'}:
+                self.logger.info("Compiled reports-pool cache is stale (config-files or environment changed).")
+                return False
+
+            if cached['workbook'] != fingerprint['workbook']:
+                if cache['sha256'] != Paths.sha256(self.config_file):
+                    self.logger.info("Compiled reports-pool cache is stale (workbook content changed).")
+                    return False
+                self.logger.info("Workbook was touched, but its content is unchanged. Re-using the compiled cache.")
+                cache['fingerprint'] = fingerprint
+                self._write_cache(cache)
+
+        except Exception as ex:
+            self.logger.warning("Failed to load the compiled reports-pool cache ({}). Will rebuild it.".format(repr(ex)))
+            return False
+
+        self.allmighty_df = cache['allmighty_df']
+        self.cols_allocation = cache['cols_allocation']
+        self.compiled = cache['compiled']
+        self.logger.info("Loaded compiled reports-pool cache: {} ({} reports)".format(self.cache_file, self.allmighty_df.shape[0]))
+        return True
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def save_cache(self):
+        cache = {'fingerprint': self.get_fingerprint(),
+                 'sha256': Paths.sha256(self.config_file),
+                 'allmighty_df': self.allmighty_df,
+                 'cols_allocation': self.cols_allocation,
+                 'compiled': self.compiled}
+        try:
+            self._write_cache(cache)
+            self.logger.info("Saved compiled reports-pool cache: {}".format(self.cache_file))
+        except Exception as ex:
+            self.logger.warning("Failed to save the compiled reports-pool cache ({})".format(repr(ex)))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def _write_cache(self, cache):
+        ''' Atomic write: concurrent exso processes may be reading the cache '''
+        self.cache_file.parent.mkdir(exist_ok=True, parents=True)
+        temp_file = self.cache_file.with_name('{}.{}.tmp'.format(self.cache_file.name, os.getpid()))
+        with open(temp_file, 'wb') as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file, self.cache_file)
+
     # *******  *******   *******   *******   *******   *******   *******
     def load_config_file(self):
         if not self.config_file.is_file():
@@ -224,6 +349,26 @@ class Report(Metadata, ReadingSettings, ParsingSettings, TimeSettings):
 
 
 
+    # *******  *******   *******   *******   *******   *******   *******
+    @property
+    def is_ongoing(self):
+        ''' True if ReportsInfo.xlsx specifies no end-date: the report is still being published '''
+        return pd.to_datetime(self.df['available_until'].squeeze(), dayfirst=True) is None
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def refresh_available_until(self):
+        ''' Ongoing reports only: re-sniff the api for the latest published date, and update the potential lake/database dates accordingly.
+            (used when the Report object is kept alive between updates, e.g. watch mode)
+            Returns True if the latest available date moved forward.
+        '''
+        if not self.is_ongoing:
+            return False
+
+        previous = self.available_until
+        self.available_until = self._TimeSettings__interpret_available_until(self.report_name, self.publisher, self.datalake_path, self.json['available_until'], api_allowed=self.api_allowed)
+        self.database_min_potential_datetime, self.database_max_potential_datetime = self.get_database_min_max_datetimes(self.available_from, self.available_until)
+        return self.available_until > previous
+
     # *******  *******   *******   *******   *******   *******   *******
     def check_existence(self, report_name = None):
         if not report_name:
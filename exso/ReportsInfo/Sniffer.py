@@ -0,0 +1,168 @@
+import contextlib
+import datetime
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from exso import Files
+from exso.ReportsInfo.Interpretation import TimeSettings
+from exso.Utils.Profiler import Telemetry
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class Probe(TimeSettings):
+    ''' Just the time-settings of a report: all that sniff_api() needs (a whole Report object is much heavier to build) '''
+    def __init__(self, json_row, system_tz):
+        self.logger = logging.getLogger(__name__ + '.' + self.__class__.__name__)
+        self.get_time_settings(json_row, system_tz=system_tz)
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+class Sniffer:
+    ''' Latest available date of the ongoing reports, as found by a dry-run api query ("sniffing").
+
+        - .prefetch(report_names) sniffs all the (ongoing) reports concurrently, instead of one Report() at a time
+        - results are cached on disk (exso temp-dir: cache/sniff_cache.json), so that every Report() created within the TTL
+          (Updater, Validation, scheduler processes, watch mode) consumes them without its own network round-trip
+        - only successful sniffs are cached. A failed sniff is retried by the next Report()
+
+        Sniffer.ttl: maximum age of a cached result (pd.Timedelta). A zero TTL disables the cache.
+    '''
+    cache_file = Files._exso_dir / 'cache' / 'sniff_cache.json'
+    ttl = pd.Timedelta(15, 'min')
+    _lock = threading.Lock()
+    logger = logging.getLogger(__name__ + '.Sniffer')
+
+    def __init__(self, reports_pool, root_lake, n_threads = 6):
+        self.rp = reports_pool
+        self.root_lake = root_lake
+        self.n_threads = n_threads
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def _read(cls):
+        try:
+            with open(cls.cache_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def _write(cls, cache):
+        ''' Atomic write: concurrent exso processes may be reading the cache '''
+        cls.cache_file.parent.mkdir(exist_ok=True, parents=True)
+        temp_file = cls.cache_file.with_name('{}.{}.tmp'.format(cls.cache_file.name, os.getpid()))
+        with open(temp_file, 'w') as f:
+            json.dump(cache, f, indent=2)
+        os.replace(temp_file, cls.cache_file)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def lookup(cls, report_name, ttl = None):
+        ''' The cached latest available date (datetime.date) of the report, or None if missing or older than the TTL '''
+        ttl = cls.ttl if ttl is None else pd.Timedelta(ttl)
+        if ttl <= pd.Timedelta(0):
+            return None
+
+        entry = cls._read().get(report_name)
+        if not entry:
+            return None
+
+        age = pd.Timestamp.now() - pd.Timestamp(entry['sniffed_at'])
+        if age > ttl:
+            return None
+        return datetime.date.fromisoformat(entry['latest_date'])
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def store(cls, report_name, latest_date):
+        cls.store_many({report_name: latest_date})
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def store_many(cls, latest_dates:dict):
+        if not latest_dates:
+            return
+        sniffed_at = datetime.datetime.now().isoformat(timespec='seconds')
+        with cls._lock:
+            cache = cls._read()
+            for report_name, latest_date in latest_dates.items():
+                cache[report_name] = {'latest_date': pd.Timestamp(latest_date).date().isoformat(),
+                                      'sniffed_at': sniffed_at}
+            try:
+                cls._write(cache)
+            except OSError as ex:
+                cls.logger.warning("Failed to save the sniff-cache ({})".format(repr(ex)))
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @classmethod
+    def invalidate(cls, report_names = None):
+        ''' Drop the cached results of the given reports (all, if None) '''
+        with cls._lock:
+            cache = {} if report_names is None else {k: v for k, v in cls._read().items() if k not in report_names}
+            cls._write(cache)
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def ongoing(self, report_names):
+        ''' The reports (among report_names) with no end-date in ReportsInfo.xlsx, i.e. those that a Report() would sniff '''
+        df = self.rp.allmighty_df
+        df = df[df['report_name'].str.lower().isin([r.lower() for r in report_names])]
+        return df[df['available_until'].isna()]['report_name'].to_list()
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def probe(self, report_name):
+        ''' Sniff a single report. Returns (latest_date, succeeded). Its telemetry stages are attributed to report_name (it runs in a worker thread). '''
+        with Telemetry.reporting(report_name):
+            row = self.rp.extract(report_name=report_name).replace(np.nan, None).to_dict(orient='records')[0]
+            probe = Probe(row, system_tz=self.rp.system_tz)
+            lake_dir = self.root_lake / row['publisher'] / row['report_name']
+            latest_date = probe.sniff_api(row['report_name'], row['publisher'], lake_dir, suspend_stdout=False)
+            return latest_date, probe.sniffed
+
+    # *******  *******   *******   *******   *******   *******   *******
+    def prefetch(self, report_names, force = False):
+        '''
+        :param report_names: reports to sniff (the ones with a fixed end-date are skipped)
+        :param force: if True, sniff even if a fresh cached result exists
+        :return: {report_name: latest_date} of the successful sniffs
+        '''
+        report_names = self.ongoing(report_names)
+        if not force:
+            report_names = [r for r in report_names if self.lookup(r) is None]
+        if not report_names:
+            return {}
+
+        self.logger.info("Sniffing {} reports concurrently ({} threads): {}".format(len(report_names), self.n_threads, report_names))
+        results = {}
+        failed = []
+        # sys.stdout is process-wide: silenced once, around all the concurrent sniffs
+        with contextlib.redirect_stdout(None):
+            with ThreadPoolExecutor(max_workers=self.n_threads) as executor:
+                futures = {report_name: executor.submit(self.probe, report_name) for report_name in report_names}
+                for report_name, future in futures.items():
+                    try:
+                        latest_date, succeeded = future.result()
+                    except Exception as ex:
+                        self.logger.warning("\tSniffing {} failed: {}".format(report_name, repr(ex)))
+                        succeeded = False
+
+                    if succeeded:
+                        results[report_name] = latest_date
+                    else:
+                        failed.append(report_name)
+
+        self.store_many(results)
+        self.logger.info("Sniffed {} reports. Failed (will be re-sniffed by their Report object): {}".format(len(results), failed))
+        return results
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
@@ -2,7 +2,7 @@ import datetime
 import inspect
 import re
 import warnings
-from functools import partial
+from functools import lru_cache, partial
 
 import numpy as np
 import pandas as pd
@@ -63,18 +63,43 @@ class DateTime:
             return date
 
         elif isinstance(date,int) or np.issubdtype(type(date),np.integer):
+            return DateTime._convert_scalar(int(date), return_stamp)
 
+        elif isinstance(date,str):
+            return DateTime._convert_scalar(date, return_stamp)
+
+        elif isinstance(date, list) or isinstance(date,np.ndarray):
+            if not return_stamp:
+                return DateTime.to_dates(date)
+
+            dates = list(map(partial(DateTime.date_magician,return_stamp=return_stamp), date))
+
+            return pd.to_datetime(dates)
+
+        elif isinstance(date, pd.DatetimeIndex):
+            if not return_stamp:
+                date = date.date()
+
+            return date
+        else:
+            return date
+
+    # ********   *********   *********   *********   *********   *********   *********   *********
+    @staticmethod
+    @lru_cache(maxsize=8192)
+    def _convert_scalar(date, return_stamp):
+        ''' The int (YYYYMMDD) and str conversions of date_magician. Memoized: the same few dates are converted over and over
+            (progress-bar labels, date-wrapped API calls, time-slices). Timestamps and dates are immutable, so they can be shared.
+        '''
+        if isinstance(date, int):
             date = str(date)
 
             y = date[:4];m = date[4:6] ; d = date[6:]
             y = int(y) ; m = int(m) ; d = int(d)
 
             date = pd.Timestamp(y,m,d)
-            if not return_stamp:
-                date = date.date()
-            return date
 
-        elif isinstance(date,str):
+        else:
             sep = ""
             for test_separator in ['/','-','.']:
                 if re.search(test_separator,date):
@@ -82,24 +107,96 @@ class DateTime:
 
             splitted = "-".join(date.split(sep))
             date = pd.Timestamp(splitted)
-            if not return_stamp:
-                date = date.date()
 
-            return date
+        if not return_stamp:
+            date = date.date()
+        return date
 
-        elif isinstance(date, list) or isinstance(date,np.ndarray):
+    # ********   *********   *********   *********   *********   *********   *********   *********
+    # ********   *********   *********   *********   *********   *********   *********   *********
+    @staticmethod
+    def to_dates(dates) -> pd.DatetimeIndex:
+        ''' Vectorized date_magician, for array-likes: ints (YYYYMMDD), strings, date/datetime/Timestamp objects, datetime64, DatetimeIndex,
+            or any mix of them.
 
-            dates = list(map(partial(DateTime.date_magician,return_stamp=return_stamp), date))
+            Strings "YYYYMMDD" and "YYYY-MM-DD" (or with "/" or "." separators) are parsed in one go; any other string format goes through
+            the (memoized) scalar conversion of date_magician. None/NaN/NaT become NaT. Times and timezones are dropped.
 
-            return pd.to_datetime(dates)
+        :param dates: array-like
+        :return: pd.DatetimeIndex (normalized, tz-naive), in the order of dates
+        '''
+        if isinstance(dates, pd.DatetimeIndex):
+            return DateTime._naive(dates).normalize()
+
+        values = np.asarray(dates.values if isinstance(dates, (pd.Series, pd.Index)) else dates)
+        if values.ndim == 0:
+            values = values.reshape(1)
+
+        if values.dtype.kind == 'M':
+            return DateTime._naive(pd.DatetimeIndex(values)).normalize()
+        if values.dtype.kind in 'iu':
+            return pd.DatetimeIndex(pd.to_datetime(values.astype(str), format='%Y%m%d'))
+        if values.dtype.kind == 'U':
+            return DateTime._dates_from_strings(values.astype(object))
+
+        values = pd.Series(values, dtype=object)
+        textual = values.map(lambda x: isinstance(x, (str, int, np.integer)) and not isinstance(x, bool)).values.astype(bool)
+        out = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[ns]')
+        if textual.any():
+            out[textual] = DateTime._dates_from_strings(values[textual].astype(str).values).values
+        if (~textual).any():
+            others = DateTime._naive(pd.DatetimeIndex(pd.to_datetime(list(values[~textual]))))
+            out[~textual] = others.normalize().values
+        return pd.DatetimeIndex(out)
 
-        elif isinstance(date, pd.DatetimeIndex):
-            if not return_stamp:
-                date = date.date()
+    # ********   *********   *********   *********   *********   *********   *********   *********
+    @staticmethod
+    def _dates_from_strings(strings) -> pd.DatetimeIndex:
+        strings = pd.Series(strings, dtype=object)
+        dates = pd.to_datetime(strings.where(strings.str.fullmatch(r'\d{8}', na=False)), format='%Y%m%d', errors='coerce')
 
-            return date
-        else:
-            return date
+        rest = dates.isna() & strings.notna()
+        if rest.any():
+            ymd = strings[rest].str.extract(r'^(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})$').astype(float)
+            ymd.columns = ['year', 'month', 'day']
+            dates[rest] = pd.to_datetime(ymd, errors='coerce')
+
+        rest = dates.isna() & strings.notna()
+        if rest.any(): # any other format: one by one, as date_magician would do (an invalid date raises)
+            dates[rest] = [DateTime._convert_scalar(s, True).normalize() for s in strings[rest]]
+        return pd.DatetimeIndex(dates)
+
+    # ********   *********   *********   *********   *********   *********   *********   *********
+    @staticmethod
+    def _naive(dates:pd.DatetimeIndex) -> pd.DatetimeIndex:
+        return dates.tz_localize(None) if dates.tz is not None else dates
+
+    # ********   *********   *********   *********   *********   *********   *********   *********
+    # ********   *********   *********   *********   *********   *********   *********   *********
+    @staticmethod
+    def dates_from_filenames(paths) -> pd.DataFrame:
+        ''' Vectorized YYYYMMDD extraction from file names (filepaths, links, or zip-member virtual paths "a.zip::b.xlsx").
+
+            The date of a name is its first 8-digit group, if it is a valid date. Otherwise (ill-formed names, such as
+            20200722_ISP1_ISPResults_ISP1_2020-07-22_20200721140009.xlsx), its first 8-digit group followed by "_".
+            Names without a valid date get str_date = None and date = NaT (it is up to the caller to drop them).
+
+        :param paths: array-like of str (or Path)
+        :return: pd.DataFrame with columns: ['filenames', 'str_dates', 'dates'], in the order of paths
+        '''
+        names = pd.Series(np.asarray(paths, dtype=object), dtype=object).astype(str)
+        filenames = names.str.extract(r'([^\\/:]*)$', expand=False) # after the last dir separator (or "::")
+
+        str_dates = filenames.str.extract(r'(\d{8})', expand=False)
+        dates = pd.to_datetime(str_dates, format='%Y%m%d', errors='coerce')
+
+        retry = dates.isna() & filenames.str.contains(r'\d{8}_')
+        if retry.any():
+            str_dates[retry] = filenames[retry].str.extract(r'(\d{8})_', expand=False)
+            dates[retry] = pd.to_datetime(str_dates[retry], format='%Y%m%d', errors='coerce')
+
+        str_dates[dates.isna()] = None
+        return pd.DataFrame({'filenames': filenames.values, 'str_dates': str_dates.values, 'dates': dates.values})
 
     # ********   *********   *********   *********   *********   *********   *********   *********
     # ********   *********   *********   *********   *********   *********   *********   *********
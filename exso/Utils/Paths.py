@@ -1,3 +1,4 @@
+import hashlib
 import os
 import re
 
@@ -43,6 +44,24 @@ class Paths:
         return rule
 
 
+    # ********   *********   *********   *********   *********   *********   *********   *********
+    # ********   *********   *********   *********   *********   *********   *********   *********
+    @staticmethod
+    def visible(dir):
+        ''' Contents of dir, except dot-files (manifests, checkpoints, partial downloads), which don't count as lake/base content '''
+        return [p for p in dir.glob('*') if not p.name.startswith('.')]
+
+    # ********   *********   *********   *********   *********   *********   *********   *********
+    # ********   *********   *********   *********   *********   *********   *********   *********
+    @staticmethod
+    def sha256(filepath, chunk_size = 1 << 20):
+        ''' Content-hash of a file (read in chunks) '''
+        h = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
     # ********   *********   *********   *********   *********   *********   *********   *********
     # ********   *********   *********   *********   *********   *********   *********   *********
     @staticmethod
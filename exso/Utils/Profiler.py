@@ -0,0 +1,219 @@
+import contextlib
+import csv
+import datetime
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+try:
+    import resource # unix only
+except ImportError:
+    resource = None
+
+try:
+    import psutil # optional: peak memory on windows
+except ImportError:
+    psutil = None
+
+
+# ********   *    ********   *    ********   *    ********   *   ********
+# ********   *    ********   *    ********   *    ********   *   ********
+class Telemetry:
+    ''' Stage-level timing of updates (wall time, cpu time, peak RSS), switched on by Updater.run(profile = True) / --profile
+
+        Usage: with Telemetry.stage('download'):
+                    ...
+
+        When disabled, .stage() does nothing. Nested stages are recorded with their full path (e.g. "sniff/download"),
+        so that the aggregates of different levels are never added together.
+        cpu time is process-wide (it includes the cpu time of any other threads running during the stage).
+        Stages are attributed to the report of .set_report() (process-wide), or of an enclosing .reporting(report_name) block (this thread only).
+    '''
+    enabled = False
+    report_name = None
+    records = []
+    _local = threading.local()
+    _lock = threading.Lock()
+    logger = logging.getLogger(__name__ + '.Telemetry')
+
+    # ********   *    ********   *    ********   *    ********   *   ********
+    @classmethod
+    def enable(cls, enabled = True):
+        cls.enabled = enabled
+        cls.records = []
+
+    # ********   *    ********   *    ********   *    ********   *   ********
+    @classmethod
+    def set_report(cls, report_name):
+        cls.report_name = report_name
+
+    # ********   *    ********   *    ********   *    ********   *   ********
+    @classmethod
+    @contextlib.contextmanager
+    def reporting(cls, report_name):
+        ''' Attribute the stages of this thread to report_name (e.g. worker threads that each handle a different report) '''
+        previous = getattr(cls._local, 'report_name', None)
+        cls._local.report_name = report_name
+        try:
+            yield
+        finally:
+            cls._local.report_name = previous
+
+    # ********   *    ********   *    ********   *    ********   *   ********
+    @classmethod
+    def current_report(cls):
+        return getattr(cls._local, 'report_name', None) or cls.report_name
+
+    # ********   *    ********   *    ********   *    ********   *   ********
+    @staticmethod
+    def peak_rss_mb():
+        if resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return round(peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024, 1) # bytes on macOS, kB on linux
+        if psutil is not None:
+            info = psutil.Process().memory_info()
+            return round(getattr(info, 'peak_wset', info.rss) / 1024 ** 2, 1)
+        return None
+
+    # ********   *    ********   *    ********   *    ********   *   ********
+    @classmethod
+    @contextlib.contextmanager
+    def stage(cls, name):
+        if not cls.enabled:
+            yield
+            return
+
+        stack = getattr(cls._local, 'stack', [])
+        cls._local.stack = stack + [name]
+        path = '/'.join(cls._local.stack)
+
+        started_at = datetime.datetime.now()
+        t0 = time.perf_counter()
+        c0 = time.process_time()
+        try:
+            yield
+        finally:
+            record = {'report': cls.current_report(),
+                      'stage': path,
+                      'started_at': started_at.strftime('%Y-%m-%d %H:%M:%S'),
+                      'wall_sec': round(time.perf_counter() - t0, 4),
+                      'cpu_sec': round(time.process_time() - c0, 4),
+                      'peak_rss_mb': cls.peak_rss_mb()}
+            cls._local.stack = stack
+            with cls._lock:
+                cls.records.append(record)
+
+    # ********   *    ********   *    ********   *    ********   *   ********
+    @classmethod
+    def pop_records(cls):
+        with cls._lock:
+            records, cls.records = cls.records, []
+        return records
+
+    # ********   *    ********   *    ********   *    ********   *   ********
+    @classmethod
+    def summarize(cls, records = None):
+        ''' {report: {stage: {'calls', 'wall_sec', 'cpu_sec', 'peak_rss_mb'}}} '''
+        records = cls.records if records is None else records
+        summary = {}
+        for rec in records:
+            agg = summary.setdefault(rec['report'], {}).setdefault(rec['stage'], {'calls': 0, 'wall_sec': 0, 'cpu_sec': 0, 'peak_rss_mb': None})
+            agg['calls'] += 1
+            agg['wall_sec'] = round(agg['wall_sec'] + rec['wall_sec'], 4)
+            agg['cpu_sec'] = round(agg['cpu_sec'] + rec['cpu_sec'], 4)
+            if rec['peak_rss_mb'] is not None:
+                agg['peak_rss_mb'] = max(agg['peak_rss_mb'] or 0, rec['peak_rss_mb'])
+        return summary
+
+    # ********   *    ********   *    ********   *    ********   *   ********
+    @classmethod
+    def export(cls, save_dir, records = None):
+        ''' Writes update_telemetry.json (aggregated per report & stage) and update_telemetry.csv (one row per stage-call) '''
+        records = cls.records if records is None else records
+        save_dir = Path(save_dir)
+
+        with open(save_dir / 'update_telemetry.json', 'w') as f:
+            json.dump(cls.summarize(records), f, indent=2)
+
+        columns = ['report', 'stage', 'started_at', 'wall_sec', 'cpu_sec', 'peak_rss_mb']
+        with open(save_dir / 'update_telemetry.csv', 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(records)
+
+        cls.logger.info("Telemetry exported to: {}".format(save_dir))
+        return save_dir / 'update_telemetry.json', save_dir / 'update_telemetry.csv'
+
+
+# ********   *    ********   *    ********   *    ********   *   ********
+# ********   *    ********   *    ********   *    ********   *   ********
+class CodeProfiler:
+    ''' Function-level profiling of a single report update. kind: 'cprofile' (stdlib) or 'pyinstrument' (if installed) '''
+    kinds = ['cprofile', 'pyinstrument']
+
+    def __init__(self, kind = 'cprofile'):
+        if kind not in self.kinds:
+            raise ValueError("Unknown profiler kind: {}. Choose one of: {}".format(kind, self.kinds))
+
+        if kind == 'pyinstrument':
+            try:
+                import pyinstrument
+            except ImportError:
+                raise ImportError("pyinstrument is not installed. Install it (pip install pyinstrument) or use kind = 'cprofile'")
+            self._profiler = pyinstrument.Profiler()
+        else:
+            import cProfile
+            self._profiler = cProfile.Profile()
+
+        self.kind = kind
+        self.suffix = '.html' if kind == 'pyinstrument' else '.prof'
+
+    # ********   *    ********   *    ********   *    ********   *   ********
+    def __enter__(self):
+        if self.kind == 'pyinstrument':
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+        return self
+
+    # ********   *    ********   *    ********   *    ********   *   ********
+    def __exit__(self, *exc):
+        if self.kind == 'pyinstrument':
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+        return False
+
+    # ********   *    ********   *    ********   *    ********   *   ********
+    def save(self, filepath):
+        ''' .prof files can be inspected with: py -m pstats <file>, or snakeviz '''
+        filepath = Path(filepath).with_suffix(self.suffix)
+        filepath.parent.mkdir(exist_ok=True, parents=True)
+        if self.kind == 'pyinstrument':
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.dump_stats(str(filepath))
+        return filepath
+
+    # ********   *    ********   *    ********   *    ********   *   ********
+    @staticmethod
+    def keep_slowest(profiles:dict, save_as):
+        ''' profiles: {report_name: (elapsed, dump_filepath)}. Keeps only the dump of the slowest report (renamed to save_as) '''
+        profiles = {r: v for r, v in profiles.items() if v[1] and Path(v[1]).exists()}
+        if not profiles:
+            return None
+
+        slowest = max(profiles, key=lambda r: profiles[r][0])
+        for report_name, (elapsed, filepath) in profiles.items():
+            if report_name != slowest:
+                os.remove(filepath)
+
+        filepath = Path(profiles[slowest][1])
+        target = Path(save_as).with_suffix(filepath.suffix)
+        os.replace(filepath, target)
+        return slowest, target
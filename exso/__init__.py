@@ -1,16 +1,13 @@
 import ast
+import importlib
 import json
 import pathlib
 import logging
+import os
 import sys
 from exso import Files
-from exso.ReportsInfo import Report
-from exso.HighLevel.Updater import Updater
-from exso.HighLevel.Validation import Validation
-from exso.IO.Tree import Tree
 import pandas as pd
 import re
-import os
 from colorama import Fore
 import warnings
 warnings.filterwarnings(action='ignore', category=DeprecationWarning)
@@ -23,6 +20,10 @@ pd.options.display.max_columns= None
 # *******  *******   *******   *******   *******   *******   *******
 __version__ = "1.0.5"
 logfile = Files.root_log #Path(tempfile.mktemp())
+if os.environ.get('EXSO_WORKER'):
+    # Scheduler processes (Updater.run(workers = N)) re-import exso: never truncate the main process' root log
+    (Files._logs_dir / 'workers').mkdir(exist_ok = True)
+    logfile = Files._logs_dir / 'workers' / 'worker_{}.log'.format(os.getpid())
 logging.basicConfig(filename=logfile,
                     level=logging.DEBUG,
                     filemode='w',
@@ -45,7 +46,7 @@ _pbar_settings = {'bar_format': "%s{desc:<30} {percentage:5.2f}symbol| %s{bar:15
 _pbar_settings['bar_format'] = re.sub('symbol', '%', _pbar_settings['bar_format'])
 
 
-user_root_windows = pathlib.Path(os.environ['USERPROFILE'])
+user_root_windows = pathlib.Path(os.environ.get('USERPROFILE', pathlib.Path.home()))
 fp_default_datalake = user_root_windows / 'Desktop' / 'exso_data' / 'datalake'
 fp_default_database = user_root_windows / 'Desktop' / 'exso_data' / 'database'
 
@@ -57,8 +58,17 @@ class Settings:
     def __init__(self):
         self.fp_requirements = files_dir / 'refresh_requirements.txt'
         self.fp_system_formats = files_dir / 'system_formats.txt'
-        rp = Report.Pool()
-        self.avail_reports = list(rp.get_available(only_names=True))
+        self._avail_reports = None
+
+    # *******  *******   *******   *******   *******   *******   *******
+    @property
+    def avail_reports(self):
+        ''' Only needed for "force_refresh = 'all'". The reports pool is built on first access, not at import. '''
+        if self._avail_reports is None:
+            from exso.ReportsInfo import Report
+            rp = Report.Pool()
+            self._avail_reports = list(rp.get_available(only_names=True))
+        return self._avail_reports
 
     # *******  *******   *******   *******   *******   *******   *******
 
@@ -152,4 +162,29 @@ class Settings:
     # *******  *******   *******   *******   *******   *******   *******
 
 settings = Settings()
-settings.set_system_formats()
\ No newline at end of file
+settings.set_system_formats()
+
+
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# *******  *******   *******   *******   *******   *******   *******
+# The heavy parts of the API (pools, updaters, trees, plotting) are imported on first access (PEP 562), so that "import exso" stays cheap.
+_lazy_attributes = {'Updater': ('exso.HighLevel.Updater', 'Updater'),
+                    'Validation': ('exso.HighLevel.Validation', 'Validation'),
+                    'Watcher': ('exso.HighLevel.Watcher', 'Watcher'),
+                    'Tree': ('exso.IO.Tree', 'Tree'),
+                    'Report': ('exso.ReportsInfo.Report', None)}
+
+def __getattr__(name):
+    if name not in _lazy_attributes:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+    module_name, attribute = _lazy_attributes[name]
+    value = importlib.import_module(module_name)
+    if attribute:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(_lazy_attributes.keys()))
@@ -14,7 +14,7 @@ def main():
 
     args = sys.argv[1:]
     p = argparse.ArgumentParser(prog="py -m exso")
-    p.add_argument("mode", choices=["info", "update", "validate", "query", "set_system_formats"])
+    p.add_argument("mode", choices=["info", "update", "watch", "validate", "query", "set_system_formats"])
     p.add_argument("-rl", "--root_lake", default=None)
     p.add_argument("-rb", "--root_base", default=None)
 
@@ -38,6 +38,32 @@ def main():
                                                                  'Gas'
                                                                  ])
 
+    p.add_argument('--workers', type=int, default=1,
+                   help="number of processes for the update. If > 1, independent reports are updated in parallel")
+    p.add_argument('--max_per_publisher', type=int, default=None,
+                   help="(if --workers > 1) maximum number of reports of the same publisher updated concurrently")
+    p.add_argument('--streaming', action='store_true',
+                   help="If added, downloaded files are read while the download is still running (overlapped download/parse)")
+    p.add_argument('--profile', action='store_true',
+                   help="If added, the time & memory of each update stage is recorded per report (logs dir: update_telemetry.json/.csv)")
+    p.add_argument('--profile_code', choices=['cprofile', 'pyinstrument'], default=None,
+                   help="Function-level profiling of each report. Only the profile of the slowest report is kept (logs dir: slowest_report.*)")
+
+    p.add_argument('--download_engine', choices=['threads', 'async'], default=None,
+                   help="'threads' (default) or 'async': hundreds of concurrent requests, capped per host (requires: pip install exso[async])")
+    p.add_argument('--retroactive_update', action='store_true',
+                   help="If added, already downloaded files of live admie reports are checked for revisions at the source (conditional requests), and re-downloaded only if they changed")
+    p.add_argument('--keep_zipped', action='store_true',
+                   help="If added, downloaded zip archives are kept zipped: the datalake indexes their members, and they are read directly from the archives")
+    p.add_argument('--window_days', type=int, default=None,
+                   help="the database of each report is built/updated in date-windows of this many days, with a resumable checkpoint after each one. Default: 90. 0: all at once")
+    p.add_argument('--sniff_ttl', type=float, default=None,
+                   help="minutes for which the latest available date of a report (api-sniffing) is cached. Default: 15. 0 disables the cache")
+    p.add_argument('--poll_min', type=float, default=15,
+                   help="(watch mode) minimum minutes between two polls of the same report")
+    p.add_argument('--poll_max', type=float, default=360,
+                   help="(watch mode) maximum minutes between two polls of the same report")
+
     p.add_argument('--val_report', help='report name you wish to validate.')
     p.add_argument('--val_dates', nargs='+', help="space separated date(s) to validate. format: YYYY-M-D")
     p.add_argument('--val_fields', nargs='+', default=None,
@@ -98,7 +124,25 @@ def main():
                            groups = arguments.groups,
                            publishers = arguments.publishers
                            )
-        upd.run()
+        upd.run(workers = arguments.workers, max_per_publisher = arguments.max_per_publisher, streaming = arguments.streaming,
+                profile = arguments.profile, profile_code = arguments.profile_code,
+                sniff_ttl = None if arguments.sniff_ttl is None else '{}min'.format(arguments.sniff_ttl),
+                window_days = arguments.window_days, download_engine = arguments.download_engine,
+                retroactive_update = arguments.retroactive_update, keep_zipped = arguments.keep_zipped or None)
+
+    elif arguments.mode == 'watch':
+        upd = exso.Updater(root_lake=arguments.root_lake,
+                           root_base=arguments.root_base,
+                           which = arguments.which,
+                           exclude = arguments.exclude,
+                           groups = arguments.groups,
+                           publishers = arguments.publishers
+                           )
+        watcher = exso.Watcher(upd,
+                               streaming = arguments.streaming,
+                               min_interval = '{}min'.format(arguments.poll_min),
+                               max_interval = '{}min'.format(arguments.poll_max))
+        watcher.run()
 
     elif arguments.mode == 'query':
         tree = exso.Tree(root_path = arguments.root_base)